@@ -0,0 +1,136 @@
+import json
+import math
+import os
+import subprocess
+from datetime import date, timedelta
+
+from src.config.scale_out_config import per_worker_path
+from src.config.sheets_config import SPREADSHEET_NAME
+from src.config.storage_config import SQLITE_BACKEND
+from src.fakes.fake_gspread import FakeClient, FakeGoogleSheets
+from src.services import auth_services
+from src.services.grading_cache import GradingCache, set_grading_cache
+from src.services.sheets_client import SheetsClient, set_sheets_client
+from src.services.sheets_outbox import SheetsOutbox, set_sheets_outbox
+from src.services.worksheet_index import worksheet_indexes
+from src.storage.json_storage import JsonStorage
+from src.storage.sqlite_storage import SqliteStorage
+from src.storage.state_store import SharedStateStore, StateStore, set_state_store
+
+GROUPS = 30
+FIRST_USER_ID = 10_000_000
+# Passes both the answer and the PEP8 test of task1
+SOLUTION = "# {username}\nprint(5)\nprint(10)\n"
+
+
+def make_tokens(size: int) -> dict:
+    deadline = str(date.today() + timedelta(days=30))
+    return {
+        f"benchmark-token-{i:06d}": {
+            "last_name": f"Student{i}",
+            "first_name": "Benchmark",
+            "group": f"BM-{i % GROUPS + 1}",
+            "deadline": deadline,
+            "is_in_use": False,
+            "telegram_username": None,
+        }
+        for i in range(size)
+    }
+
+
+class BenchmarkEnvironment:
+    """Points every stateful service at files in `workdir` and Sheets at the fake"""
+
+    def __init__(
+        self,
+        workdir: str,
+        backend: str,
+        write_behind: bool,
+        shared_state: bool = False,
+    ):
+        if backend == SQLITE_BACKEND or shared_state:
+            storage = SqliteStorage(os.path.join(workdir, "state.db"))
+        else:
+            storage = JsonStorage(
+                os.path.join(workdir, "tokens.json"),
+                os.path.join(workdir, "sessions.json"),
+                write_behind=write_behind,
+            )
+        if shared_state:
+            # Like a dispatcher's worker, which reads and writes the database directly
+            self.store = SharedStateStore(storage)
+        else:
+            self.store = StateStore(storage)
+            self.store.load()
+        set_state_store(self.store)
+
+        auth_services.TASK_FILEPATH = os.path.join(workdir, "users_exercises")
+        set_grading_cache(
+            GradingCache(path=per_worker_path(os.path.join(workdir, "cache.json")))
+        )
+        self.sheets = FakeGoogleSheets()
+        self.sheets.create_spreadsheet(SPREADSHEET_NAME)
+        set_sheets_client(SheetsClient(client=FakeClient(self.sheets)))
+        self.outbox = SheetsOutbox(
+            path=per_worker_path(os.path.join(workdir, "sheets_outbox.json"))
+        )
+        set_sheets_outbox(self.outbox)
+        worksheet_indexes.clear()
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = math.ceil(fraction * len(sorted_values)) - 1
+    return sorted_values[min(len(sorted_values) - 1, max(0, index))]
+
+
+def summarize(
+    name: str, cohort: int, latencies: list, errors: int, elapsed: float
+) -> dict:
+    latencies = sorted(latencies)
+    return {
+        "cohort": cohort,
+        "handler": name,
+        "ops": len(latencies),
+        "errors": errors,
+        "seconds": round(elapsed, 4),
+        "throughput_per_s": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "max_ms": round(latencies[-1] * 1000, 3) if latencies else 0.0,
+    }
+
+
+def print_header() -> None:
+    print(
+        f'{"cohort":>7} {"handler":<16} {"ops":>7} {"errors":>6} {"ops/s":>10} '
+        f'{"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9}'
+    )
+
+
+def print_result(result: dict) -> None:
+    print(
+        f'{result["cohort"]:>7} {result["handler"]:<16} {result["ops"]:>7} '
+        f'{result["errors"]:>6} {result["throughput_per_s"]:>10.1f} '
+        f'{result["p50_ms"]:>9.2f} {result["p95_ms"]:>9.2f} {result["p99_ms"]:>9.2f}',
+        flush=True,
+    )
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_report(path: str, report: dict) -> None:
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=4, ensure_ascii=False)
@@ -0,0 +1,230 @@
+import argparse
+import asyncio
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from src.benchmarks.common import (
+    FIRST_USER_ID,
+    SOLUTION,
+    BenchmarkEnvironment,
+    git_commit,
+    make_tokens,
+    print_header,
+    print_result,
+    save_report,
+    summarize,
+)
+from src.config.storage_config import JSON_BACKEND, SQLITE_BACKEND
+from src.fakes.fake_telegram import (
+    FakeBot,
+    FakeContext,
+    FakeDocument,
+    FakeMessage,
+    FakeUpdate,
+    FakeUser,
+)
+from src.services.grading_queue import get_grading_queue
+from src.services.send_throttle import SendThrottle, set_send_throttle
+from src.services.spreadsheet_service import fulfill_worksheets
+from src.services.style_checker import start_style_checker, stop_style_checker
+
+# Usage: python -m src.benchmarks.handlers_benchmark --sizes 100 1000 --json out.json
+
+DEFAULT_SIZES = [100, 1000, 10000]
+
+
+def _load_handlers():
+    # bot_handlers reads the admin list at import time
+    os.environ.setdefault("ADMIN_USERNAMES", "benchmark_admin")
+    from src.handlers import bot_handlers
+
+    return bot_handlers
+
+
+async def _run_phase(
+    handler: str, cohort: int, count: int, concurrency: int, operation
+) -> dict:
+    """Runs operation(i) for every i with at most `concurrency` at once.
+
+    The operation returns whether the bot answered as expected.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def run_one(i: int) -> None:
+        nonlocal errors
+        async with semaphore:
+            started_at = time.perf_counter()
+            try:
+                is_ok = await operation(i)
+            except Exception as e:
+                logging.error(f"{handler} #{i} failed. Error: {e}")
+                is_ok = False
+            latencies.append(time.perf_counter() - started_at)
+            if not is_ok:
+                errors += 1
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(run_one(i) for i in range(count)))
+    return summarize(
+        handler, cohort, latencies, errors, time.perf_counter() - started_at
+    )
+
+
+class Cohort(BenchmarkEnvironment):
+    """Synthetic students with their state store, fake bot and fake Sheets"""
+
+    def __init__(self, size: int, workdir: str, backend: str, write_behind: bool):
+        super().__init__(workdir, backend, write_behind)
+        self.size = size
+        self.tokens = make_tokens(size)
+        self.token_list = list(self.tokens)
+        self.bot = FakeBot()
+
+    def user(self, i: int) -> FakeUser:
+        return FakeUser(FIRST_USER_ID + i, f"student{i}")
+
+    def command(self, i: int, text: str, args: list = None) -> tuple:
+        update = FakeUpdate(self.user(i), FakeMessage(text=text))
+        return update, FakeContext(self.bot, args)
+
+    def submission(self, i: int) -> tuple:
+        user = self.user(i)
+        document = FakeDocument(f"file-{i}", f"unique-{i}", "task1.py")
+        self.bot.add_file(
+            document.file_id, SOLUTION.format(username=user.username).encode()
+        )
+        update = FakeUpdate(user, FakeMessage(document=document))
+        return update, FakeContext(self.bot)
+
+    async def last_reply(self, i: int) -> str:
+        messages = self.bot.messages.get(FIRST_USER_ID + i, [])
+        return messages[-1].text if messages else ""
+
+
+async def _benchmark_cohort(
+    handlers, size: int, args: argparse.Namespace, workdir: str
+) -> list:
+    cohort = Cohort(size, workdir, args.backend, args.write_behind)
+    await cohort.store.start()
+    results = []
+
+    async def phase(handler: str, count: int, operation) -> None:
+        result = await _run_phase(handler, size, count, args.concurrency, operation)
+        results.append(result)
+        print_result(result)
+
+    async def upload(i: int) -> bool:
+        await cohort.store.replace_tokens(cohort.tokens)
+        await fulfill_worksheets(cohort.tokens)
+        return True
+
+    async def login(i: int) -> bool:
+        token = cohort.token_list[i]
+        await handlers.login(*cohort.command(i, f"/login {token}", [token]))
+        return "Успешная авторизация" in await cohort.last_reply(i)
+
+    async def login_status(i: int) -> bool:
+        await handlers.login_status(*cohort.command(i, "/login_status"))
+        return (await cohort.last_reply(i)).startswith("[Статус]")
+
+    async def progress(i: int) -> bool:
+        await handlers.progress(*cohort.command(i, "/progress"))
+        return (await cohort.last_reply(i)).startswith("[Прогресс]")
+
+    async def py_file(i: int) -> bool:
+        # Measured until the verdict arrives, the queue position reply comes first
+        chat_id = FIRST_USER_ID + i
+        since = cohort.bot.sent_count(chat_id)
+        await handlers.py_file_handler(*cohort.submission(i))
+        verdict = await cohort.bot.wait_for_message(
+            chat_id, since, lambda message: not message.text.startswith("[Проверка]")
+        )
+        return "зачтена" in verdict.text
+
+    async def sheets_drain(i: int) -> bool:
+        await cohort.outbox.drain()
+        return not len(cohort.outbox)
+
+    async def logout(i: int) -> bool:
+        await handlers.logout(*cohort.command(i, "/logout"))
+        return "Успешный выход" in await cohort.last_reply(i)
+
+    submissions = min(size, args.submissions)
+    await phase("upload_students", 1, upload)
+    await phase("login", size, login)
+    await phase("login_status", size, login_status)
+    await phase("progress", size, progress)
+    await phase("py_file_handler", submissions, py_file)
+
+    cohort.sheets.reset_calls()
+    await phase("sheets_drain", 1, sheets_drain)
+    results[-1]["api_calls"] = cohort.sheets.total_calls
+    results[-1]["writes"] = submissions
+
+    await phase("logout", size, logout)
+    await cohort.store.close()
+    return results
+
+
+async def _run(args: argparse.Namespace) -> dict:
+    handlers = _load_handlers()
+    # Measures the handlers themselves, not Telegram's send limits
+    set_send_throttle(SendThrottle(global_rate=0, chat_rate=0))
+    start_style_checker()
+    print_header()
+    results = []
+    try:
+        for size in args.sizes:
+            with tempfile.TemporaryDirectory(prefix="gsem_benchmark_") as workdir:
+                results.extend(await _benchmark_cohort(handlers, size, args, workdir))
+    finally:
+        await get_grading_queue().stop()
+        stop_style_checker()
+    return {
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "backend": args.backend,
+        "write_behind": args.write_behind,
+        "concurrency": args.concurrency,
+        "results": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Drives the bot handlers with synthetic Telegram updates"
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument(
+        "--submissions",
+        type=int,
+        default=200,
+        help="graded .py files per cohort, every one runs the real sandbox",
+    )
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument(
+        "--backend", choices=[JSON_BACKEND, SQLITE_BACKEND], default=JSON_BACKEND
+    )
+    parser.add_argument("--write-behind", action="store_true")
+    parser.add_argument("--json", help="file for machine-readable results")
+    parser.add_argument("--verbose", action="store_true", help="keep bot logging")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.disable(logging.CRITICAL)
+    report = asyncio.run(_run(args))
+    if args.json:
+        save_report(args.json, report)
+        print(f"Results saved to {args.json}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+import argparse
+import asyncio
+import logging
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from src.benchmarks.common import (
+    FIRST_USER_ID,
+    SOLUTION,
+    BenchmarkEnvironment,
+    git_commit,
+    make_tokens,
+    print_header,
+    print_result,
+    save_report,
+    summarize,
+)
+from src.config.storage_config import JSON_BACKEND, SQLITE_BACKEND
+from src.fakes.fake_bot_api import FakeBotApi
+from src.services.spreadsheet_service import fulfill_worksheets
+from src.services.webhook_server import WebhookServer
+
+# Usage: python -m src.benchmarks.load_test --students 300 [--webhook] --json out.json
+
+BOT_TOKEN = "123456:load-test"
+WEBHOOK_SECRET = "load-test-secret"
+PY_MIME_TYPE = "text/x-python"
+
+
+def _load_bot_class():
+    # bot_handlers reads the admin list at import time
+    os.environ.setdefault("ADMIN_USERNAMES", "load_test_admin")
+    from src.bot import Bot
+
+    return Bot
+
+
+class Step:
+    """One student action: the update to push and the reply that completes it"""
+
+    def __init__(self, name: str, expected: str, is_final=None):
+        self.name = name
+        self.expected = expected
+        # Intermediate replies, like the queue position, don't complete a step
+        self.is_final = is_final
+        self.latencies = []
+        self.errors = 0
+        self.timeouts = 0
+
+
+async def simulate_students(
+    api: FakeBotApi, tokens: list, args: argparse.Namespace
+) -> list:
+    login = Step("login", "Успешная авторизация")
+    py_file = Step(
+        "py_file_handler",
+        "зачтена",
+        lambda message: not message.text.startswith("[Проверка]"),
+    )
+    progress = Step("progress", "[Прогресс]")
+    logout = Step("logout", "Успешный выход")
+
+    async def run_step(step: Step, user_id: int, push) -> None:
+        since = api.sent_count(user_id)
+        started_at = time.perf_counter()
+        await push()
+        reply = await api.wait_for_message(
+            user_id, since, step.is_final, args.reply_timeout
+        )
+        if reply is None:
+            step.timeouts += 1
+            step.errors += 1
+            return
+        step.latencies.append(reply.received_at - started_at)
+        if step.expected not in reply.text:
+            step.errors += 1
+
+    async def student(i: int) -> None:
+        await asyncio.sleep(random.uniform(0, args.ramp_up))
+        user_id = FIRST_USER_ID + i
+        username = f"student{i}"
+        solution = SOLUTION.format(username=username).encode()
+        await run_step(
+            login,
+            user_id,
+            lambda: api.push_command(user_id, username, f"/login {tokens[i]}"),
+        )
+        await run_step(
+            py_file,
+            user_id,
+            lambda: api.push_document(
+                user_id, username, "task1.py", solution, PY_MIME_TYPE
+            ),
+        )
+        await run_step(
+            progress, user_id, lambda: api.push_command(user_id, username, "/progress")
+        )
+        await run_step(
+            logout, user_id, lambda: api.push_command(user_id, username, "/logout")
+        )
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(student(i) for i in range(len(tokens))))
+    elapsed = time.perf_counter() - started_at
+
+    results = []
+    for step in (login, py_file, progress, logout):
+        result = summarize(step.name, len(tokens), step.latencies, step.errors, elapsed)
+        result["timeouts"] = step.timeouts
+        result["error_rate"] = round(step.errors / len(tokens), 4) if tokens else 0.0
+        results.append(result)
+        print_result(result)
+    return results
+
+
+async def _run(args: argparse.Namespace) -> dict:
+    Bot = _load_bot_class()
+    print_header()
+    with tempfile.TemporaryDirectory(prefix="gsem_load_test_") as workdir:
+        environment = BenchmarkEnvironment(workdir, args.backend, args.write_behind)
+        tokens = make_tokens(args.students)
+        await environment.store.replace_tokens(tokens)
+        await fulfill_worksheets(tokens)
+
+        api = FakeBotApi(BOT_TOKEN)
+        await api.start()
+        bot = Bot(BOT_TOKEN, base_url=api.base_url, base_file_url=api.base_file_url)
+        application = bot.application
+        if args.webhook:
+            webhook_server = WebhookServer(
+                application.bot,
+                application.update_queue,
+                "127.0.0.1",
+                0,
+                "/telegram",
+                WEBHOOK_SECRET,
+            )
+            await bot.start_webhook(webhook_server)
+            # The fake API posts every pushed update to the webhook from now on
+            await application.bot.set_webhook(
+                webhook_server.url, secret_token=WEBHOOK_SECRET
+            )
+        else:
+            # What run_polling does, without taking over the event loop
+            await application.initialize()
+            await application.post_init(application)
+            await application.updater.start_polling(
+                poll_interval=0, timeout=args.poll_timeout
+            )
+            await application.start()
+        try:
+            results = await simulate_students(api, list(tokens), args)
+        finally:
+            if args.webhook:
+                await bot.stop_webhook()
+            else:
+                await application.updater.stop()
+                await application.stop()
+                await application.post_stop(application)
+                await application.post_shutdown(application)
+                await application.shutdown()
+            await api.stop()
+
+    return {
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "students": args.students,
+        "ramp_up_seconds": args.ramp_up,
+        "backend": args.backend,
+        "write_behind": args.write_behind,
+        "webhook": args.webhook,
+        "bot_api_calls": dict(api.calls),
+        "sheets_api_calls": dict(environment.sheets.calls),
+        "results": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Runs the whole bot against a local fake Bot API and "
+        "simulates students logging in and submitting files"
+    )
+    parser.add_argument("--students", type=int, default=300)
+    parser.add_argument(
+        "--ramp-up", type=float, default=5, help="seconds over which students arrive"
+    )
+    parser.add_argument("--reply-timeout", type=float, default=120)
+    parser.add_argument("--poll-timeout", type=int, default=10)
+    parser.add_argument(
+        "--backend", choices=[JSON_BACKEND, SQLITE_BACKEND], default=JSON_BACKEND
+    )
+    parser.add_argument("--write-behind", action="store_true")
+    parser.add_argument(
+        "--webhook",
+        action="store_true",
+        help="receive updates through the webhook server instead of polling",
+    )
+    parser.add_argument("--json", help="file for machine-readable results")
+    parser.add_argument("--verbose", action="store_true", help="keep bot logging")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.disable(logging.CRITICAL)
+    report = asyncio.run(_run(args))
+    if args.json:
+        save_report(args.json, report)
+        print(f"Results saved to {args.json}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
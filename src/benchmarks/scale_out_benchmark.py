@@ -0,0 +1,138 @@
+import argparse
+import asyncio
+import functools
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from src.benchmarks.common import (
+    BenchmarkEnvironment,
+    git_commit,
+    make_tokens,
+    print_header,
+    save_report,
+)
+from src.benchmarks.load_test import BOT_TOKEN, simulate_students
+from src.config.storage_config import SQLITE_BACKEND
+from src.fakes.fake_bot_api import FakeBotApi
+from src.services.send_throttle import SendThrottle, set_send_throttle
+from src.services.spreadsheet_service import fulfill_worksheets
+from src.storage.sqlite_storage import SqliteStorage
+
+# Usage: python -m src.benchmarks.scale_out_benchmark --workers 1 2 4 --json out.json
+
+DEFAULT_WORKERS = [1, 2, 4]
+
+
+def _load_dispatcher_class():
+    # bot_handlers reads the admin list at import time
+    os.environ.setdefault("ADMIN_USERNAMES", "scale_out_admin")
+    from src.dispatcher import Dispatcher
+
+    return Dispatcher
+
+
+def _prepare_worker(workdir: str, is_quiet: bool) -> None:
+    """Runs in every worker process before its Bot is built"""
+    if is_quiet:
+        logging.disable(logging.CRITICAL)
+    environment = BenchmarkEnvironment(workdir, SQLITE_BACKEND, False, True)
+    # Measures the bot, not Telegram's send limits
+    set_send_throttle(SendThrottle(global_rate=0, chat_rate=0))
+    tokens, _ = environment.store.storage.load()
+    asyncio.run(fulfill_worksheets(tokens))
+
+
+async def _measure(Dispatcher, workers: int, args: argparse.Namespace) -> dict:
+    with tempfile.TemporaryDirectory(prefix="gsem_scale_out_") as workdir:
+        tokens = make_tokens(args.students)
+        storage = SqliteStorage(os.path.join(workdir, "state.db"))
+        storage.replace_tokens(tokens)
+        storage.close()
+
+        api = FakeBotApi(BOT_TOKEN)
+        await api.start()
+        dispatcher = Dispatcher(
+            BOT_TOKEN,
+            workers,
+            api.base_url,
+            api.base_file_url,
+            functools.partial(_prepare_worker, workdir, not args.verbose),
+            # The workers are pointed at the database in workdir by _prepare_worker
+            storage_backend=SQLITE_BACKEND,
+        )
+        await dispatcher.start()
+        try:
+            started_at = time.perf_counter()
+            results = await simulate_students(api, list(tokens), args)
+            elapsed = time.perf_counter() - started_at
+        finally:
+            await dispatcher.stop()
+            await api.stop()
+
+    return {
+        "workers": workers,
+        "seconds": round(elapsed, 3),
+        "students_per_s": round(args.students / elapsed, 2) if elapsed else 0.0,
+        "updates_per_worker": dispatcher.forwarded,
+        "errors": sum(result["errors"] for result in results),
+        "results": results,
+    }
+
+
+async def _run(args: argparse.Namespace) -> dict:
+    Dispatcher = _load_dispatcher_class()
+    runs = []
+    for workers in args.workers:
+        print(f"\nworkers: {workers}")
+        print_header()
+        runs.append(await _measure(Dispatcher, workers, args))
+
+    baseline = runs[0]["students_per_s"] if runs else 0.0
+    print(f'\n{"workers":>7} {"seconds":>9} {"students/s":>11} {"speedup":>8}')
+    for run in runs:
+        run["speedup"] = round(run["students_per_s"] / baseline, 2) if baseline else 0.0
+        print(
+            f'{run["workers"]:>7} {run["seconds"]:>9.2f} '
+            f'{run["students_per_s"]:>11.2f} {run["speedup"]:>8.2f}'
+        )
+    return {
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "students": args.students,
+        "ramp_up_seconds": args.ramp_up,
+        "runs": runs,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Runs the dispatcher with a growing number of worker processes "
+        "against a local fake Bot API and compares the throughput"
+    )
+    parser.add_argument("--workers", type=int, nargs="+", default=DEFAULT_WORKERS)
+    parser.add_argument("--students", type=int, default=200)
+    parser.add_argument(
+        "--ramp-up", type=float, default=1, help="seconds over which students arrive"
+    )
+    parser.add_argument("--reply-timeout", type=float, default=300)
+    parser.add_argument("--json", help="file for machine-readable results")
+    parser.add_argument("--verbose", action="store_true", help="keep bot logging")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.disable(logging.CRITICAL)
+    report = asyncio.run(_run(args))
+    if args.json:
+        save_report(args.json, report)
+        print(f"Results saved to {args.json}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,53 @@
+import asyncio
 import logging
 
 from telegram.ext import ApplicationBuilder
 
+from src.config.telegram_config import (
+    TELEGRAM_API_BASE_FILE_URL,
+    TELEGRAM_API_BASE_URL,
+)
 from src.handlers.bot_handlers import get_handlers
+from src.services.grading_cache import get_grading_cache
+from src.services.grading_queue import get_grading_queue
+from src.services.lane_application import LaneApplication
+from src.services.metrics_server import start_metrics_server, stop_metrics_server
+from src.services.sandbox_runner import get_interpreter_pool
+from src.services.sheets_client import get_sheets_client
+from src.services.sheets_outbox import get_sheets_outbox
+from src.services.style_checker import start_style_checker, stop_style_checker
+from src.services.webhook_server import WebhookServer, register_webhook
+from src.storage.state_store import get_state_store
+from src.utils.io_executor import shutdown_io_executors
+from src.utils.signals import wait_for_stop_signal
 
 
 class Bot:
-    def __init__(self, token):
+    def __init__(
+        self,
+        token,
+        base_url=TELEGRAM_API_BASE_URL,
+        base_file_url=TELEGRAM_API_BASE_FILE_URL,
+    ):
         self.TOKEN = token
-        self.application = ApplicationBuilder().token(token).build()
+        # Forked before anything here starts a thread
+        start_style_checker()
+        get_state_store()
+        get_grading_cache()
+        builder = (
+            ApplicationBuilder()
+            .token(token)
+            .application_class(LaneApplication)
+            .post_init(self._post_init)
+            .post_stop(self._post_stop)
+            .post_shutdown(self._post_shutdown)
+        )
+        if base_url:
+            builder = builder.base_url(base_url)
+        if base_file_url:
+            builder = builder.base_file_url(base_file_url)
+        self.application = builder.build()
+        self.webhook_server = None
         handlers = get_handlers()
         self._initialize_handlers(handlers)
 
@@ -16,6 +55,74 @@ class Bot:
         for handler in handlers:
             self.application.add_handler(handler)
 
+    @staticmethod
+    async def _post_init(application):
+        await get_state_store().start()
+        await get_interpreter_pool().start()
+        await get_grading_queue().start()
+        await get_sheets_outbox().start()
+        await start_metrics_server()
+
+    @staticmethod
+    async def _post_stop(application):
+        # Graded while the bot can still send the verdicts
+        await get_grading_queue().stop()
+
+    @staticmethod
+    async def _post_shutdown(application):
+        await stop_metrics_server()
+        await get_interpreter_pool().stop()
+        await get_sheets_outbox().stop()
+        await get_state_store().close()
+        await get_grading_cache().save()
+        stop_style_checker()
+        get_sheets_client().close()
+        # Last, the final flush and the saves above run on these threads
+        shutdown_io_executors()
+
     def run_polling(self):
         logging.warning("Starting bot in polling mode")
         self.application.run_polling()
+
+    def run_webhook(self):
+        logging.warning("Starting bot in webhook mode")
+        asyncio.run(self._serve_webhook())
+
+    async def _serve_webhook(self):
+        await self.start_webhook()
+        try:
+            await wait_for_stop_signal()
+        finally:
+            await self.stop_webhook()
+
+    async def start(self):
+        """Starts handling updates put into the update queue, like run_* do first"""
+        application = self.application
+        await application.initialize()
+        await application.post_init(application)
+        await application.start()
+
+    async def stop(self):
+        application = self.application
+        if application.running:
+            await application.stop()
+        await application.post_stop(application)
+        await application.shutdown()
+        await application.post_shutdown(application)
+
+    async def start_webhook(self, webhook_server: WebhookServer = None):
+        """What run_webhook does before serving, without taking over the event loop"""
+        await self.start()
+        application = self.application
+        self.webhook_server = webhook_server or WebhookServer(
+            application.bot, application.update_queue
+        )
+        await self.webhook_server.start()
+        await register_webhook(application.bot)
+
+    async def stop_webhook(self):
+        # The webhook stays registered, another instance may still be serving it
+        if self.webhook_server is not None:
+            await self.webhook_server.stop()
+            self.webhook_server = None
+        await self.stop()
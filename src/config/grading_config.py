@@ -0,0 +1,22 @@
+import os
+
+_STYLE_CHECK_WORKERS = "STYLE_CHECK_WORKERS"
+
+# Processes that keep a ready flake8 StyleGuide for PEP8 checks
+STYLE_CHECK_WORKERS = int(os.environ.get(_STYLE_CHECK_WORKERS, "2"))
+
+_GRADING_CACHE_SIZE = "GRADING_CACHE_SIZE"
+
+# Verdicts kept for identical resubmissions, least recently used are dropped
+GRADING_CACHE_SIZE = int(os.environ.get(_GRADING_CACHE_SIZE, "10000"))
+
+_GRADING_WORKERS = "GRADING_WORKERS"
+_GRADING_QUEUE_MAX_DEPTH = "GRADING_QUEUE_MAX_DEPTH"
+_GRADING_DRAIN_TIMEOUT = "GRADING_DRAIN_TIMEOUT"
+
+# Submissions graded at the same time
+GRADING_WORKERS = int(os.environ.get(_GRADING_WORKERS, "4"))
+# Submissions waiting for a worker, new ones are rejected beyond it
+GRADING_QUEUE_MAX_DEPTH = int(os.environ.get(_GRADING_QUEUE_MAX_DEPTH, "200"))
+# Seconds a stopping bot waits for queued submissions to be graded
+GRADING_DRAIN_TIMEOUT = float(os.environ.get(_GRADING_DRAIN_TIMEOUT, "60"))
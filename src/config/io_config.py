@@ -0,0 +1,6 @@
+import os
+
+_IO_WORKERS = "IO_WORKERS"
+
+# Threads for file operations, persistence always uses its own single thread
+IO_WORKERS = int(os.environ.get(_IO_WORKERS, "4"))
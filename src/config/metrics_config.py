@@ -0,0 +1,13 @@
+import os
+
+from src.config.scale_out_config import BOT_WORKER_ID
+
+_METRICS_HOST = "METRICS_HOST"
+_METRICS_PORT = "METRICS_PORT"
+
+METRICS_HOST = os.environ.get(_METRICS_HOST, "127.0.0.1")
+# Prometheus endpoint at /metrics, disabled when not set
+METRICS_PORT = int(os.environ[_METRICS_PORT]) if os.environ.get(_METRICS_PORT) else None
+# Worker N behind a dispatcher listens on METRICS_PORT + 1 + N
+if METRICS_PORT is not None and BOT_WORKER_ID is not None:
+    METRICS_PORT += 1 + BOT_WORKER_ID
@@ -0,0 +1,13 @@
+import os
+
+from src.utils.namings import PROFILES_DIR
+
+_PROFILE_HANDLERS = "PROFILE_HANDLERS"
+_PROFILE_KEEP_SLOWEST = "PROFILE_KEEP_SLOWEST"
+_PROFILE_DIR = "PROFILE_DIR"
+
+# Handlers are wrapped with cProfile only when enabled, nothing is added otherwise
+PROFILE_HANDLERS = os.environ.get(_PROFILE_HANDLERS, "false").lower() == "true"
+# Number of the slowest updates whose profiles are kept on disk
+PROFILE_KEEP_SLOWEST = int(os.environ.get(_PROFILE_KEEP_SLOWEST, 20))
+PROFILE_DIR = os.environ.get(_PROFILE_DIR, PROFILES_DIR)
@@ -0,0 +1,30 @@
+import os
+import sys
+
+_SUBMISSION_PYTHON = "SUBMISSION_PYTHON"
+_SUBMISSION_WALL_TIMEOUT = "SUBMISSION_WALL_TIMEOUT"
+_SUBMISSION_CPU_TIMEOUT = "SUBMISSION_CPU_TIMEOUT"
+_SUBMISSION_MEMORY_LIMIT_MB = "SUBMISSION_MEMORY_LIMIT_MB"
+_SUBMISSION_MAX_OUTPUT_BYTES = "SUBMISSION_MAX_OUTPUT_BYTES"
+_SUBMISSION_ISOLATE_NETWORK = "SUBMISSION_ISOLATE_NETWORK"
+
+SUBMISSION_PYTHON = os.environ.get(_SUBMISSION_PYTHON, sys.executable)
+# Seconds of real time before the submission is killed
+SUBMISSION_WALL_TIMEOUT = float(os.environ.get(_SUBMISSION_WALL_TIMEOUT, "10"))
+# Seconds of CPU time, enforced by RLIMIT_CPU
+SUBMISSION_CPU_TIMEOUT = int(os.environ.get(_SUBMISSION_CPU_TIMEOUT, "5"))
+# Address space limit, enforced by RLIMIT_AS
+SUBMISSION_MEMORY_LIMIT_MB = int(os.environ.get(_SUBMISSION_MEMORY_LIMIT_MB, "256"))
+# Stdout and stderr are cut (and the submission killed) beyond this size
+SUBMISSION_MAX_OUTPUT_BYTES = int(
+    os.environ.get(_SUBMISSION_MAX_OUTPUT_BYTES, str(1024 * 1024))
+)
+# Runs every submission in its own empty network namespace
+SUBMISSION_ISOLATE_NETWORK = (
+    os.environ.get(_SUBMISSION_ISOLATE_NETWORK, "true").lower() == "true"
+)
+
+_SUBMISSION_POOL_SIZE = "SUBMISSION_POOL_SIZE"
+
+# Interpreters kept started and waiting for a submission, 0 starts one per run
+SUBMISSION_POOL_SIZE = int(os.environ.get(_SUBMISSION_POOL_SIZE, "4"))
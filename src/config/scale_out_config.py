@@ -0,0 +1,19 @@
+import os
+
+BOT_WORKERS_ENV = "BOT_WORKERS"
+BOT_WORKER_ID_ENV = "BOT_WORKER_ID"
+
+# Worker processes fed by a dispatcher, with 1 the bot runs in a single process
+BOT_WORKERS = int(os.environ.get(BOT_WORKERS_ENV, 1))
+# Set by the dispatcher in every worker process
+BOT_WORKER_ID = (
+    int(os.environ[BOT_WORKER_ID_ENV]) if os.environ.get(BOT_WORKER_ID_ENV) else None
+)
+
+
+def per_worker_path(path: str) -> str:
+    """Gives each worker its own copy of a file that only one process may write"""
+    if BOT_WORKER_ID is None:
+        return path
+    root, extension = os.path.splitext(path)
+    return f"{root}_worker{BOT_WORKER_ID}{extension}"
@@ -0,0 +1,35 @@
+import os
+
+_SHEETS_CREDENTIALS_FILE = "SHEETS_CREDENTIALS_FILE"
+_SPREADSHEET_NAME = "SPREADSHEET_NAME"
+_SHEETS_HANDLE_TTL_SECONDS = "SHEETS_HANDLE_TTL_SECONDS"
+_SHEETS_WORKERS = "SHEETS_WORKERS"
+
+SHEETS_CREDENTIALS_FILE = os.environ.get(
+    _SHEETS_CREDENTIALS_FILE,
+    "C:\\Users\\nikit\\PycharmProjects\\GSEM_URFU_bot\\spreadsheets_data\\gsembotproject-f2e927905a89.json",
+)
+SPREADSHEET_NAME = os.environ.get(_SPREADSHEET_NAME, "Student-Progress")
+# Spreadsheet and worksheet handles are reopened after this many seconds
+SHEETS_HANDLE_TTL_SECONDS = float(os.environ.get(_SHEETS_HANDLE_TTL_SECONDS, "600"))
+# Threads running gspread calls, so Sheets latency never blocks the event loop
+SHEETS_WORKERS = int(os.environ.get(_SHEETS_WORKERS, "4"))
+
+_SHEETS_OUTBOX_INTERVAL_SECONDS = "SHEETS_OUTBOX_INTERVAL_SECONDS"
+_SHEETS_BACKOFF_BASE_SECONDS = "SHEETS_BACKOFF_BASE_SECONDS"
+_SHEETS_BACKOFF_MAX_SECONDS = "SHEETS_BACKOFF_MAX_SECONDS"
+_SHEETS_BREAKER_FAILURES = "SHEETS_BREAKER_FAILURES"
+_SHEETS_BREAKER_COOLDOWN_SECONDS = "SHEETS_BREAKER_COOLDOWN_SECONDS"
+
+# Pause between outbox drains while Google answers fine
+SHEETS_OUTBOX_INTERVAL_SECONDS = float(
+    os.environ.get(_SHEETS_OUTBOX_INTERVAL_SECONDS, "2")
+)
+# Retry delay after a failed drain, doubled on every next failure up to the max
+SHEETS_BACKOFF_BASE_SECONDS = float(os.environ.get(_SHEETS_BACKOFF_BASE_SECONDS, "2"))
+SHEETS_BACKOFF_MAX_SECONDS = float(os.environ.get(_SHEETS_BACKOFF_MAX_SECONDS, "120"))
+# Failures in a row that stop all Sheets calls for the cooldown
+SHEETS_BREAKER_FAILURES = int(os.environ.get(_SHEETS_BREAKER_FAILURES, "5"))
+SHEETS_BREAKER_COOLDOWN_SECONDS = float(
+    os.environ.get(_SHEETS_BREAKER_COOLDOWN_SECONDS, "300")
+)
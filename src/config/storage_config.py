@@ -0,0 +1,21 @@
+import os
+
+_STORAGE_BACKEND = "STORAGE_BACKEND"
+
+JSON_BACKEND = "json"
+SQLITE_BACKEND = "sqlite"
+
+# "json" keeps tokens.json/sessions.json, "sqlite" uses STATE_DB_FILE
+STORAGE_BACKEND = os.environ.get(_STORAGE_BACKEND, JSON_BACKEND).lower()
+
+_PERSISTENCE_MODE = "PERSISTENCE_MODE"
+_FLUSH_INTERVAL_SECONDS = "FLUSH_INTERVAL_SECONDS"
+_FLUSH_DIRTY_THRESHOLD = "FLUSH_DIRTY_THRESHOLD"
+
+IMMEDIATE_MODE = "immediate"
+WRITE_BEHIND_MODE = "write_behind"
+
+# "write_behind" keeps JSON changes in memory and flushes them in batches
+PERSISTENCE_MODE = os.environ.get(_PERSISTENCE_MODE, IMMEDIATE_MODE).lower()
+FLUSH_INTERVAL_SECONDS = float(os.environ.get(_FLUSH_INTERVAL_SECONDS, "5"))
+FLUSH_DIRTY_THRESHOLD = int(os.environ.get(_FLUSH_DIRTY_THRESHOLD, "100"))
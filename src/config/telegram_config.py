@@ -0,0 +1,49 @@
+import os
+
+_TELEGRAM_API_BASE_URL = "TELEGRAM_API_BASE_URL"
+_TELEGRAM_API_BASE_FILE_URL = "TELEGRAM_API_BASE_FILE_URL"
+
+# Another Bot API server, e.g. a local one for load tests. The token is appended
+TELEGRAM_API_BASE_URL = os.environ.get(_TELEGRAM_API_BASE_URL) or None
+TELEGRAM_API_BASE_FILE_URL = os.environ.get(_TELEGRAM_API_BASE_FILE_URL) or None
+
+_TELEGRAM_GLOBAL_RATE = "TELEGRAM_GLOBAL_RATE"
+_TELEGRAM_CHAT_RATE = "TELEGRAM_CHAT_RATE"
+_TELEGRAM_CHAT_BURST = "TELEGRAM_CHAT_BURST"
+_TELEGRAM_MAX_MESSAGE_CHUNKS = "TELEGRAM_MAX_MESSAGE_CHUNKS"
+_TELEGRAM_SEND_RETRIES = "TELEGRAM_SEND_RETRIES"
+
+# Sent messages per second, Telegram allows about 30 overall and 1 per chat. 0 disables
+TELEGRAM_GLOBAL_RATE = float(os.environ.get(_TELEGRAM_GLOBAL_RATE, 30))
+TELEGRAM_CHAT_RATE = float(os.environ.get(_TELEGRAM_CHAT_RATE, 1))
+# Messages a chat may get at once before the per-chat rate applies
+TELEGRAM_CHAT_BURST = int(os.environ.get(_TELEGRAM_CHAT_BURST, 3))
+# Longer replies are sent as a text file instead of that many messages
+TELEGRAM_MAX_MESSAGE_CHUNKS = int(os.environ.get(_TELEGRAM_MAX_MESSAGE_CHUNKS, 4))
+# Resends after a 429 "Too Many Requests", waiting as long as Telegram asks
+TELEGRAM_SEND_RETRIES = int(os.environ.get(_TELEGRAM_SEND_RETRIES, 3))
+
+_BOT_MODE = "BOT_MODE"
+_WEBHOOK_HOST = "WEBHOOK_HOST"
+_WEBHOOK_PORT = "WEBHOOK_PORT"
+_WEBHOOK_PATH = "WEBHOOK_PATH"
+_WEBHOOK_URL = "WEBHOOK_URL"
+_WEBHOOK_SECRET_TOKEN = "WEBHOOK_SECRET_TOKEN"
+
+POLLING_MODE = "polling"
+WEBHOOK_MODE = "webhook"
+
+# "webhook" serves updates pushed by Telegram instead of long polling for them
+BOT_MODE = os.environ.get(_BOT_MODE, POLLING_MODE).lower()
+WEBHOOK_HOST = os.environ.get(_WEBHOOK_HOST, "0.0.0.0")
+WEBHOOK_PORT = int(os.environ.get(_WEBHOOK_PORT, 8443))
+WEBHOOK_PATH = os.environ.get(_WEBHOOK_PATH, "/telegram")
+# Public URL Telegram posts to, e.g. of the load balancer. Registered at startup if set
+WEBHOOK_URL = os.environ.get(_WEBHOOK_URL) or None
+# Sent by Telegram in X-Telegram-Bot-Api-Secret-Token, requests without it are rejected
+WEBHOOK_SECRET_TOKEN = os.environ.get(_WEBHOOK_SECRET_TOKEN) or None
+
+_UPDATE_CONCURRENCY = "UPDATE_CONCURRENCY"
+
+# Updates handled at once, updates of one user are always handled in order
+UPDATE_CONCURRENCY = int(os.environ.get(_UPDATE_CONCURRENCY, 32))
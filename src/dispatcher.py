@@ -0,0 +1,245 @@
+import asyncio
+import functools
+import logging
+import multiprocessing
+import os
+import signal
+
+from telegram import Bot as TelegramBot
+from telegram import Update
+from telegram.ext import Updater
+
+from src.bot import Bot
+from src.config.grading_config import GRADING_DRAIN_TIMEOUT
+from src.config.scale_out_config import BOT_WORKER_ID_ENV, BOT_WORKERS, BOT_WORKERS_ENV
+from src.config.storage_config import SQLITE_BACKEND, STORAGE_BACKEND
+from src.config.telegram_config import (
+    BOT_MODE,
+    TELEGRAM_API_BASE_FILE_URL,
+    TELEGRAM_API_BASE_URL,
+    WEBHOOK_MODE,
+)
+from src.services.style_checker import start_style_checker
+from src.services.webhook_server import WebhookServer, register_webhook
+from src.utils.signals import wait_for_stop_signal
+
+_WORKER_START_TIMEOUT = 120
+# A stopping worker first grades its queued submissions
+_WORKER_STOP_TIMEOUT = GRADING_DRAIN_TIMEOUT + 60
+_MONITOR_INTERVAL_SECONDS = 1
+
+
+class Dispatcher:
+    """Receives updates and shards them by user across worker processes.
+
+    Every worker runs the whole Bot with its own grading queue, style checker
+    and Sheets outbox, and shares tokens and sessions with the others through
+    the SQLite database. All updates of a user go to the same worker, whose
+    lanes keep them in order. A worker that exits is started again. Raises
+    ValueError unless the storage backend is SQLite, other backends aren't
+    shared between processes.
+
+    `worker_setup` is called in every worker before its Bot is built, e.g. to
+    point the services at test doubles. It must be picklable.
+    """
+
+    def __init__(
+        self,
+        token: str,
+        workers: int = BOT_WORKERS,
+        base_url: str = TELEGRAM_API_BASE_URL,
+        base_file_url: str = TELEGRAM_API_BASE_FILE_URL,
+        worker_setup=None,
+        storage_backend: str = STORAGE_BACKEND,
+    ):
+        if storage_backend != SQLITE_BACKEND:
+            raise ValueError(
+                "Worker processes share state through SQLite, set STORAGE_BACKEND="
+                f"{SQLITE_BACKEND} and move JSON state there with migrate_json_to_sqlite"
+            )
+        self.token = token
+        self.workers = workers
+        self.base_url = base_url
+        self.base_file_url = base_file_url
+        self.worker_setup = worker_setup
+        self.bot = _telegram_bot(token, base_url, base_file_url)
+        self.forwarded = [0] * workers
+        self.updater = None
+        self.webhook_server = None
+        self.update_queue = None
+        self._context = multiprocessing.get_context("spawn")
+        self._worker_queues = [self._context.Queue() for _ in range(workers)]
+        self._ready = self._context.Queue()
+        self._processes = [None] * workers
+        self._tasks = []
+        self._is_stopping = False
+
+    def run(self):
+        logging.warning(f"Starting dispatcher with {self.workers} worker processes")
+        asyncio.run(self._serve())
+
+    async def _serve(self):
+        await self.start()
+        try:
+            await wait_for_stop_signal()
+        finally:
+            await self.stop()
+
+    def shard(self, update: Update) -> int:
+        if update.effective_user is not None:
+            return update.effective_user.id % self.workers
+        if update.effective_chat is not None:
+            return update.effective_chat.id % self.workers
+        return 0
+
+    async def start(self):
+        for index in range(self.workers):
+            self._start_worker(index)
+        await self._wait_for_workers()
+
+        self.update_queue = asyncio.Queue()
+        self._tasks = [
+            asyncio.create_task(self._forward_updates()),
+            asyncio.create_task(self._restart_exited_workers()),
+        ]
+        await self.bot.initialize()
+        if BOT_MODE == WEBHOOK_MODE:
+            self.webhook_server = WebhookServer(self.bot, self.update_queue)
+            await self.webhook_server.start()
+            await register_webhook(self.bot)
+        else:
+            self.updater = Updater(self.bot, self.update_queue)
+            await self.updater.initialize()
+            await self.updater.start_polling()
+
+    async def stop(self):
+        """Undoes what start got to, so it also cleans up after a failed start"""
+        self._is_stopping = True
+        if self.updater is not None:
+            if self.updater.running:
+                await self.updater.stop()
+            await self.updater.shutdown()
+        if self.webhook_server is not None:
+            await self.webhook_server.stop()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        # Updates received before stopping are still handled by the workers
+        while self.update_queue is not None and not self.update_queue.empty():
+            self._forward(self.update_queue.get_nowait())
+        for worker_queue in self._worker_queues:
+            worker_queue.put(None)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._join_workers)
+        await self.bot.shutdown()
+
+    def _start_worker(self, index: int) -> None:
+        # Spawned workers inherit the environment, their config reads the id from it
+        saved_workers = os.environ.get(BOT_WORKERS_ENV)
+        os.environ[BOT_WORKER_ID_ENV] = str(index)
+        os.environ[BOT_WORKERS_ENV] = str(self.workers)
+        try:
+            process = self._context.Process(
+                target=_run_worker,
+                args=(
+                    index,
+                    self.token,
+                    self.base_url,
+                    self.base_file_url,
+                    self._worker_queues[index],
+                    self._ready,
+                    self.worker_setup,
+                ),
+                name=f"bot-worker-{index}",
+            )
+            process.start()
+        finally:
+            del os.environ[BOT_WORKER_ID_ENV]
+            if saved_workers is None:
+                del os.environ[BOT_WORKERS_ENV]
+            else:
+                os.environ[BOT_WORKERS_ENV] = saved_workers
+        self._processes[index] = process
+
+    async def _wait_for_workers(self) -> None:
+        loop = asyncio.get_running_loop()
+        for _ in range(self.workers):
+            await loop.run_in_executor(
+                None, functools.partial(self._ready.get, timeout=_WORKER_START_TIMEOUT)
+            )
+        logging.warning(f"All {self.workers} workers are ready")
+
+    def _join_workers(self) -> None:
+        for index, process in enumerate(self._processes):
+            if process is None:
+                continue
+            process.join(_WORKER_STOP_TIMEOUT)
+            if process.is_alive():
+                logging.error(f"Worker {index} didn't stop in time, terminating it")
+                process.terminate()
+                process.join()
+
+    def _forward(self, update: Update) -> None:
+        index = self.shard(update)
+        self._worker_queues[index].put(update.to_dict())
+        self.forwarded[index] += 1
+
+    async def _forward_updates(self) -> None:
+        while True:
+            self._forward(await self.update_queue.get())
+
+    async def _restart_exited_workers(self) -> None:
+        while True:
+            await asyncio.sleep(_MONITOR_INTERVAL_SECONDS)
+            for index, process in enumerate(self._processes):
+                if not process.is_alive() and not self._is_stopping:
+                    logging.critical(
+                        f"Worker {index} exited with code {process.exitcode}, restarting it"
+                    )
+                    self._start_worker(index)
+
+
+def _telegram_bot(token: str, base_url: str, base_file_url: str) -> TelegramBot:
+    kwargs = dict()
+    if base_url:
+        kwargs["base_url"] = base_url
+    if base_file_url:
+        kwargs["base_file_url"] = base_file_url
+    return TelegramBot(token, **kwargs)
+
+
+def _run_worker(
+    index: int,
+    token: str,
+    base_url: str,
+    base_file_url: str,
+    updates,
+    ready,
+    worker_setup,
+) -> None:
+    # Ctrl+C reaches the whole process group, the dispatcher stops workers itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Forks the PEP8 checkers while the worker has no other threads yet,
+    # worker_setup and the Bot start the Sheets and IO ones
+    start_style_checker()
+    if worker_setup is not None:
+        worker_setup()
+    bot = Bot(token, base_url=base_url, base_file_url=base_file_url)
+    asyncio.run(_serve_worker(index, bot, updates, ready))
+
+
+async def _serve_worker(index: int, bot: Bot, updates, ready) -> None:
+    await bot.start()
+    ready.put(index)
+    logging.warning(f"Worker {index} is ready")
+    application = bot.application
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            data = await loop.run_in_executor(None, updates.get)
+            if data is None:
+                break
+            await application.update_queue.put(Update.de_json(data, application.bot))
+    finally:
+        await bot.stop()
+        logging.warning(f"Worker {index} stopped")
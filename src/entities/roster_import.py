@@ -0,0 +1,16 @@
+class MalformedLine:
+    def __init__(self, line_number: int, line: str, reason: str):
+        self.line_number = line_number
+        self.line = line
+        self.reason = reason
+
+
+class RosterImport:
+    """Tokens generated from a students' list and the lines that were skipped"""
+
+    def __init__(self):
+        self.tokens = dict()
+        self.malformed_lines = []
+
+    def add_malformed(self, line_number: int, line: str, reason: str) -> None:
+        self.malformed_lines.append(MalformedLine(line_number, line.strip(), reason))
@@ -0,0 +1,24 @@
+class RunResult:
+    def __init__(
+        self,
+        exit_code: int,
+        stdout: str,
+        stderr: str,
+        wall_time: float,
+        cpu_time: float,
+        peak_rss_kb: int,
+        timed_out: bool = False,
+    ):
+        self.exit_code = exit_code
+        self.stdout = stdout
+        self.stderr = stderr
+        self.wall_time = wall_time
+        self.cpu_time = cpu_time
+        self.peak_rss_kb = peak_rss_kb
+        self.timed_out = timed_out
+
+    def __repr__(self):
+        return (
+            f"RunResult(exit_code={self.exit_code}, wall_time={self.wall_time:.3f}s, "
+            f"cpu_time={self.cpu_time:.3f}s, peak_rss={self.peak_rss_kb}KB, timed_out={self.timed_out})"
+        )
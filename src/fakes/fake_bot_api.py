@@ -0,0 +1,294 @@
+import asyncio
+import time
+from typing import Optional
+
+import httpx
+
+from src.utils.http_server import HttpRequest, HttpResponse, HttpServer, json_response
+
+_BOT_ID = 1
+_BOT_USERNAME = "gsem_fake_bot"
+
+
+class ReceivedMessage:
+    """A message the bot sent to a chat through the fake API"""
+
+    def __init__(self, chat_id: int, text: str, document: bytes = None):
+        self.chat_id = chat_id
+        self.text = text
+        self.document = document
+        self.received_at = time.perf_counter()
+
+
+class FakeBotApi:
+    """Local stand-in for the Telegram Bot API over HTTP.
+
+    Implements getMe, setWebhook, deleteWebhook, getUpdates with long polling,
+    sendMessage, sendDocument, getFile and file downloads, which is what the
+    bot uses. Tests push updates from simulated students and wait for the
+    replies. Point the bot at `base_url` and `base_file_url`.
+
+    Once a webhook is set, pushed updates are posted to it with the secret
+    token like Telegram does, instead of being kept for getUpdates.
+    """
+
+    def __init__(self, token: str, host: str = "127.0.0.1", port: int = 0):
+        self.token = token
+        self.server = HttpServer(self._handle, host, port)
+        self.updates = []
+        self.messages = dict()
+        self.files = dict()
+        self.calls = dict()
+        self._next_update_id = 1
+        self._next_message_id = 1
+        self._changed = asyncio.Condition()
+        self.webhook_url = None
+        self.webhook_secret_token = None
+        self._webhook_client = None
+
+    @property
+    def base_url(self) -> str:
+        return f"{self.server.url}/bot"
+
+    @property
+    def base_file_url(self) -> str:
+        return f"{self.server.url}/file/bot"
+
+    async def start(self) -> None:
+        await self.server.start()
+        self._webhook_client = httpx.AsyncClient()
+
+    async def stop(self) -> None:
+        # Wakes up pending long polls so that they answer before the server closes
+        async with self._changed:
+            self._changed.notify_all()
+        await self.server.stop()
+        await self._webhook_client.aclose()
+
+    # --- simulated students ---
+
+    async def push_update(self, update: dict) -> int:
+        async with self._changed:
+            update["update_id"] = self._next_update_id
+            self._next_update_id += 1
+            if self.webhook_url is None:
+                self.updates.append(update)
+            self._changed.notify_all()
+        if self.webhook_url is not None:
+            await self._post_to_webhook(update)
+        return update["update_id"]
+
+    async def _post_to_webhook(self, update: dict) -> None:
+        headers = dict()
+        if self.webhook_secret_token is not None:
+            headers["X-Telegram-Bot-Api-Secret-Token"] = self.webhook_secret_token
+        response = await self._webhook_client.post(
+            self.webhook_url, json=update, headers=headers
+        )
+        response.raise_for_status()
+
+    def _message(self, user_id: int, username: str, **fields) -> dict:
+        message_id = self._next_message_id
+        self._next_message_id += 1
+        return {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private", "username": username},
+            "from": {
+                "id": user_id,
+                "is_bot": False,
+                "first_name": username,
+                "username": username,
+            },
+            **fields,
+        }
+
+    async def push_command(self, user_id: int, username: str, text: str) -> int:
+        command_length = len(text.split()[0])
+        entities = [{"type": "bot_command", "offset": 0, "length": command_length}]
+        message = self._message(user_id, username, text=text, entities=entities)
+        return await self.push_update({"message": message})
+
+    async def push_document(
+        self,
+        user_id: int,
+        username: str,
+        file_name: str,
+        content: bytes,
+        mime_type: str,
+        caption: str = None,
+    ) -> int:
+        file_id = f"file-{len(self.files) + 1}"
+        self.files[file_id] = content
+        document = {
+            "file_id": file_id,
+            "file_unique_id": f"unique-{file_id}",
+            "file_name": file_name,
+            "mime_type": mime_type,
+            "file_size": len(content),
+        }
+        fields = {"document": document}
+        if caption is not None:
+            fields["caption"] = caption
+        return await self.push_update(
+            {"message": self._message(user_id, username, **fields)}
+        )
+
+    def sent_count(self, chat_id: int) -> int:
+        return len(self.messages.get(chat_id, []))
+
+    async def wait_for_message(
+        self, chat_id: int, since: int, predicate=None, timeout: float = None
+    ) -> Optional[ReceivedMessage]:
+        """Waits for a message to the chat after the first `since` ones, None on timeout"""
+
+        def find():
+            for message in self.messages.get(chat_id, [])[since:]:
+                if predicate is None or predicate(message):
+                    return message
+            return None
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        async with self._changed:
+            while find() is None:
+                if deadline is None:
+                    await self._changed.wait()
+                    continue
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                await self._wait_changed(remaining)
+            return find()
+
+    async def _wait_changed(self, timeout: float) -> None:
+        """Condition.wait with a timeout, the lock must be held"""
+        # Not wait_for: cancelling it around Condition.wait can hang on Python 3.11
+        waiter = asyncio.ensure_future(self._changed.wait())
+        done, _ = await asyncio.wait({waiter}, timeout=timeout)
+        if not done:
+            waiter.cancel()
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                pass
+
+    # --- Bot API ---
+
+    async def _handle(self, request: HttpRequest) -> HttpResponse:
+        prefix = f"/bot{self.token}/"
+        file_prefix = f"/file/bot{self.token}/"
+        if request.path.startswith(file_prefix):
+            return self._download(request.path[len(file_prefix) :])
+        if not request.path.startswith(prefix):
+            return self._error(404, "Not Found")
+
+        method = request.path[len(prefix) :]
+        self.calls[method] = self.calls.get(method, 0) + 1
+        params = request.form() if request.body else dict(request.query)
+        handler = getattr(self, f"_api_{method.lower()}", None)
+        if handler is None:
+            return self._error(404, f"Method {method} is not supported by the fake")
+        return await handler(params)
+
+    @staticmethod
+    def _ok(result) -> HttpResponse:
+        return json_response({"ok": True, "result": result})
+
+    @staticmethod
+    def _error(code: int, description: str) -> HttpResponse:
+        return json_response(
+            {"ok": False, "error_code": code, "description": description}, code
+        )
+
+    async def _api_getme(self, params: dict) -> HttpResponse:
+        return self._ok(
+            {
+                "id": _BOT_ID,
+                "is_bot": True,
+                "first_name": "GSEM fake bot",
+                "username": _BOT_USERNAME,
+                "can_join_groups": False,
+                "can_read_all_group_messages": False,
+                "supports_inline_queries": False,
+            }
+        )
+
+    async def _api_setwebhook(self, params: dict) -> HttpResponse:
+        self.webhook_url = params["url"]
+        self.webhook_secret_token = params.get("secret_token") or None
+        return self._ok(True)
+
+    async def _api_deletewebhook(self, params: dict) -> HttpResponse:
+        self.webhook_url = None
+        self.webhook_secret_token = None
+        return self._ok(True)
+
+    async def _api_getupdates(self, params: dict) -> HttpResponse:
+        offset = int(params.get("offset", 0) or 0)
+        limit = int(params.get("limit", 100) or 100)
+        timeout = float(params.get("timeout", 0) or 0)
+        async with self._changed:
+            # Confirmed updates are never asked for again
+            self.updates = [i for i in self.updates if i["update_id"] >= offset]
+            if not self.updates and timeout:
+                await self._wait_changed(timeout)
+            updates = [i for i in self.updates if i["update_id"] >= offset][:limit]
+        return self._ok(updates)
+
+    def _record(self, chat_id: int, text: str, document: bytes = None) -> dict:
+        message = ReceivedMessage(chat_id, text, document)
+        self.messages.setdefault(chat_id, []).append(message)
+        message_id = self._next_message_id
+        self._next_message_id += 1
+        return {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": _BOT_ID, "is_bot": True, "first_name": "GSEM fake bot"},
+        }
+
+    async def _api_sendmessage(self, params: dict) -> HttpResponse:
+        chat_id = int(params["chat_id"])
+        async with self._changed:
+            result = self._record(chat_id, params["text"])
+            self._changed.notify_all()
+        result["text"] = params["text"]
+        return self._ok(result)
+
+    async def _api_senddocument(self, params: dict) -> HttpResponse:
+        chat_id = int(params["chat_id"])
+        content = params.get("document")
+        if isinstance(content, str):
+            # A file_id or URL of an already uploaded file
+            content = self.files.get(content, content.encode("utf-8"))
+        caption = params.get("caption", "")
+        async with self._changed:
+            result = self._record(chat_id, caption, content)
+            self._changed.notify_all()
+        result["document"] = {
+            "file_id": f"sent-{result['message_id']}",
+            "file_unique_id": f"sent-unique-{result['message_id']}",
+            "file_size": len(content or b""),
+        }
+        if caption:
+            result["caption"] = caption
+        return self._ok(result)
+
+    async def _api_getfile(self, params: dict) -> HttpResponse:
+        file_id = params["file_id"]
+        if file_id not in self.files:
+            return self._error(400, "Bad Request: invalid file_id")
+        return self._ok(
+            {
+                "file_id": file_id,
+                "file_unique_id": f"unique-{file_id}",
+                "file_size": len(self.files[file_id]),
+                "file_path": f"documents/{file_id}",
+            }
+        )
+
+    def _download(self, file_path: str) -> HttpResponse:
+        file_id = file_path.rsplit("/", 1)[-1]
+        if file_id not in self.files:
+            return HttpResponse(404, b"Not Found")
+        return HttpResponse(200, self.files[file_id], "application/octet-stream")
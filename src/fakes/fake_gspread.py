@@ -0,0 +1,342 @@
+import random
+import threading
+import time
+from collections import Counter, deque
+from typing import Optional
+
+from gspread.cell import Cell
+from gspread.exceptions import APIError, WorksheetNotFound
+from gspread.utils import a1_range_to_grid_range
+
+_QUOTA_WINDOW_SECONDS = 60
+
+
+class _FakeResponse:
+    """Just enough of requests.Response for gspread's APIError"""
+
+    def __init__(self, status_code: int, message: str):
+        self.status_code = status_code
+        self.text = message
+        self._message = message
+
+    def json(self) -> dict:
+        return {"error": {"code": self.status_code, "message": self._message}}
+
+
+class FakeGoogleSheets:
+    """In-process stand-in for the Google Sheets API behind the fake gspread objects.
+
+    Every API call sleeps for `latency` seconds and is counted by method name.
+    Calls over `quota_per_minute` in a rolling minute, and a random `error_rate`
+    share of all calls, fail with a 429 APIError like the real quota does.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0,
+        quota_per_minute: Optional[int] = None,
+        error_rate: float = 0,
+        seed: Optional[int] = None,
+    ):
+        self.latency = latency
+        self.quota_per_minute = quota_per_minute
+        self.error_rate = error_rate
+        self.calls = Counter()
+        self.failed_calls = Counter()
+        self.spreadsheets = dict()
+        self._random = random.Random(seed)
+        self._call_times = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+    def reset_calls(self) -> None:
+        with self._lock:
+            self.calls = Counter()
+            self.failed_calls = Counter()
+
+    def api_call(self, method: str) -> None:
+        with self._lock:
+            self.calls[method] += 1
+            now = time.monotonic()
+            while (
+                self._call_times and now - self._call_times[0] >= _QUOTA_WINDOW_SECONDS
+            ):
+                self._call_times.popleft()
+            over_quota = (
+                self.quota_per_minute is not None
+                and len(self._call_times) >= self.quota_per_minute
+            )
+            failed = over_quota or self._random.random() < self.error_rate
+            if not over_quota:
+                self._call_times.append(now)
+            if failed:
+                self.failed_calls[method] += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if failed:
+            raise APIError(_FakeResponse(429, f"Quota exceeded for {method}"))
+
+    def create_spreadsheet(self, title: str) -> "FakeSpreadsheet":
+        spreadsheet = FakeSpreadsheet(self, title)
+        self.spreadsheets[title] = spreadsheet
+        return spreadsheet
+
+
+class FakeClient:
+    """Replaces the gspread.Client returned by gspread.service_account"""
+
+    def __init__(self, backend: FakeGoogleSheets):
+        self.backend = backend
+
+    def open(self, title: str) -> "FakeSpreadsheet":
+        self.backend.api_call("open")
+        if title not in self.backend.spreadsheets:
+            raise APIError(_FakeResponse(404, f"Spreadsheet {title} not found"))
+        return self.backend.spreadsheets[title]
+
+
+class FakeSpreadsheet:
+    def __init__(self, backend: FakeGoogleSheets, title: str):
+        self.backend = backend
+        self.title = title
+        self._worksheets = []
+        self._next_id = 0
+        self._add("Sheet1", 1000, 26, 0)
+
+    def _by_title(self, title: str) -> "FakeWorksheet":
+        for worksheet in self._worksheets:
+            if worksheet.title == title:
+                return worksheet
+        raise WorksheetNotFound(title)
+
+    def _add(self, title: str, rows: int, cols: int, sheet_id: int) -> "FakeWorksheet":
+        if any(i.title == title for i in self._worksheets):
+            raise APIError(_FakeResponse(400, f'Sheet "{title}" already exists'))
+        if any(i.id == sheet_id for i in self._worksheets):
+            raise APIError(_FakeResponse(400, f"Sheet id {sheet_id} already exists"))
+        worksheet = FakeWorksheet(self, title, sheet_id, rows, cols)
+        self._worksheets.append(worksheet)
+        self._next_id = max(self._next_id, sheet_id + 1)
+        return worksheet
+
+    def _delete(self, sheet_id: int) -> None:
+        remaining = [i for i in self._worksheets if i.id != sheet_id]
+        if len(remaining) == len(self._worksheets):
+            raise APIError(_FakeResponse(400, f"No sheet with id {sheet_id}"))
+        if not remaining:
+            raise APIError(_FakeResponse(400, "Can't delete the only sheet"))
+        self._worksheets = remaining
+
+    def _rename(self, sheet_id: int, title: str) -> None:
+        worksheet = next((i for i in self._worksheets if i.id == sheet_id), None)
+        if worksheet is None:
+            raise APIError(_FakeResponse(400, f"No sheet with id {sheet_id}"))
+        if any(i.title == title and i is not worksheet for i in self._worksheets):
+            raise APIError(_FakeResponse(400, f'Sheet "{title}" already exists'))
+        worksheet.title = title
+
+    def worksheets(self) -> list:
+        self.backend.api_call("worksheets")
+        return list(self._worksheets)
+
+    def worksheet(self, title: str) -> "FakeWorksheet":
+        self.backend.api_call("worksheet")
+        return self._by_title(title)
+
+    def add_worksheet(self, title: str, rows: int, cols: int) -> "FakeWorksheet":
+        self.backend.api_call("add_worksheet")
+        return self._add(title, rows, cols, self._next_id)
+
+    def del_worksheet(self, worksheet: "FakeWorksheet") -> None:
+        self.backend.api_call("del_worksheet")
+        self._delete(worksheet.id)
+
+    def batch_update(self, body: dict) -> dict:
+        """Supports the addSheet, deleteSheet, updateSheetProperties (title only)
+        and repeatCell requests.
+
+        Like the real API the requests are applied all or nothing.
+        """
+        self.backend.api_call("spreadsheet.batch_update")
+        worksheets, next_id = list(self._worksheets), self._next_id
+        titles = [i.title for i in worksheets]
+        try:
+            self._apply_requests(body["requests"])
+        except APIError:
+            self._worksheets, self._next_id = worksheets, next_id
+            for worksheet, title in zip(worksheets, titles):
+                worksheet.title = title
+            raise
+        return {"spreadsheetId": self.title, "replies": []}
+
+    def _apply_requests(self, requests: list) -> None:
+        for request in requests:
+            if "addSheet" in request:
+                properties = request["addSheet"]["properties"]
+                grid = properties.get("gridProperties", {})
+                sheet_id = properties.get("sheetId", self._next_id)
+                self._add(
+                    properties["title"],
+                    grid.get("rowCount", 1000),
+                    grid.get("columnCount", 26),
+                    sheet_id,
+                )
+            elif "deleteSheet" in request:
+                self._delete(request["deleteSheet"]["sheetId"])
+            elif "updateSheetProperties" in request:
+                properties = request["updateSheetProperties"]["properties"]
+                self._rename(properties["sheetId"], properties["title"])
+            elif "repeatCell" in request:
+                grid_range = request["repeatCell"]["range"]
+                worksheet = next(
+                    (i for i in self._worksheets if i.id == grid_range["sheetId"]),
+                    None,
+                )
+                if worksheet is None:
+                    raise APIError(
+                        _FakeResponse(400, f'No sheet with id {grid_range["sheetId"]}')
+                    )
+                worksheet.formats.append(
+                    (grid_range, request["repeatCell"]["cell"]["userEnteredFormat"])
+                )
+            else:
+                raise APIError(_FakeResponse(400, f"Unsupported request {request}"))
+
+    def values_batch_update(self, body: dict) -> dict:
+        self.backend.api_call("values_batch_update")
+        user_entered = body.get("valueInputOption") == "USER_ENTERED"
+        for item in body["data"]:
+            title, cells_range = _split_range_name(item["range"])
+            self._by_title(title)._write(cells_range, item["values"], user_entered)
+        return {"spreadsheetId": self.title}
+
+
+class FakeWorksheet:
+    def __init__(
+        self,
+        spreadsheet: FakeSpreadsheet,
+        title: str,
+        sheet_id: int,
+        rows: int,
+        cols: int,
+    ):
+        self.spreadsheet = spreadsheet
+        self.backend = spreadsheet.backend
+        self.title = title
+        self.id = sheet_id
+        self.row_count = rows
+        self.col_count = cols
+        self.cells = dict()
+        self.formats = []
+
+    def _check_bounds(self, row: int, col: int) -> None:
+        if row > self.row_count or col > self.col_count:
+            raise APIError(
+                _FakeResponse(
+                    400,
+                    f"Range exceeds grid limits of {self.row_count}x{self.col_count}",
+                )
+            )
+
+    def _write(self, cells_range: str, values: list, user_entered: bool) -> None:
+        grid_range = a1_range_to_grid_range(cells_range)
+        first_row = grid_range.get("startRowIndex", 0) + 1
+        first_col = grid_range.get("startColumnIndex", 0) + 1
+        for i, row_values in enumerate(values):
+            for j, value in enumerate(row_values):
+                self._set(first_row + i, first_col + j, value, user_entered)
+
+    def _set(self, row: int, col: int, value, user_entered: bool) -> None:
+        self._check_bounds(row, col)
+        value = "" if value is None else str(value)
+        # A leading apostrophe only forces the text format of an entered value
+        if user_entered and value.startswith("'"):
+            value = value[1:]
+        if value:
+            self.cells[(row, col)] = value
+        else:
+            self.cells.pop((row, col), None)
+
+    def cell_value(self, row: int, col: int) -> str:
+        """Reads a cell without an API call, for assertions"""
+        return self.cells.get((row, col), "")
+
+    def _values(self) -> list:
+        if not self.cells:
+            return []
+        last_row = max(row for row, _ in self.cells)
+        last_col = max(col for _, col in self.cells)
+        return [
+            [self.cell_value(row, col) for col in range(1, last_col + 1)]
+            for row in range(1, last_row + 1)
+        ]
+
+    def get_all_values(self) -> list:
+        self.backend.api_call("get_all_values")
+        return self._values()
+
+    def col_values(self, col: int) -> list:
+        self.backend.api_call("col_values")
+        rows = [row for row, cell_col in self.cells if cell_col == col]
+        return [self.cell_value(row, col) for row in range(1, max(rows, default=0) + 1)]
+
+    def find(self, query: str) -> Optional[Cell]:
+        self.backend.api_call("find")
+        for row, col in sorted(self.cells):
+            if self.cells[(row, col)] == query:
+                return Cell(row, col, query)
+        return None
+
+    def range(self, cells_range: str) -> list:
+        self.backend.api_call("range")
+        grid_range = a1_range_to_grid_range(cells_range)
+        return [
+            Cell(row, col, self.cell_value(row, col))
+            for row in range(
+                grid_range["startRowIndex"] + 1, grid_range["endRowIndex"] + 1
+            )
+            for col in range(
+                grid_range["startColumnIndex"] + 1, grid_range["endColumnIndex"] + 1
+            )
+        ]
+
+    def update_cell(self, row: int, col: int, value) -> None:
+        self.backend.api_call("update_cell")
+        self._set(row, col, value, user_entered=True)
+
+    def update_cells(self, cell_list: list, value_input_option: str = "RAW") -> None:
+        self.backend.api_call("update_cells")
+        for cell in cell_list:
+            self._set(
+                cell.row, cell.col, cell.value, value_input_option == "USER_ENTERED"
+            )
+
+    def update(self, values, range_name: str = None, **kwargs) -> None:
+        self.backend.api_call("update")
+        # gspread accepts both update(values, range_name) and update(range_name, values)
+        if isinstance(values, str):
+            values, range_name = range_name, values
+        user_entered = kwargs.get("value_input_option") == "USER_ENTERED"
+        self._write(range_name or "A1", values, user_entered)
+
+    def batch_update(self, data: list, value_input_option: str = "RAW") -> None:
+        self.backend.api_call("batch_update")
+        for item in data:
+            self._write(
+                item["range"], item["values"], value_input_option == "USER_ENTERED"
+            )
+
+    def format(self, cells_range: str, cell_format: dict) -> None:
+        self.backend.api_call("format")
+        self.formats.append((a1_range_to_grid_range(cells_range, self.id), cell_format))
+
+
+def _split_range_name(range_name: str) -> tuple:
+    """Splits "'Sheet name'!A1:B2" into the unquoted title and the range"""
+    title, _, cells_range = range_name.rpartition("!")
+    if title.startswith("'") and title.endswith("'"):
+        title = title[1:-1].replace("''", "'")
+    return title, cells_range
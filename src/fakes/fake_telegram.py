@@ -0,0 +1,107 @@
+import asyncio
+import time
+from typing import Optional
+
+
+class FakeUser:
+    def __init__(self, user_id: int, username: str):
+        self.id = user_id
+        self.username = username
+
+
+class FakeChat:
+    def __init__(self, chat_id: int):
+        self.id = chat_id
+
+
+class FakeDocument:
+    def __init__(self, file_id: str, file_unique_id: str, file_name: str):
+        self.file_id = file_id
+        self.file_unique_id = file_unique_id
+        self.file_name = file_name
+
+
+class FakeMessage:
+    def __init__(self, text: str = None, document: FakeDocument = None):
+        self.text = text
+        self.caption = None
+        self.document = document
+
+
+class FakeUpdate:
+    """Carries the attributes of telegram.Update that the handlers read"""
+
+    def __init__(self, user: FakeUser, message: FakeMessage):
+        self.effective_user = user
+        self.effective_chat = FakeChat(user.id)
+        self.message = message
+        self.effective_message = message
+
+
+class FakeFile:
+    def __init__(self, content: bytes):
+        self._content = content
+
+    async def download_as_bytearray(self) -> bytearray:
+        return bytearray(self._content)
+
+
+class SentMessage:
+    def __init__(self, chat_id: int, text: str):
+        self.chat_id = chat_id
+        self.text = text
+        self.sent_at = time.perf_counter()
+
+
+class FakeBot:
+    """Records sent messages and documents, serves uploaded files from memory"""
+
+    def __init__(self):
+        self.files = dict()
+        self.messages = dict()
+        self.documents = dict()
+        self._new_message = asyncio.Condition()
+
+    def add_file(self, file_id: str, content: bytes) -> None:
+        self.files[file_id] = content
+
+    async def get_file(self, document: FakeDocument) -> FakeFile:
+        return FakeFile(self.files[document.file_id])
+
+    async def send_message(self, chat_id: int, text: str, **kwargs) -> SentMessage:
+        message = SentMessage(chat_id, text)
+        async with self._new_message:
+            self.messages.setdefault(chat_id, []).append(message)
+            self._new_message.notify_all()
+        return message
+
+    async def send_document(
+        self, chat_id: int, document: bytes, filename: str, **kwargs
+    ) -> None:
+        self.documents.setdefault(chat_id, []).append((filename, bytes(document)))
+
+    def sent_count(self, chat_id: int) -> int:
+        return len(self.messages.get(chat_id, []))
+
+    async def wait_for_message(
+        self, chat_id: int, since: int, predicate=None
+    ) -> Optional[SentMessage]:
+        """Waits for a message to the chat, sent after the first `since` ones"""
+
+        def find():
+            for message in self.messages.get(chat_id, [])[since:]:
+                if predicate is None or predicate(message):
+                    return message
+            return None
+
+        async with self._new_message:
+            await self._new_message.wait_for(lambda: find() is not None)
+            return find()
+
+
+class FakeContext:
+    """Carries the attributes of ContextTypes.DEFAULT_TYPE that the handlers read"""
+
+    def __init__(self, bot: FakeBot, args: list = None):
+        self.bot = bot
+        self.args = args or []
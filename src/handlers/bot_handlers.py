@@ -2,10 +2,13 @@ import datetime
 import functools
 import logging
 import os
+import subprocess
+import time
 
 from telegram import Update
 from telegram.ext import CommandHandler, ContextTypes, MessageHandler, filters
 
+from src.config.profiling_config import PROFILE_HANDLERS
 from src.services import telegram_services
 from src.services.auth_services import (
     deactivate_session,
@@ -30,16 +33,25 @@ from src.services.session_services import (
     was_token_used_before, is_task_done_already,
 )
 from src.services.spreadsheet_service import fulfill_worksheets, mark_progress_in_google
-from src.services.task_tester_service import run_tests
+from src.services.grading_cache import replay_verdict
+from src.services.grading_queue import get_grading_queue
+from src.services.handler_profiler import profiled
+from src.services.task_tester_service import get_cached_verdict, run_tests
 from src.utils import bot_commands
 from src.utils.exceptions import (
     AdminAccessDenied,
     AlreadyLoggedInAccount,
+    EmptyRosterError,
+    GradingQueueFullError,
     InvalidDateError,
     InvalidSessionToken,
     NoActiveSessionError,
     NoArgumentsInLogin,
     PepTestError,
+    SandboxSetupError,
+    SubmissionAlreadyQueuedError,
+    SubmissionRuntimeError,
+    SubmissionTimeoutError,
     TokenAlreadyInUseError,
     TokenNotFoundError,
     TooManyArgumentsInLogin,
@@ -47,11 +59,23 @@ from src.utils.exceptions import (
     WrongDateFormatError,
     WrongPythonFileName, AlreadyDoneTask,
 )
-from src.utils.formaters import format_dict_to_string, format_progress_to_str
+from src.utils.formaters import (
+    format_malformed_lines_to_str,
+    format_metrics_to_str,
+    format_progress_to_str,
+    format_run_error,
+    format_tokens_to_csv,
+)
+from src.utils.metrics import handler_latency, handler_requests, registry
 from src.utils.validators import validate_datetime_args, validate_filename
 
 _ADMIN_USERNAMES = "ADMIN_USERNAMES"
 STUDENT_FILE_NAME = "src/data/students.txt"
+TOKENS_FILE_NAME = "tokens.csv"
+GRADING_DROPPED_MESSAGE = (
+    "[Ошибка на сервере]    Бот перезапускается, файл не успели проверить. "
+    "Отправьте его ещё раз чуть позже."
+)
 ADMIN_USERNAMES = os.environ.get(_ADMIN_USERNAMES).split(" ")
 
 
@@ -64,15 +88,21 @@ def get_handlers() -> list:
         MessageHandler(filters.Document.PY, py_file_handler),
         MessageHandler(filters.Document.TXT, students_downloader),
         CommandHandler(bot_commands.UPLOAD_STUDENT_PROGRESS, upload_student_progress),
+        CommandHandler(bot_commands.STATS, stats),
     ]
 
 
 def _response(text_func):
     @functools.wraps(text_func)
     async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        text = await text_func(update, context)
-        await telegram_services.response(update, context, text)
-
+        with handler_latency.time(handler=text_func.__name__):
+            text = await text_func(update, context)
+            await telegram_services.response(update, context, text)
+        handler_requests.inc(handler=text_func.__name__)
+
+    # Decided once at import, so a disabled profiler costs nothing per update
+    if PROFILE_HANDLERS:
+        return profiled(wrapper)
     return wrapper
 
 
@@ -223,14 +253,47 @@ async def students_downloader(
         date = await validate_datetime_args(update.message.caption)
         await download_txt_file(update, context, STUDENT_FILE_NAME)
 
-        token_dict = await generate_tokens_for_users(STUDENT_FILE_NAME, date)
-        await upload_tokens_to_db(token_dict)
-        await fulfill_worksheets(token_dict)
+        started_at = time.perf_counter()
+        roster = await generate_tokens_for_users(STUDENT_FILE_NAME, date)
+        tokens_generated_at = time.perf_counter()
+        await upload_tokens_to_db(roster.tokens)
+        tokens_uploaded_at = time.perf_counter()
+        # The tokens are valid from now on, the admin gets them even if Sheets fails
+        await telegram_services.send_document(
+            update, context, await format_tokens_to_csv(roster.tokens), TOKENS_FILE_NAME
+        )
 
-        output = "👍 [Успешное создание токенов] 👍\n\n\n" + await format_dict_to_string(
-            token_dict
+        timing = (
+            f"Токены: {tokens_generated_at - started_at:.2f} с, "
+            f"база: {tokens_uploaded_at - tokens_generated_at:.2f} с"
+        )
+        output = (
+            "👍 [Успешное создание токенов] 👍\n"
+            + f"Создано токенов: {len(roster.tokens)}, они в файле {TOKENS_FILE_NAME}\n"
+        )
+        sheets_started_at = time.perf_counter()
+        try:
+            await fulfill_worksheets(roster.tokens)
+        except Exception as e:
+            logging.error(
+                f"Couldn't create worksheets for users' list uploaded by '{username}'. Error: {e}"
+            )
+            output += (
+                "[Внимание]    Не удалось создать листы групп в таблице, "
+                "токены при этом действуют\n"
+            )
+        else:
+            timing += f", таблица: {time.perf_counter() - sheets_started_at:.2f} с"
+        output += f"⏱ {timing}"
+        if roster.malformed_lines:
+            output += (
+                f"\n\n[Внимание]    Пропущено строк: {len(roster.malformed_lines)}\n"
+                + await format_malformed_lines_to_str(roster.malformed_lines)
+            )
+        logging.warning(
+            f"User '{username}' successfully uploaded users' list of {len(roster.tokens)} students, "
+            f"{len(roster.malformed_lines)} malformed lines skipped. {timing}"
         )
-        logging.warning(f"User '{username}' successfully uploaded users' list.")
         return output
 
     except AdminAccessDenied:
@@ -260,15 +323,25 @@ async def students_downloader(
             f"{datetime.datetime.now().date().strftime('%d.%m.%Y')}"
         )
 
+    except EmptyRosterError as e:
+        logging.error(
+            f"User '{username}' unsuccessfully tried to uploaded users' list. No valid lines."
+        )
+        output = "[Ошибка]    В файле нет ни одной строки вида: Фамилия Имя Группа"
+        if e.roster.malformed_lines:
+            output += "\n" + await format_malformed_lines_to_str(e.roster.malformed_lines)
+        return output
+
 
 @_response
 async def py_file_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> str:
     """Function is called when .py file is sent.
-    Checks if the user is valid, validates the filename, downloads the .py file, and runs tests
+    Checks if the user is valid, validates the filename and queues the file for grading
     """
 
     username = update.effective_user.username
     received_file_name = update.message.document.file_name
+    token = None
 
     try:
         logging.warning(f"Received {received_file_name} file from user {username}")
@@ -286,77 +359,184 @@ async def py_file_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         if await is_task_done_already(token, received_file_name):
             raise AlreadyDoneTask
 
-        new_file_name = await get_new_file_name(received_file_name, token)
-        filepath = await download_py_file(update, context, new_file_name, token)
+        file_unique_id = update.message.document.file_unique_id
+        if await get_cached_verdict(received_file_name, file_unique_id) is not None:
+            # The verdict is ready, no need to wait for a worker
+            return await _grade_py_file(update, context, token)
+
+        position = await get_grading_queue().submit(
+            update.effective_user.id,
+            functools.partial(_grade_py_file_and_respond, update, context, token),
+            functools.partial(
+                telegram_services.response, update, context, GRADING_DROPPED_MESSAGE
+            ),
+        )
         logging.warning(
-            f"Downloaded user's file {received_file_name} as {token}\\{new_file_name}"
+            f"File {received_file_name} from user {username} is queued at position {position}"
         )
+        return (
+            f"[Проверка]    Файл принят, место в очереди: {position}. "
+            "Результат придёт отдельным сообщением."
+        )
+
+    except Exception as e:
+        return await _py_file_error_message(e, username, received_file_name, token)
+
+
+async def _grade_py_file_and_respond(
+    update: Update, context: ContextTypes.DEFAULT_TYPE, token: str
+) -> None:
+    text = await _grade_py_file(update, context, token)
+    await telegram_services.response(update, context, text)
+
+
+# Grading runs in the queue's workers, outside the profile of py_file_handler
+if PROFILE_HANDLERS:
+    _grade_py_file_and_respond = profiled(_grade_py_file_and_respond)
+
+
+async def _grade_py_file(
+    update: Update, context: ContextTypes.DEFAULT_TYPE, token: str
+) -> str:
+    """Downloads the .py file unless its verdict is cached, runs tests and marks progress"""
+
+    username = update.effective_user.username
+    received_file_name = update.message.document.file_name
+
+    try:
+        file_unique_id = update.message.document.file_unique_id
+        verdict = await get_cached_verdict(received_file_name, file_unique_id)
+        if verdict is not None:
+            logging.warning(
+                f"File {received_file_name} from user {username} was graded before, reusing the verdict"
+            )
+            result = await replay_verdict(verdict)
+        else:
+            new_file_name = await get_new_file_name(received_file_name, token)
+            filepath = await download_py_file(update, context, new_file_name, token)
+            logging.warning(
+                f"Downloaded user's file {received_file_name} as {token}\\{new_file_name}"
+            )
+            result = await run_tests(filepath, received_file_name, file_unique_id)
 
-        result = await run_tests(filepath, received_file_name)
         logging.warning(
-            f"User's {username} task {new_file_name} successfully passed tests"
+            f"User's {username} task {received_file_name} successfully passed tests"
         )
 
         await mark_progress_in_db(token, received_file_name)
-        await mark_progress_in_google(token, received_file_name, is_answer_right=True, is_pep_valid=True)
+        await mark_progress_in_google(
+            token, received_file_name, is_answer_right=True, is_pep_valid=True
+        )
         return result + "\nЭто корректный вывод, задача зачтена 👍"
 
     except Exception as e:
-        if isinstance(e, WrongAnswerError):
-            logging.error(
-                f"User's {username} file {received_file_name} returns wrong answer. "
-                f"Expected result \n {e.correct_result} but got \n {e.user_result}"
-            )
-            token = await get_current_token_for_user(username)
-            await mark_progress_in_google(token, received_file_name, is_answer_right=False, is_pep_valid=False)
+        return await _py_file_error_message(e, username, received_file_name, token)
 
-            msg = "[Неверный ответ]    Программа выводит неверный результат."
 
-        elif isinstance(e, PepTestError):
-            lst = " ".join(e.violation_list)
-            logging.error(
-                f"User's {username} file {received_file_name} couldn't pass PEP tests. Violation list: {lst}"
-            )
-            token = await get_current_token_for_user(username)
-            await mark_progress_in_google(token, received_file_name, is_answer_right=True, is_pep_valid=False)
+async def _py_file_error_message(
+    e: Exception, username: str, received_file_name: str, token: str
+) -> str:
+    if isinstance(e, WrongAnswerError):
+        logging.error(
+            f"User's {username} file {received_file_name} returns wrong answer. "
+            f"Expected result \n {e.correct_result} but got \n {e.user_result}"
+        )
+        await mark_progress_in_google(
+            token, received_file_name, is_answer_right=False, is_pep_valid=False
+        )
 
-            violation_list = "\n".join(e.violation_list)
-            msg = f"[Неверный ответ]    Программа не прошла PEP8 валидацию.  Ошибки:\n\n {violation_list}"
+        msg = "[Неверный ответ]    Программа выводит неверный результат."
 
-        elif isinstance(e, WrongPythonFileName):
-            logging.error(
-                f"User {username} tried to send file with wrong file_name - {received_file_name}"
-            )
-            msg = "[Ошибка отправки]    Неправильное имя файла    Необходимо: task1.py, или task2.py, или task3.py ..."
+    elif isinstance(e, PepTestError):
+        lst = " ".join(e.violation_list)
+        logging.error(
+            f"User's {username} file {received_file_name} couldn't pass PEP tests. Violation list: {lst}"
+        )
+        await mark_progress_in_google(
+            token, received_file_name, is_answer_right=True, is_pep_valid=False
+        )
 
-        elif isinstance(e, TokenNotFoundError):
-            logging.error(f"Couldn't get token for user {username}")
-            msg = "[Ошибка аутентификации]    Невозможно найти токен по вашему профилю."
+        violation_list = "\n".join(e.violation_list)
+        msg = f"[Неверный ответ]    Программа не прошла PEP8 валидацию.  Ошибки:\n\n {violation_list}"
 
-        elif isinstance(e, OSError):
-            logging.critical(
-                "OSError was caught, most likely there is no empty space on disk"
-            )
-            msg = "[Ошибка на сервере]    Произошла непредвиденная ошибка. Сообщите преподавателю о ней."
-        elif isinstance(e, AlreadyDoneTask):
-            logging.error(f"Task already was passed by this user")
-            msg = "[Уже сдана задача]"
+    elif isinstance(e, WrongPythonFileName):
+        logging.error(
+            f"User {username} tried to send file with wrong file_name - {received_file_name}"
+        )
+        msg = "[Ошибка отправки]    Неправильное имя файла    Необходимо: task1.py, или task2.py, или task3.py ..."
 
-        elif e.returncode == 1:
-            logging.error(
-                f"User {username} sent file {received_file_name}. Error : {e}"
-            )
-            msg = (
-                "[Ошибка исполнения программы]    Файл с программой запускается с ошибкой:\n\n"
-                f"{str(e).split('/')[-1]}"
-            )
-        else:
-            logging.error(f"User {username} encountered an error: {e}")
-            msg = (
-                "[Ошибка авторизации]    Произошла непредвиденная ошибка при авторизации. "
-                "Сообщите преподавателю и попробуйте повторить действие позже."
-            )
-        return msg
+    elif isinstance(e, TokenNotFoundError):
+        logging.error(f"Couldn't get token for user {username}")
+        msg = "[Ошибка аутентификации]    Невозможно найти токен по вашему профилю."
+
+    elif isinstance(e, (SandboxSetupError, subprocess.SubprocessError)):
+        logging.critical(
+            f"Couldn't run file {received_file_name} of user {username} in the sandbox. Error: {e}"
+        )
+        msg = "[Ошибка на сервере]    Произошла непредвиденная ошибка. Сообщите преподавателю о ней."
+
+    elif isinstance(e, OSError):
+        logging.critical(
+            "OSError was caught, most likely there is no empty space on disk"
+        )
+        msg = "[Ошибка на сервере]    Произошла непредвиденная ошибка. Сообщите преподавателю о ней."
+    elif isinstance(e, AlreadyDoneTask):
+        logging.error(f"Task already was passed by this user")
+        msg = "[Уже сдана задача]"
+
+    elif isinstance(e, SubmissionAlreadyQueuedError):
+        logging.error(
+            f"User {username} sent file {received_file_name} while previous one is still being graded"
+        )
+        msg = "[Ошибка отправки]    Предыдущий файл ещё проверяется, дождитесь результата."
+
+    elif isinstance(e, GradingQueueFullError):
+        logging.error(
+            f"User {username} sent file {received_file_name} while grading queue is full"
+        )
+        msg = "[Ошибка отправки]    Сейчас на проверке слишком много решений, отправьте файл чуть позже."
+
+    elif isinstance(e, SubmissionTimeoutError):
+        logging.error(
+            f"User {username} sent file {received_file_name} which was stopped by time limit. {e.result}"
+        )
+        msg = "[Ошибка исполнения программы]    Программа работала слишком долго и была остановлена."
+
+    elif isinstance(e, SubmissionRuntimeError):
+        logging.error(
+            f"User {username} sent file {received_file_name}. {e.result} Error : {e.result.stderr}"
+        )
+        msg = (
+            "[Ошибка исполнения программы]    Файл с программой запускается с ошибкой:\n\n"
+            f"{await format_run_error(e.result)}"
+        )
+    else:
+        logging.error(f"User {username} encountered an error: {e}")
+        msg = (
+            "[Ошибка авторизации]    Произошла непредвиденная ошибка при авторизации. "
+            "Сообщите преподавателю и попробуйте повторить действие позже."
+        )
+    return msg
+
+
+@_response
+async def stats(update: Update, context: ContextTypes.DEFAULT_TYPE) -> str:
+    """FOR ADMIN ONLY! Handler shows request latencies, pipeline stages and queues"""
+
+    username = update.effective_user.username
+
+    try:
+        if not await is_admin_request(username, ADMIN_USERNAMES):
+            raise AdminAccessDenied
+
+        logging.warning(f"User '{username}' requested bot statistics.")
+        return "[Статистика]\n\n" + await format_metrics_to_str(registry.metrics())
+
+    except AdminAccessDenied:
+        logging.error(
+            f"User '{username}' unsuccessfully tried to get statistics. User doesn't have admin status"
+        )
+        return "[Ошибка]    Нет доступа к статистике с данного аккаунта."
 
 
 async def upload_student_progress(
@@ -6,6 +6,9 @@ from telegram.error import InvalidToken
 
 from src.bot import Bot
 from src.config.logger_config import configure_logging
+from src.config.scale_out_config import BOT_WORKERS
+from src.config.telegram_config import BOT_MODE, WEBHOOK_MODE
+from src.dispatcher import Dispatcher
 
 _TOKEN = "GSEM_BOT_TOKEN"
 _DEBUG = "DEBUG"
@@ -19,8 +22,14 @@ else:
 
 
 def main(bot_token):
+    if BOT_WORKERS > 1:
+        Dispatcher(bot_token).run()
+        return
     bot = Bot(bot_token)
-    bot.run_polling()
+    if BOT_MODE == WEBHOOK_MODE:
+        bot.run_webhook()
+    else:
+        bot.run_polling()
 
 
 if __name__ == "__main__":
@@ -1,4 +1,4 @@
-import json
+import logging
 import uuid
 from datetime import datetime
 from pathlib import Path
@@ -6,62 +6,85 @@ from pathlib import Path
 from telegram import Update
 from telegram.ext import ContextTypes
 
+from src.entities.roster_import import RosterImport
 from src.services.session_services import (
     activate_session,
     create_new_session,
     get_current_token_for_user,
     get_user_from_token,
+    is_token_in_use,
     is_user_logged_in,
     mark_token_as_used,
     upload_session_to_db,
 )
-from src.utils.exceptions import NoActiveSessionError
-from src.utils.namings import SESSION_FILE, TASK_FILEPATH, TOKEN_FILE
+from src.storage.state_store import get_state_store
+from src.utils.exceptions import (
+    AlreadyLoggedInAccount,
+    EmptyRosterError,
+    NoActiveSessionError,
+    TokenAlreadyInUseError,
+)
+from src.utils.io_executor import run_io
+from src.utils.keyed_lock import token_locks, username_locks
+from src.utils.metrics import timed_stage
+from src.utils.namings import TASK_FILEPATH
+
+
+async def generate_tokens_for_users(filename: str, date: datetime.date) -> RosterImport:
+    return await run_io(_read_tokens_for_users, filename, date)
 
 
-async def generate_tokens_for_users(filename: str, date: datetime.date) -> dict:
-    token_dict = dict()
-    with open(filename, "r", encoding="utf-8") as f:
-        while True:
-            temp_dic = dict()
-            line = f.readline()
+def _read_tokens_for_users(filename: str, date: datetime.date) -> RosterImport:
+    """Reads "Last_name First_name Group" lines one at a time.
+
+    Blank lines are skipped, lines with a different number of fields and
+    repeated students are reported instead of being imported.
+    """
+    roster = RosterImport()
+    students = set()
+    deadline = str(date)
+    # utf-8-sig drops the BOM that Windows editors put before the first name
+    with open(filename, "r", encoding="utf-8-sig") as f:
+        for line_number, line in enumerate(f, start=1):
             args = line.split()
             if not args:
-                break
-            temp_dic["last_name"] = args[0]
-            temp_dic["first_name"] = args[1]
-            temp_dic["group"] = args[2]
-            temp_dic["deadline"] = str(date)
-            temp_dic["is_in_use"] = False
-            temp_dic["telegram_username"] = None
-            token = str(uuid.uuid4())
-            token_dict[token] = temp_dic
-    return token_dict
+                continue
+            if len(args) != 3:
+                roster.add_malformed(line_number, line, "ожидается: Фамилия Имя Группа")
+                continue
+            student = tuple(args)
+            if student in students:
+                roster.add_malformed(line_number, line, "студент уже есть в списке")
+                continue
+            students.add(student)
+            roster.tokens[str(uuid.uuid4())] = {
+                "last_name": args[0],
+                "first_name": args[1],
+                "group": args[2],
+                "deadline": deadline,
+                "is_in_use": False,
+                "telegram_username": None,
+            }
+    if not roster.tokens:
+        raise EmptyRosterError(roster)
+    return roster
 
 
 async def upload_tokens_to_db(token_dict: dict) -> None:
-    with open(TOKEN_FILE, "w", encoding="utf-8") as token_file:
-        json.dump(
-            token_dict,
-            token_file,
-            sort_keys=False,
-            indent=4,
-            ensure_ascii=False,
-            separators=(",", ": "),
-        )
+    await get_state_store().replace_tokens(token_dict)
 
 
 async def download_py_file(
     update: Update, context: ContextTypes.DEFAULT_TYPE, new_file_name: str, token: str
 ) -> str:
     path = Path(TASK_FILEPATH)
-    file = await context.bot.get_file(update.message.document)
-    path /= token
-    path.mkdir(parents=True, exist_ok=True)
-    path /= new_file_name
-    if not path.is_file():
-        path.touch()
-    await file.download_to_drive(str(path))
+    with timed_stage("download"):
+        file = await context.bot.get_file(update.message.document)
+        path /= token
+        await run_io(path.mkdir, parents=True, exist_ok=True)
+        path /= new_file_name
+        content = await file.download_as_bytearray()
+        await run_io(path.write_bytes, content)
     return str(path)
 
 
@@ -76,7 +99,8 @@ async def download_txt_file(
     update: Update, context: ContextTypes.DEFAULT_TYPE, filename
 ) -> None:
     file = await context.bot.get_file(update.message.document)
-    await file.download_to_drive(filename)
+    content = await file.download_as_bytearray()
+    await run_io(Path(filename).write_bytes, content)
 
 
 async def is_admin_request(username: str, admin_list: [str]) -> bool:
@@ -84,46 +108,49 @@ async def is_admin_request(username: str, admin_list: [str]) -> bool:
 
 
 async def deactivate_session(username: str) -> None:
-    if not await is_user_logged_in(username):
-        raise NoActiveSessionError
-    token = await get_current_token_for_user(username)
-    with open(SESSION_FILE, "r", encoding="utf-8") as session_file:
-        session_data = json.load(session_file)
-        for session in session_data["sessions"]:
-            if token in session.keys():
-                session[token]["is_in_progress"] = False
-                session[token]["telegram_username"] = None
-                session[token]["telegram_id"] = None
-    with open(SESSION_FILE, "w", encoding="utf-8") as session_file:
-        json.dump(
-            session_data,
-            session_file,
-            sort_keys=False,
-            indent=4,
-            ensure_ascii=False,
-            separators=(",", ": "),
-        )
-    with open(TOKEN_FILE, "r", encoding="utf-8") as token_file:
-        token_data = json.load(token_file)
-        token_data[token]["is_in_use"] = False
-        token_data[token]["telegram_username"] = None
-    with open(TOKEN_FILE, "w", encoding="utf-8") as token_file:
-        json.dump(
-            token_data,
-            token_file,
-            sort_keys=False,
-            indent=4,
-            ensure_ascii=False,
-            separators=(",", ": "),
-        )
+    async with username_locks.acquire(username):
+        if not await is_user_logged_in(username):
+            raise NoActiveSessionError
+        token = await get_current_token_for_user(username)
+        async with token_locks.acquire(token):
+            store = get_state_store()
+            await store.deactivate_session(token)
+            await store.release_token(token)
 
 
 async def log_in_new_user(token: str, username: str, tg_id: int) -> None:
-    session = await create_new_session(token, username, tg_id)
-    await upload_session_to_db(session)
-    await mark_token_as_used(token, username)
+    async with username_locks.acquire(username), token_locks.acquire(token):
+        await _recheck_login(token, username)
+        # Claimed first, with worker processes the claim is what guards the token
+        await mark_token_as_used(token, username)
+        try:
+            session = await create_new_session(token, username, tg_id)
+            await upload_session_to_db(session)
+        except Exception:
+            await _release_claim(token)
+            raise
 
 
 async def log_in_user(token: str, username: str, tg_id: int) -> None:
-    await mark_token_as_used(token, username)
-    await activate_session(token, username, tg_id)
+    async with username_locks.acquire(username), token_locks.acquire(token):
+        await _recheck_login(token, username)
+        await mark_token_as_used(token, username)
+        try:
+            await activate_session(token, username, tg_id)
+        except Exception:
+            await _release_claim(token)
+            raise
+
+
+async def _recheck_login(token: str, username: str) -> None:
+    """Repeats the handler's checks under the locks, they may be outdated by now"""
+    if await is_user_logged_in(username):
+        raise AlreadyLoggedInAccount
+    if await is_token_in_use(token):
+        raise TokenAlreadyInUseError
+
+
+async def _release_claim(token: str) -> None:
+    """Frees a token whose session couldn't be started, else it stays used for good"""
+    logging.error(f"Couldn't start a session with token '{token}', released it")
+    await get_state_store().release_token(token)
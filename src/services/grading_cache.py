@@ -0,0 +1,150 @@
+import hashlib
+import json
+import logging
+from collections import OrderedDict
+from typing import Optional
+
+from src.config.grading_config import GRADING_CACHE_SIZE
+from src.config.scale_out_config import per_worker_path
+from src.entities.run_result import RunResult
+from src.utils.atomic_files import atomic_write_json
+from src.utils.exceptions import PepTestError, SubmissionRuntimeError, WrongAnswerError
+from src.utils.io_executor import run_io
+from src.utils.namings import GRADING_CACHE_FILE
+from src.utils.task_answers import ANSWER_BANK_VERSION
+
+PASSED = "passed"
+WRONG_ANSWER = "wrong_answer"
+PEP_FAILED = "pep_failed"
+RUNTIME_ERROR = "runtime_error"
+
+
+class GradingCache:
+    """LRU of grading verdicts keyed by task, sha256 of the file and answer bank version.
+
+    Telegram's file_unique_id of every graded document is remembered as well,
+    so a resent file can be answered before it is downloaded.
+    """
+
+    def __init__(
+        self, max_size: int = GRADING_CACHE_SIZE, path: str = GRADING_CACHE_FILE
+    ):
+        self.max_size = max_size
+        self.path = path
+        self._verdicts = OrderedDict()
+        self._keys_by_file_id = OrderedDict()
+
+    @staticmethod
+    def make_key(task: str, content_hash: str) -> str:
+        return f"{task}:{content_hash}:{ANSWER_BANK_VERSION}"
+
+    @staticmethod
+    def _file_id_key(task: str, file_unique_id: str) -> str:
+        return f"{task}:{file_unique_id}"
+
+    def get(self, key: str) -> Optional[dict]:
+        verdict = self._verdicts.get(key)
+        if verdict is not None:
+            self._verdicts.move_to_end(key)
+        return verdict
+
+    def get_by_file_unique_id(self, task: str, file_unique_id: str) -> Optional[dict]:
+        key = self._keys_by_file_id.get(self._file_id_key(task, file_unique_id))
+        if key is None:
+            return None
+        return self.get(key)
+
+    def put(
+        self, key: str, verdict: dict, task: str, file_unique_id: str = None
+    ) -> None:
+        self._verdicts[key] = verdict
+        self._verdicts.move_to_end(key)
+        if file_unique_id is not None:
+            self._keys_by_file_id[self._file_id_key(task, file_unique_id)] = key
+            self._keys_by_file_id.move_to_end(self._file_id_key(task, file_unique_id))
+        while len(self._verdicts) > self.max_size:
+            self._verdicts.popitem(last=False)
+        while len(self._keys_by_file_id) > self.max_size:
+            self._keys_by_file_id.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._verdicts)
+
+    def load(self) -> None:
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+        except FileNotFoundError:
+            return
+        except json.JSONDecodeError:
+            logging.error(
+                f'Couldn\'t decode grading cache "{self.path}", starting empty'
+            )
+            return
+        # Entries of an older answer bank can never be hit again
+        for key, verdict in data["verdicts"]:
+            if key.endswith(f":{ANSWER_BANK_VERSION}"):
+                self._verdicts[key] = verdict
+        for file_id_key, key in data["file_ids"]:
+            if key in self._verdicts:
+                self._keys_by_file_id[file_id_key] = key
+        logging.warning(f"Loaded {len(self._verdicts)} cached grading verdicts")
+
+    async def save(self) -> None:
+        data = {
+            "verdicts": [[key, verdict] for key, verdict in self._verdicts.items()],
+            "file_ids": [
+                [file_id, key] for file_id, key in self._keys_by_file_id.items()
+            ],
+        }
+        await run_io(atomic_write_json, self.path, data)
+
+
+_grading_cache = None
+
+
+def get_grading_cache() -> GradingCache:
+    global _grading_cache
+    if _grading_cache is None:
+        _grading_cache = GradingCache(path=per_worker_path(GRADING_CACHE_FILE))
+        _grading_cache.load()
+    return _grading_cache
+
+
+def set_grading_cache(cache: GradingCache) -> None:
+    global _grading_cache
+    _grading_cache = cache
+
+
+def hash_file(filepath: str) -> str:
+    with open(filepath, "rb") as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+async def exception_to_verdict(e: Exception) -> Optional[dict]:
+    """Returns a cacheable verdict for deterministic failures, None otherwise"""
+    if isinstance(e, WrongAnswerError):
+        return {
+            "status": WRONG_ANSWER,
+            "correct_result": e.correct_result,
+            "user_result": e.user_result,
+        }
+    if isinstance(e, PepTestError):
+        return {"status": PEP_FAILED, "violation_list": e.violation_list}
+    if isinstance(e, SubmissionRuntimeError):
+        return {"status": RUNTIME_ERROR, "run_result": vars(e.result)}
+    return None
+
+
+async def replay_verdict(verdict: dict) -> str:
+    """Returns the cached result or raises the cached error, like run_tests would"""
+    status = verdict["status"]
+    if status == PASSED:
+        return verdict["result"]
+    if status == WRONG_ANSWER:
+        raise WrongAnswerError(verdict["correct_result"], verdict["user_result"])
+    if status == PEP_FAILED:
+        raise PepTestError(verdict["violation_list"])
+    if status == RUNTIME_ERROR:
+        raise SubmissionRuntimeError(RunResult(**verdict["run_result"]))
+    raise ValueError(f"Unknown cached verdict status {status}")
@@ -0,0 +1,145 @@
+import asyncio
+import logging
+
+from src.config.grading_config import (
+    GRADING_DRAIN_TIMEOUT,
+    GRADING_QUEUE_MAX_DEPTH,
+    GRADING_WORKERS,
+)
+from src.utils.exceptions import GradingQueueFullError, SubmissionAlreadyQueuedError
+from src.utils.metrics import registry
+
+
+class GradingQueue:
+    """Bounded queue of grading jobs served by a fixed pool of workers.
+
+    Every user has at most one job queued or running, so one student can't
+    occupy several workers. A job is a coroutine function without arguments,
+    `on_drop` is an optional one that tells the user if the job is dropped.
+
+    On stop no new jobs are accepted and the queued ones are still graded.
+    Jobs left after `drain_timeout` are cancelled and their users notified.
+    """
+
+    def __init__(
+        self,
+        workers: int = GRADING_WORKERS,
+        max_depth: int = GRADING_QUEUE_MAX_DEPTH,
+        drain_timeout: float = GRADING_DRAIN_TIMEOUT,
+    ):
+        self.workers = workers
+        self.max_depth = max_depth
+        self.drain_timeout = drain_timeout
+        self._queue = None
+        self._worker_tasks = []
+        self._users_with_jobs = set()
+        # User id -> on_drop of the jobs being graded right now
+        self._running = dict()
+        self._is_accepting = True
+        self.in_progress = 0
+
+    async def start(self) -> None:
+        if self._worker_tasks:
+            return
+        self._is_accepting = True
+        self._queue = asyncio.Queue(maxsize=self.max_depth)
+        self._worker_tasks = [
+            asyncio.create_task(self._work()) for _ in range(self.workers)
+        ]
+        logging.warning(f"Started {self.workers} grading workers")
+
+    async def stop(self) -> None:
+        self._is_accepting = False
+        if not self._worker_tasks:
+            return
+        if self._queue.qsize() or self.in_progress:
+            logging.warning(
+                f"Waiting for {self._queue.qsize()} queued and {self.in_progress} "
+                "running submissions to be graded"
+            )
+        try:
+            await asyncio.wait_for(self._queue.join(), self.drain_timeout)
+        except asyncio.TimeoutError:
+            pass
+
+        dropped = list(self._running.items())
+        while not self._queue.empty():
+            user_id, _, on_drop = self._queue.get_nowait()
+            dropped.append((user_id, on_drop))
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+        if dropped:
+            logging.error(
+                f"Dropped {len(dropped)} submissions not graded in "
+                f"{self.drain_timeout} s on shutdown"
+            )
+        for user_id, on_drop in dropped:
+            await self._notify_dropped(user_id, on_drop)
+
+    @staticmethod
+    async def _notify_dropped(user_id: int, on_drop) -> None:
+        if on_drop is None:
+            return
+        try:
+            await on_drop()
+        except Exception as e:
+            logging.error(
+                f"Couldn't tell user {user_id} that the submission was dropped. Error: {e}"
+            )
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def submit(self, user_id: int, job, on_drop=None) -> int:
+        """Queues the job and returns its position in the queue"""
+        # A stopping bot answers like a full queue, the student sends the file later
+        if not self._is_accepting:
+            raise GradingQueueFullError
+        await self.start()
+        if user_id in self._users_with_jobs:
+            raise SubmissionAlreadyQueuedError
+        if self._queue.full():
+            raise GradingQueueFullError
+        self._users_with_jobs.add(user_id)
+        self._queue.put_nowait((user_id, job, on_drop))
+        return self._queue.qsize()
+
+    async def _work(self) -> None:
+        while True:
+            user_id, job, on_drop = await self._queue.get()
+            self.in_progress += 1
+            self._running[user_id] = on_drop
+            try:
+                await job()
+            except Exception as e:
+                logging.error(f"Grading job of user {user_id} failed. Error: {e}")
+            finally:
+                self.in_progress -= 1
+                self._running.pop(user_id, None)
+                self._users_with_jobs.discard(user_id)
+                self._queue.task_done()
+
+
+_grading_queue = None
+
+
+def get_grading_queue() -> GradingQueue:
+    global _grading_queue
+    if _grading_queue is None:
+        _grading_queue = GradingQueue()
+    return _grading_queue
+
+
+registry.gauge(
+    "gsem_grading_queue_depth",
+    "Submissions waiting for a grading worker",
+    lambda: _grading_queue.depth if _grading_queue is not None else 0,
+)
+registry.gauge(
+    "gsem_grading_in_progress",
+    "Submissions being graded right now",
+    lambda: _grading_queue.in_progress if _grading_queue is not None else 0,
+)
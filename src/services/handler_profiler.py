@@ -0,0 +1,166 @@
+import cProfile
+import datetime
+import functools
+import heapq
+import io
+import logging
+import os
+import pstats
+import time
+
+from telegram import Update
+
+from src.config.profiling_config import PROFILE_DIR, PROFILE_KEEP_SLOWEST
+from src.utils.io_executor import run_io
+from src.utils.metrics import request_stages
+
+_TOP_FUNCTIONS = 40
+
+
+class HandlerProfiler:
+    """Runs handlers under cProfile and keeps the profiles of the slowest updates.
+
+    Each kept update is written as a .prof file for snakeviz or pstats and a
+    .txt report with the user, the command, the stage breakdown and the top
+    functions by cumulative time. Profiles pushed out of the slowest N are
+    deleted from disk.
+
+    cProfile can't profile two updates at once in one thread, so an update
+    arriving while another is profiled runs unprofiled. The profile covers
+    everything the event loop ran while the update was in flight.
+    """
+
+    def __init__(self, directory: str = PROFILE_DIR, keep: int = PROFILE_KEEP_SLOWEST):
+        self.directory = directory
+        self.keep = keep
+        self._slowest = []
+        self._sequence = 0
+        self._is_profiling = False
+
+    async def run(self, handler_name: str, update: Update, call):
+        if self.keep <= 0 or self._is_profiling:
+            return await call()
+        self._is_profiling = True
+        stages = dict()
+        stages_token = request_stages.set(stages)
+        profiler = cProfile.Profile()
+        started_at = time.perf_counter()
+        profiler.enable()
+        try:
+            return await call()
+        finally:
+            profiler.disable()
+            duration = time.perf_counter() - started_at
+            request_stages.reset(stages_token)
+            self._is_profiling = False
+            await self._record(handler_name, update, duration, stages, profiler)
+
+    async def _record(
+        self,
+        handler_name: str,
+        update: Update,
+        duration: float,
+        stages: dict,
+        profiler: cProfile.Profile,
+    ) -> None:
+        if len(self._slowest) >= self.keep and duration <= self._slowest[0][0]:
+            return
+        self._sequence += 1
+        base_path = os.path.join(
+            self.directory,
+            f"{duration * 1000:09.1f}ms_{handler_name}_{self._sequence}",
+        )
+        report = _format_report(handler_name, update, duration, stages, profiler)
+        stats = pstats.Stats(profiler)
+        try:
+            await run_io(_write_profile, base_path, stats, report)
+        except OSError as e:
+            logging.error(f"Couldn't save handler profile {base_path}. Error: {e}")
+            return
+        heapq.heappush(self._slowest, (duration, self._sequence, base_path))
+        if len(self._slowest) > self.keep:
+            _, _, evicted_path = heapq.heappop(self._slowest)
+            await run_io(_remove_profile, evicted_path)
+
+
+def _describe_update(update: Update) -> tuple:
+    user = update.effective_user
+    user_str = f"@{user.username} (id {user.id})" if user is not None else "unknown"
+    message = update.effective_message
+    if message is None:
+        return user_str, "no message"
+    if message.document is not None:
+        return user_str, f"document {message.document.file_name}"
+    return user_str, message.text or "no text"
+
+
+def _format_report(
+    handler_name: str,
+    update: Update,
+    duration: float,
+    stages: dict,
+    profiler: cProfile.Profile,
+) -> str:
+    user_str, command = _describe_update(update)
+    lines = [
+        f"Handler: {handler_name}",
+        f"User: {user_str}",
+        f"Command: {command}",
+        f"Finished at: {datetime.datetime.now().isoformat(timespec='seconds')}",
+        f"Duration: {duration * 1000:.1f} ms",
+        "",
+        "Stages:",
+    ]
+    if not stages:
+        lines.append("    none")
+    for stage, (total, count) in sorted(stages.items(), key=lambda item: -item[1][0]):
+        lines.append(f"    {stage}: {total * 1000:.1f} ms in {count} run(s)")
+    lines.append("")
+
+    stream = io.StringIO()
+    stats = pstats.Stats(profiler, stream=stream)
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(_TOP_FUNCTIONS)
+    lines.append(stream.getvalue())
+    return "\n".join(lines)
+
+
+def _write_profile(base_path: str, stats: pstats.Stats, report: str) -> None:
+    os.makedirs(os.path.dirname(base_path) or ".", exist_ok=True)
+    stats.dump_stats(f"{base_path}.prof")
+    with open(f"{base_path}.txt", "w", encoding="utf-8") as file:
+        file.write(report)
+
+
+def _remove_profile(base_path: str) -> None:
+    for suffix in (".prof", ".txt"):
+        try:
+            os.remove(f"{base_path}{suffix}")
+        except FileNotFoundError:
+            pass
+
+
+_handler_profiler = None
+
+
+def get_handler_profiler() -> HandlerProfiler:
+    global _handler_profiler
+    if _handler_profiler is None:
+        _handler_profiler = HandlerProfiler()
+    return _handler_profiler
+
+
+def set_handler_profiler(profiler: HandlerProfiler) -> None:
+    global _handler_profiler
+    _handler_profiler = profiler
+
+
+def profiled(handler):
+    """Wraps an update handler, or a job taking the update first, with the profiler"""
+
+    @functools.wraps(handler)
+    async def wrapper(update: Update, *args):
+        return await get_handler_profiler().run(
+            handler.__name__, update, lambda: handler(update, *args)
+        )
+
+    return wrapper
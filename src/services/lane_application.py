@@ -0,0 +1,100 @@
+import asyncio
+import logging
+from collections import deque
+
+from telegram import Update
+from telegram.ext import Application
+
+from src.config.telegram_config import UPDATE_CONCURRENCY
+from src.utils.metrics import registry
+
+
+class LaneApplication(Application):
+    """Handles updates of different users concurrently and of one user in order.
+
+    Every user gets a lane, a queue of their updates served by one task, so
+    a login, a submission and a logout are still handled one after another.
+    At most `max_concurrent_updates` updates are handled at once. An update
+    waiting in its lane doesn't take a slot, so a user with many pending
+    updates can't hold back the others.
+
+    process_update only puts the update into its lane. stop waits until the
+    lanes have handled every update that was received before it.
+    """
+
+    def __init__(self, max_concurrent_updates: int = UPDATE_CONCURRENCY, **kwargs):
+        super().__init__(**kwargs)
+        self.max_concurrent_updates = max_concurrent_updates
+        # Created in the running loop, Python 3.9 binds it to the current one
+        self._slots = None
+        self._lanes = dict()
+        self._lane_tasks = set()
+        self.in_progress = 0
+        global _lane_application
+        _lane_application = self
+
+    @property
+    def waiting(self) -> int:
+        return sum(len(lane) for lane in self._lanes.values())
+
+    async def process_update(self, update: object) -> None:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrent_updates)
+        lane_key = _lane_key(update)
+        lane = self._lanes.get(lane_key)
+        if lane is not None:
+            lane.append(update)
+            return
+        self._lanes[lane_key] = deque([update])
+        # Deliberately asyncio's create_task and not Application.create_task: the
+        # latter warns about and doesn't track tasks made once running is False,
+        # and lanes also serve updates handed over while stopping. They are
+        # tracked in _lane_tasks and awaited by stop instead
+        task = asyncio.create_task(self._serve_lane(lane_key))
+        self._lane_tasks.add(task)
+        task.add_done_callback(self._lane_tasks.discard)
+
+    async def stop(self) -> None:
+        await super().stop()
+        # The update queue is drained by now, so no new lanes can appear
+        await asyncio.gather(*self._lane_tasks, return_exceptions=True)
+
+    async def _serve_lane(self, lane_key) -> None:
+        lane = self._lanes[lane_key]
+        while lane:
+            update = lane.popleft()
+            async with self._slots:
+                self.in_progress += 1
+                try:
+                    await super().process_update(update)
+                except Exception as e:
+                    # Handler errors go to process_error, this is a failure around them
+                    logging.error(f"Couldn't process update {update}. Error: {e}")
+                finally:
+                    self.in_progress -= 1
+        # Nothing is awaited between the last check and here, no update is lost
+        del self._lanes[lane_key]
+
+
+def _lane_key(update: object):
+    if isinstance(update, Update):
+        if update.effective_user is not None:
+            return update.effective_user.id
+        if update.effective_chat is not None:
+            return update.effective_chat.id
+    # Updates of nobody in particular share one lane
+    return None
+
+
+_lane_application = None
+
+registry.gauge(
+    "gsem_updates_in_progress",
+    "Updates being handled right now",
+    lambda: _lane_application.in_progress if _lane_application is not None else 0,
+)
+registry.gauge(
+    "gsem_updates_waiting",
+    "Updates waiting for an earlier update of the same user",
+    lambda: _lane_application.waiting if _lane_application is not None else 0,
+)
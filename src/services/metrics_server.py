@@ -0,0 +1,34 @@
+import logging
+
+from src.config.metrics_config import METRICS_HOST, METRICS_PORT
+from src.utils.http_server import HttpRequest, HttpResponse, HttpServer
+from src.utils.metrics import registry
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_metrics_server = None
+
+
+async def _handle(request: HttpRequest) -> HttpResponse:
+    if request.method == "GET" and request.path == "/metrics":
+        return HttpResponse(
+            200, registry.render().encode("utf-8"), PROMETHEUS_CONTENT_TYPE
+        )
+    return HttpResponse(404, b"Not Found")
+
+
+async def start_metrics_server() -> None:
+    """Serves the metrics in Prometheus format if METRICS_PORT is set"""
+    global _metrics_server
+    if METRICS_PORT is None or _metrics_server is not None:
+        return
+    _metrics_server = HttpServer(_handle, METRICS_HOST, METRICS_PORT)
+    await _metrics_server.start()
+    logging.warning(f"Metrics are exposed at {_metrics_server.url}/metrics")
+
+
+async def stop_metrics_server() -> None:
+    global _metrics_server
+    if _metrics_server is not None:
+        await _metrics_server.stop()
+        _metrics_server = None
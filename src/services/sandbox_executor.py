@@ -0,0 +1,112 @@
+"""Runs one submission in a sandboxed interpreter started by the bot.
+
+Usage: python -I sandbox_executor.py CPU_SECONDS MEMORY_BYTES MAX_OUTPUT_BYTES
+ISOLATE_NETWORK [check]
+
+The script first limits its own resources and, if ISOLATE_NETWORK is 1, moves
+to an empty network namespace. This happens here and not in the bot, since
+the bot can't run code between fork and exec safely with its threads. With
+`check` it exits right after that. If the sandbox can't be set up, it exits
+with SETUP_FAILED_EXIT_CODE and the reason on stderr, before running anything.
+
+It then waits for the absolute path of a submission on stdin until stdin is
+closed, so the bot can start it ahead of time. The submission is run the way
+`python -I <path>` does: as __main__, from the submission's folder, with stdin
+at /dev/null, printing uncaught exceptions and exiting with the same codes.
+The process is never reused.
+
+Nothing is imported from the bot, since SUBMISSION_PYTHON may be another
+interpreter.
+"""
+import os
+import resource
+import sys
+
+SETUP_FAILED_EXIT_CODE = 125
+SETUP_FAILED_MESSAGE = "Sandbox setup failed"
+
+_CLONE_NEWUSER = 0x10000000
+_CLONE_NEWNET = 0x40000000
+
+
+def _isolate_network() -> None:
+    import ctypes
+
+    libc = ctypes.CDLL(None, use_errno=True)
+    flags = _CLONE_NEWNET if os.geteuid() == 0 else _CLONE_NEWUSER | _CLONE_NEWNET
+    if libc.unshare(flags) != 0:
+        errno = ctypes.get_errno()
+        raise OSError(errno, f"unshare failed: {os.strerror(errno)}")
+
+
+def _set_up_sandbox(
+    cpu_seconds: int, memory_bytes: int, max_output_bytes: int, isolate_network: bool
+) -> None:
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 1))
+    resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+    resource.setrlimit(resource.RLIMIT_FSIZE, (max_output_bytes, max_output_bytes))
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+    if isolate_network:
+        _isolate_network()
+
+
+def _read_path() -> str:
+    chunks = []
+    while True:
+        chunk = os.read(0, 4096)
+        if not chunk:
+            break
+        chunks.append(chunk)
+    return b"".join(chunks).decode("utf-8").strip()
+
+
+def _run(path: str) -> None:
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(devnull, 0)
+    os.close(devnull)
+    os.chdir(os.path.dirname(path))
+    sys.argv = [path]
+
+    module = type(sys)("__main__")
+    module.__file__ = path
+    module.__cached__ = None
+    sys.modules["__main__"] = module
+    try:
+        with open(path, "rb") as file:
+            code = compile(file.read(), path, "exec")
+        exec(code, module.__dict__)
+    except SystemExit:
+        raise
+    except BaseException:
+        exc_type, exc, traceback = sys.exc_info()
+        # Leaves this function out of the traceback
+        traceback = traceback.tb_next
+        sys.excepthook(exc_type, exc.with_traceback(traceback), traceback)
+        sys.exit(1)
+
+
+def main() -> None:
+    cpu_seconds, memory_bytes, max_output_bytes, isolate_network = sys.argv[1:5]
+    try:
+        _set_up_sandbox(
+            int(cpu_seconds),
+            int(memory_bytes),
+            int(max_output_bytes),
+            isolate_network == "1",
+        )
+    except (OSError, ValueError) as e:
+        sys.stderr.write(f"{SETUP_FAILED_MESSAGE}: {e}\n")
+        sys.stderr.flush()
+        os._exit(SETUP_FAILED_EXIT_CODE)
+    if sys.argv[5:] == ["check"]:
+        return
+
+    path = _read_path()
+    if not path:
+        # The bot stopped before giving this interpreter a submission
+        return
+    _run(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,372 @@
+import asyncio
+import collections
+import functools
+import logging
+import os
+import signal
+import subprocess
+import time
+
+from src.config.sandbox_config import (
+    SUBMISSION_CPU_TIMEOUT,
+    SUBMISSION_ISOLATE_NETWORK,
+    SUBMISSION_MAX_OUTPUT_BYTES,
+    SUBMISSION_MEMORY_LIMIT_MB,
+    SUBMISSION_POOL_SIZE,
+    SUBMISSION_PYTHON,
+    SUBMISSION_WALL_TIMEOUT,
+)
+from src.entities.run_result import RunResult
+from src.services.sandbox_executor import (
+    SETUP_FAILED_EXIT_CODE,
+    SETUP_FAILED_MESSAGE,
+)
+from src.utils.exceptions import SandboxSetupError
+from src.utils.metrics import registry
+
+_READ_CHUNK_SIZE = 64 * 1024
+# Time given to the pipes to reach EOF once the submission has exited
+_PIPE_DRAIN_TIMEOUT = 1
+_CHECK_TIMEOUT = 30
+_EXECUTOR_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "sandbox_executor.py"
+)
+
+# Set by the sandbox check, the host may not allow network namespaces
+_sandbox_check = None
+
+
+def _sandbox_env() -> dict:
+    return {
+        "PATH": os.environ.get("PATH", ""),
+        "LANG": "C.UTF-8",
+        "PYTHONIOENCODING": "utf-8",
+        "PYTHONDONTWRITEBYTECODE": "1",
+    }
+
+
+def _executor_args(*extra_args) -> list:
+    return [
+        SUBMISSION_PYTHON,
+        "-I",
+        _EXECUTOR_PATH,
+        str(SUBMISSION_CPU_TIMEOUT),
+        str(SUBMISSION_MEMORY_LIMIT_MB * 1024 * 1024),
+        str(SUBMISSION_MAX_OUTPUT_BYTES),
+        "1" if SUBMISSION_ISOLATE_NETWORK else "0",
+        *extra_args,
+    ]
+
+
+def _kill_process_group(pid: int) -> None:
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+async def _spawn(args: list, stdin) -> subprocess.Popen:
+    """Starts a child in its own process group, it sets up its sandbox itself"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        None,
+        functools.partial(
+            subprocess.Popen,
+            args,
+            stdin=stdin,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            env=_sandbox_env(),
+            start_new_session=True,
+        ),
+    )
+
+
+def _discard(process: subprocess.Popen) -> None:
+    _kill_process_group(process.pid)
+    process.wait()
+    for pipe in (process.stdin, process.stdout, process.stderr):
+        try:
+            if pipe is not None:
+                pipe.close()
+        except OSError:
+            pass
+
+
+async def _probe_sandbox():
+    """Returns why a child can't set up its sandbox, None if it can"""
+    try:
+        process = await _spawn(_executor_args("check"), subprocess.DEVNULL)
+    except (OSError, subprocess.SubprocessError) as e:
+        return str(e)
+    loop = asyncio.get_running_loop()
+    try:
+        _, stderr = await loop.run_in_executor(
+            None, functools.partial(process.communicate, timeout=_CHECK_TIMEOUT)
+        )
+    except subprocess.TimeoutExpired:
+        _discard(process)
+        return f"the check took longer than {_CHECK_TIMEOUT} seconds"
+    if process.returncode != 0:
+        return stderr.decode("utf-8", errors="replace").strip() or (
+            f"exit code {process.returncode}"
+        )
+    return None
+
+
+async def _check_sandbox() -> None:
+    error = await _probe_sandbox()
+    if error is not None:
+        if SUBMISSION_ISOLATE_NETWORK:
+            error += (
+                ". Network isolation may be unavailable on this host, set "
+                "SUBMISSION_ISOLATE_NETWORK=false to run submissions with network access"
+            )
+        logging.critical(f"Submissions can't be run on this host. Error: {error}")
+        raise SandboxSetupError(error)
+    if SUBMISSION_ISOLATE_NETWORK:
+        logging.warning("Submission sandbox is ready, network isolation: on")
+    else:
+        logging.warning(
+            "Submission sandbox is ready, submissions run with network access "
+            "since SUBMISSION_ISOLATE_NETWORK=false"
+        )
+
+
+async def check_sandbox() -> None:
+    """Sets the sandbox up once in a child before any submission runs.
+
+    Raises SandboxSetupError if the resource limits can't be applied, or if
+    network isolation is on and the host has no network namespaces, e.g.
+    under Docker's default seccomp profile. Submissions never silently run
+    with network access, only with SUBMISSION_ISOLATE_NETWORK=false.
+    """
+    global _sandbox_check
+    if _sandbox_check is None or _sandbox_check.cancelled():
+        _sandbox_check = asyncio.ensure_future(_check_sandbox())
+    await _sandbox_check
+
+
+def _hand_over(process: subprocess.Popen, filepath: str) -> bool:
+    """Sends the submission to a waiting executor, False if it already exited"""
+    try:
+        process.stdin.write(filepath.encode("utf-8") + b"\n")
+        process.stdin.close()
+    except BrokenPipeError:
+        try:
+            process.stdin.close()
+        except BrokenPipeError:
+            pass
+        return False
+    return True
+
+
+class InterpreterPool:
+    """Interpreters started ahead of time, each waiting to run one submission.
+
+    Starting Python and importing site takes longer than running a usual task
+    script, so up to `size` interpreters running sandbox_executor are kept
+    ready. An interpreter runs a single submission and is then thrown away, a
+    new one is started in the background to take its place once it exits.
+    The executor applies the limits and network isolation as it starts. With
+    no ready interpreter the submission runs in a fresh one.
+
+    If an interpreter can't be started, the pool logs it once and stops
+    refilling. A submission that gets through a fresh interpreter resumes it.
+    """
+
+    def __init__(self, size: int = SUBMISSION_POOL_SIZE):
+        self.size = size
+        self._idle = collections.deque()
+        self._starting = set()
+        self._is_stopped = False
+        # Set when interpreters fail to start, until a fresh run succeeds
+        self._is_failing = False
+
+    @property
+    def idle(self) -> int:
+        return len(self._idle)
+
+    async def start(self) -> None:
+        await check_sandbox()
+        self._is_stopped = False
+        self.refill()
+
+    async def stop(self) -> None:
+        self._is_stopped = True
+        await asyncio.gather(*self._starting, return_exceptions=True)
+        while self._idle:
+            _discard(self._idle.popleft())
+
+    def refill(self) -> None:
+        """Starts interpreters in the background until `size` are ready or starting"""
+        if self._is_stopped or self._is_failing:
+            return
+        for _ in range(self.size - len(self._idle) - len(self._starting)):
+            task = asyncio.create_task(self._start_interpreter())
+            self._starting.add(task)
+            task.add_done_callback(self._starting.discard)
+
+    def _stop_refilling(self, error) -> None:
+        if not self._is_failing:
+            logging.critical(
+                "Couldn't start a submission interpreter, the pool isn't refilled "
+                f"until a submission runs in a fresh one. Error: {error}"
+            )
+        self._is_failing = True
+
+    async def _start_interpreter(self) -> None:
+        try:
+            await check_sandbox()
+            process = await _spawn(_executor_args(), subprocess.PIPE)
+        except (OSError, subprocess.SubprocessError, SandboxSetupError) as e:
+            self._stop_refilling(e)
+            return
+        if self._is_stopped:
+            _discard(process)
+        else:
+            self._idle.append(process)
+
+    async def start_submission(self, filepath: str) -> subprocess.Popen:
+        """Hands the submission to a ready interpreter and returns its process"""
+        await check_sandbox()
+        filepath = os.path.abspath(filepath)
+        while self._idle:
+            process = self._idle.popleft()
+            if _hand_over(process, filepath):
+                return process
+            # Exited while waiting, e.g. killed from outside
+            _discard(process)
+            if process.returncode == SETUP_FAILED_EXIT_CODE:
+                self._stop_refilling(
+                    "the sandbox setup failed in a waiting interpreter"
+                )
+        sandbox_cold_starts.inc()
+        process = await _spawn(_executor_args(), subprocess.PIPE)
+        # If the executor has already exited, reaping it tells why
+        _hand_over(process, filepath)
+        return process
+
+    def finish_submission(self, is_set_up: bool) -> None:
+        """Replaces the exited interpreter, unless its sandbox setup failed"""
+        if not is_set_up:
+            self._stop_refilling("the sandbox setup failed in a submission interpreter")
+            return
+        if self._is_failing:
+            logging.warning("Submission interpreters start again, refilling the pool")
+            self._is_failing = False
+        # Replaced only now, starting Python next to the submission slows it down
+        self.refill()
+
+
+_interpreter_pool = None
+
+
+def get_interpreter_pool() -> InterpreterPool:
+    global _interpreter_pool
+    if _interpreter_pool is None:
+        _interpreter_pool = InterpreterPool()
+    return _interpreter_pool
+
+
+def set_interpreter_pool(pool: InterpreterPool) -> None:
+    global _interpreter_pool
+    _interpreter_pool = pool
+
+
+sandbox_cold_starts = registry.counter(
+    "gsem_sandbox_cold_starts_total",
+    "Submissions run in a freshly started interpreter, no ready one was left",
+)
+registry.gauge(
+    "gsem_sandbox_ready_interpreters",
+    "Interpreters started and waiting for a submission",
+    lambda: _interpreter_pool.idle if _interpreter_pool is not None else 0,
+)
+
+
+async def _read_pipe(pipe, pid: int) -> bytes:
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader()
+    transport, _ = await loop.connect_read_pipe(
+        lambda: asyncio.StreamReaderProtocol(reader), pipe
+    )
+    chunks = []
+    size = 0
+    try:
+        while True:
+            chunk = await reader.read(_READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            size += len(chunk)
+            if size > SUBMISSION_MAX_OUTPUT_BYTES:
+                logging.error(f"Submission {pid} exceeded the output limit, killing it")
+                _kill_process_group(pid)
+                break
+    finally:
+        transport.close()
+    return b"".join(chunks)[:SUBMISSION_MAX_OUTPUT_BYTES]
+
+
+async def run_submission(filepath: str) -> RunResult:
+    """Runs a student's script in a resource-limited child without network.
+
+    The child is a ready interpreter from the pool when there is one.
+    Raises SandboxSetupError if the child couldn't set up its sandbox.
+    The child is reaped with wait4 to get its own resource usage, the event
+    loop is never blocked while it runs.
+    """
+    loop = asyncio.get_running_loop()
+    started_at = time.monotonic()
+    process = await get_interpreter_pool().start_submission(filepath)
+    stdout_task = asyncio.ensure_future(_read_pipe(process.stdout, process.pid))
+    stderr_task = asyncio.ensure_future(_read_pipe(process.stderr, process.pid))
+    reap = loop.run_in_executor(None, os.wait4, process.pid, 0)
+
+    timed_out = False
+    done, _ = await asyncio.wait({reap}, timeout=SUBMISSION_WALL_TIMEOUT)
+    if not done:
+        timed_out = True
+        _kill_process_group(process.pid)
+    _, status, rusage = await reap
+    wall_time = time.monotonic() - started_at
+    # Already reaped, Popen must not wait for the pid again
+    process.returncode = exit_code = os.waitstatus_to_exitcode(status)
+    # Kills whatever the submission left behind so the pipes get closed
+    _kill_process_group(process.pid)
+
+    done, pending = await asyncio.wait(
+        {stdout_task, stderr_task}, timeout=_PIPE_DRAIN_TIMEOUT
+    )
+    for task in pending:
+        task.cancel()
+    stdout = stdout_task.result() if stdout_task in done else b""
+    stderr = stderr_task.result() if stderr_task in done else b""
+
+    is_set_up = not (
+        exit_code == SETUP_FAILED_EXIT_CODE
+        and stderr.startswith(SETUP_FAILED_MESSAGE.encode())
+    )
+    get_interpreter_pool().finish_submission(is_set_up)
+    if not is_set_up:
+        raise SandboxSetupError(stderr.decode("utf-8", errors="replace").strip())
+
+    cpu_time = rusage.ru_utime + rusage.ru_stime
+    # RLIMIT_CPU sends SIGXCPU at the soft limit and SIGKILL at the hard one
+    if exit_code == -signal.SIGXCPU:
+        timed_out = True
+    elif exit_code == -signal.SIGKILL and cpu_time >= SUBMISSION_CPU_TIMEOUT:
+        timed_out = True
+
+    result = RunResult(
+        exit_code=exit_code,
+        stdout=stdout.decode("utf-8", errors="replace"),
+        stderr=stderr.decode("utf-8", errors="replace"),
+        wall_time=wall_time,
+        cpu_time=cpu_time,
+        peak_rss_kb=rusage.ru_maxrss,
+        timed_out=timed_out,
+    )
+    logging.info(f"Ran submission {filepath}: {result}")
+    return result
@@ -0,0 +1,70 @@
+from src.config.scale_out_config import BOT_WORKER_ID, BOT_WORKERS
+from src.config.telegram_config import (
+    TELEGRAM_CHAT_BURST,
+    TELEGRAM_CHAT_RATE,
+    TELEGRAM_GLOBAL_RATE,
+)
+from src.utils.token_bucket import TokenBucket
+
+# Idle chats are forgotten once this many buckets are kept
+_MAX_CHAT_BUCKETS = 10000
+
+
+class SendThrottle:
+    """Keeps outgoing messages within Telegram's per-chat and global limits.
+
+    A send waits for its chat's bucket first and for the global one second,
+    so a chat that is over its limit doesn't hold back the others.
+    """
+
+    def __init__(
+        self,
+        global_rate: float = TELEGRAM_GLOBAL_RATE,
+        chat_rate: float = TELEGRAM_CHAT_RATE,
+        chat_burst: int = TELEGRAM_CHAT_BURST,
+    ):
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self._global = (
+            TokenBucket(global_rate, max(global_rate, 1)) if global_rate > 0 else None
+        )
+        self._chats = dict()
+
+    async def acquire(self, chat_id: int) -> None:
+        if self.chat_rate > 0:
+            await self._chat_bucket(chat_id).acquire()
+        if self._global is not None:
+            await self._global.acquire()
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= _MAX_CHAT_BUCKETS:
+                self._forget_idle_chats()
+            bucket = self._chats[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    def _forget_idle_chats(self) -> None:
+        for chat_id in [
+            chat_id for chat_id, bucket in self._chats.items() if bucket.is_full()
+        ]:
+            del self._chats[chat_id]
+
+
+_send_throttle = None
+
+
+def get_send_throttle() -> SendThrottle:
+    global _send_throttle
+    if _send_throttle is None:
+        global_rate = TELEGRAM_GLOBAL_RATE
+        # The global limit is per bot, every worker process gets an equal share
+        if BOT_WORKER_ID is not None:
+            global_rate /= BOT_WORKERS
+        _send_throttle = SendThrottle(global_rate=global_rate)
+    return _send_throttle
+
+
+def set_send_throttle(throttle: SendThrottle) -> None:
+    global _send_throttle
+    _send_throttle = throttle
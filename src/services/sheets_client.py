@@ -0,0 +1,120 @@
+import asyncio
+import functools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import gspread
+from gspread import Spreadsheet, Worksheet
+from gspread.exceptions import APIError
+
+from src.config.sheets_config import (
+    SHEETS_CREDENTIALS_FILE,
+    SHEETS_HANDLE_TTL_SECONDS,
+    SHEETS_WORKERS,
+    SPREADSHEET_NAME,
+)
+from src.utils.metrics import sheets_calls, sheets_failures, timed_stage
+
+
+class SheetsClient:
+    """Long-lived gspread client with cached spreadsheet and worksheet handles.
+
+    The service account is authorized once, the spreadsheet and worksheets are
+    reopened only after the TTL expires. Every gspread call runs on a dedicated
+    thread pool, so a slow Google response never blocks other updates.
+    """
+
+    def __init__(
+        self,
+        credentials_file: str = SHEETS_CREDENTIALS_FILE,
+        spreadsheet_name: str = SPREADSHEET_NAME,
+        ttl: float = SHEETS_HANDLE_TTL_SECONDS,
+        workers: int = SHEETS_WORKERS,
+        client=None,
+    ):
+        self.credentials_file = credentials_file
+        self.spreadsheet_name = spreadsheet_name
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="sheets"
+        )
+        # Handles are opened from the executor threads
+        self._lock = threading.RLock()
+        # An already authorized client, e.g. the fake one in benchmarks
+        self._client = client
+        self._spreadsheet = None
+        self._spreadsheet_opened_at = 0.0
+        self._worksheets = dict()
+
+    async def run(self, func, *args, **kwargs):
+        """Runs a blocking gspread call outside the event loop"""
+        loop = asyncio.get_running_loop()
+        sheets_calls.inc(method=getattr(func, "__name__", "call").lstrip("_"))
+        try:
+            with timed_stage("sheets"):
+                return await loop.run_in_executor(
+                    self._executor, functools.partial(func, *args, **kwargs)
+                )
+        except APIError as e:
+            sheets_failures.inc(reason=str(e.response.status_code))
+            raise
+        except Exception as e:
+            sheets_failures.inc(reason=type(e).__name__)
+            raise
+
+    async def get_spreadsheet(self) -> Spreadsheet:
+        return await self.run(self._get_spreadsheet)
+
+    async def get_worksheet(self, title: str) -> Worksheet:
+        return await self.run(self._get_worksheet, title)
+
+    def invalidate(self) -> None:
+        """Drops the cached handles, e.g. after worksheets were recreated"""
+        with self._lock:
+            self._spreadsheet = None
+            self._worksheets = dict()
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+
+    def _is_expired(self, opened_at: float) -> bool:
+        return time.monotonic() - opened_at >= self.ttl
+
+    def _get_spreadsheet(self) -> Spreadsheet:
+        with self._lock:
+            if self._client is None:
+                self._client = gspread.service_account(filename=self.credentials_file)
+            if self._spreadsheet is None or self._is_expired(
+                self._spreadsheet_opened_at
+            ):
+                self._spreadsheet = self._client.open(self.spreadsheet_name)
+                self._spreadsheet_opened_at = time.monotonic()
+                self._worksheets = dict()
+                logging.warning(f'Opened spreadsheet "{self.spreadsheet_name}"')
+            return self._spreadsheet
+
+    def _get_worksheet(self, title: str) -> Worksheet:
+        with self._lock:
+            cached = self._worksheets.get(title)
+            if cached is not None and not self._is_expired(cached[1]):
+                return cached[0]
+            worksheet = self._get_spreadsheet().worksheet(title)
+            self._worksheets[title] = (worksheet, time.monotonic())
+            return worksheet
+
+
+_sheets_client = None
+
+
+def get_sheets_client() -> SheetsClient:
+    global _sheets_client
+    if _sheets_client is None:
+        _sheets_client = SheetsClient()
+    return _sheets_client
+
+
+def set_sheets_client(client: SheetsClient) -> None:
+    global _sheets_client
+    _sheets_client = client
@@ -0,0 +1,287 @@
+import asyncio
+import json
+import logging
+import random
+import time
+from collections import OrderedDict
+
+from gspread.exceptions import APIError, WorksheetNotFound
+from gspread.utils import rowcol_to_a1
+from requests.exceptions import RequestException
+
+from src.config.scale_out_config import per_worker_path
+from src.config.sheets_config import (
+    SHEETS_BACKOFF_BASE_SECONDS,
+    SHEETS_BACKOFF_MAX_SECONDS,
+    SHEETS_BREAKER_COOLDOWN_SECONDS,
+    SHEETS_BREAKER_FAILURES,
+    SHEETS_OUTBOX_INTERVAL_SECONDS,
+)
+from src.services.sheets_client import get_sheets_client
+from src.services.worksheet_index import COLS_PER_TASK, worksheet_indexes
+from src.utils.atomic_files import atomic_write_json
+from src.utils.io_executor import run_io
+from src.utils.metrics import registry
+from src.utils.namings import SHEETS_OUTBOX_FILE
+
+# Quota exhaustion and server-side failures, expected to pass on a retry
+_RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+# Lost access fails every worksheet alike, so it's retried like an outage
+_ACCESS_STATUS_CODES = {401, 403}
+
+
+def _is_rejected_write(error: APIError) -> bool:
+    """A client error that a retry of the same write would get again"""
+    status_code = error.response.status_code
+    return (
+        400 <= status_code < 500
+        and status_code not in _RETRYABLE_STATUS_CODES
+        and status_code not in _ACCESS_STATUS_CODES
+    )
+
+
+class CircuitBreaker:
+    """Opens after `threshold` failures in a row, then lets a single trial
+    through every `cooldown` seconds until a call succeeds again.
+    """
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self._opened_at = None
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def retry_in(self) -> float:
+        """Seconds until the next trial call is allowed"""
+        if self._opened_at is None:
+            return 0
+        return max(0.0, self._opened_at + self.cooldown - time.monotonic())
+
+    def record_success(self) -> None:
+        if self._opened_at is not None:
+            logging.warning("Google Sheets is reachable again, circuit closed")
+        self.failures = 0
+        self._opened_at = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.failures >= self.threshold:
+            if self._opened_at is None:
+                logging.critical(
+                    f"Google Sheets failed {self.failures} times in a row, "
+                    f"pausing writes for {self.cooldown} seconds"
+                )
+            self._opened_at = time.monotonic()
+
+
+class SheetsOutbox:
+    """Durable queue of progress cells waiting to be written to Google Sheets.
+
+    Grading only records the cells locally, a background worker writes them.
+    Pending writes to the same task of the same student are merged, the latest
+    one wins. Every drain makes one batch_update per worksheet. Quota and
+    server errors are retried with exponential backoff, and a circuit breaker
+    stops calling Google after repeated failures. A batch Google rejects as
+    invalid is dropped, so it doesn't hold back the other worksheets.
+    """
+
+    def __init__(
+        self,
+        path: str = SHEETS_OUTBOX_FILE,
+        interval: float = SHEETS_OUTBOX_INTERVAL_SECONDS,
+        backoff_base: float = SHEETS_BACKOFF_BASE_SECONDS,
+        backoff_max: float = SHEETS_BACKOFF_MAX_SECONDS,
+        breaker: CircuitBreaker = None,
+    ):
+        self.path = path
+        self.interval = interval
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker(
+            SHEETS_BREAKER_FAILURES, SHEETS_BREAKER_COOLDOWN_SECONDS
+        )
+        self._entries = OrderedDict()
+        self._save_lock = asyncio.Lock()
+        self._worker_task = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _key(group: str, student_name: str, task: str) -> tuple:
+        return group, student_name, task
+
+    def load(self) -> None:
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                entries = json.load(file)
+        except FileNotFoundError:
+            return
+        except json.JSONDecodeError:
+            logging.critical(f'Couldn\'t decode Sheets outbox "{self.path}"')
+            return
+        for entry in entries:
+            key = self._key(entry["group"], entry["student_name"], entry["task"])
+            self._entries[key] = entry
+        if self._entries:
+            logging.warning(f"Loaded {len(self._entries)} pending Sheets writes")
+
+    async def _save(self) -> None:
+        async with self._save_lock:
+            # The snapshot is taken under the lock, so the last save is the newest
+            await run_io(atomic_write_json, self.path, list(self._entries.values()))
+
+    async def enqueue(
+        self, group: str, student_name: str, task: str, values: list
+    ) -> None:
+        """Records the Passed, Date and Log values of the task, durably"""
+        key = self._key(group, student_name, task)
+        self._entries.pop(key, None)
+        self._entries[key] = {
+            "group": group,
+            "student_name": student_name,
+            "task": task,
+            "values": values,
+        }
+        await self._save()
+
+    async def start(self) -> None:
+        if self._worker_task is None:
+            self.load()
+            self._worker_task = asyncio.create_task(self._drain_periodically())
+
+    async def stop(self) -> None:
+        if self._worker_task is not None:
+            self._worker_task.cancel()
+            try:
+                await self._worker_task
+            except asyncio.CancelledError:
+                pass
+            self._worker_task = None
+        if self._entries:
+            logging.warning(
+                f"{len(self._entries)} Sheets writes stay in the outbox until next start"
+            )
+
+    def _next_delay(self) -> float:
+        if self.breaker.is_open:
+            return max(self.breaker.retry_in(), self.interval)
+        if self.breaker.failures:
+            delay = min(
+                self.backoff_max, self.backoff_base * 2 ** (self.breaker.failures - 1)
+            )
+            return delay * random.uniform(0.5, 1)
+        return self.interval
+
+    async def _drain_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self._next_delay())
+            if not self._entries or self.breaker.retry_in():
+                continue
+            try:
+                await self.drain()
+                self.breaker.record_success()
+            except APIError as e:
+                if e.response.status_code in _RETRYABLE_STATUS_CODES:
+                    logging.error(f"Google Sheets refused the outbox drain. Error: {e}")
+                else:
+                    logging.critical(
+                        f"Google Sheets rejected the outbox drain. Error: {e}"
+                    )
+                self.breaker.record_failure()
+            except (RequestException, OSError) as e:
+                logging.error(f"Couldn't reach Google Sheets. Error: {e}")
+                self.breaker.record_failure()
+            except Exception as e:
+                logging.critical(f"Unexpected error while draining Sheets outbox: {e}")
+                self.breaker.record_failure()
+
+    async def drain(self) -> None:
+        """Writes everything pending, one batch_update per worksheet"""
+        entries_by_group = OrderedDict()
+        for key, entry in list(self._entries.items()):
+            entries_by_group.setdefault(entry["group"], []).append((key, entry))
+        for group, entries in entries_by_group.items():
+            written = await self._write_group(group, entries)
+            for key, entry in written:
+                # A newer write for the same cells could arrive meanwhile
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+            await self._save()
+
+    async def _write_group(self, group: str, entries: list) -> list:
+        """Returns the entries which are done, written or impossible to write"""
+        client = get_sheets_client()
+        try:
+            worksheet = await client.get_worksheet(group)
+        except WorksheetNotFound:
+            logging.error(
+                f'Worksheet "{group}" is missing, dropped {len(entries)} writes'
+            )
+            return entries
+
+        data = []
+        for key, entry in entries:
+            location = await worksheet_indexes.locate(
+                worksheet, entry["student_name"], entry["task"]
+            )
+            if location is None:
+                logging.error(
+                    f'Student {entry["student_name"]} or {entry["task"]} is missing '
+                    f'in worksheet "{group}", dropped the write'
+                )
+                continue
+            row, col = location
+            cells_range = (
+                f"{rowcol_to_a1(row, col)}:{rowcol_to_a1(row, col + COLS_PER_TASK - 1)}"
+            )
+            data.append({"range": cells_range, "values": [entry["values"]]})
+
+        if data:
+            try:
+                await client.run(
+                    worksheet.batch_update, data, value_input_option="USER_ENTERED"
+                )
+            except APIError as e:
+                if not _is_rejected_write(e):
+                    raise
+                students = ", ".join(
+                    f'{entry["student_name"]} {entry["task"]} {entry["values"]}'
+                    for _, entry in entries
+                )
+                logging.critical(
+                    f'Google Sheets rejected the writes to worksheet "{group}", '
+                    f"dropped them: {students}. Error: {e}"
+                )
+        return entries
+
+
+_sheets_outbox = None
+
+
+def get_sheets_outbox() -> SheetsOutbox:
+    global _sheets_outbox
+    if _sheets_outbox is None:
+        _sheets_outbox = SheetsOutbox(path=per_worker_path(SHEETS_OUTBOX_FILE))
+    return _sheets_outbox
+
+
+def set_sheets_outbox(outbox: SheetsOutbox) -> None:
+    global _sheets_outbox
+    _sheets_outbox = outbox
+
+
+registry.gauge(
+    "gsem_sheets_outbox_pending",
+    "Progress writes waiting to be sent to Google Sheets",
+    lambda: len(_sheets_outbox) if _sheets_outbox is not None else 0,
+)
+registry.gauge(
+    "gsem_sheets_circuit_open",
+    "1 while Google Sheets calls are paused after repeated failures",
+    lambda: int(_sheets_outbox is not None and _sheets_outbox.breaker.is_open),
+)
@@ -1,70 +1,107 @@
-import gspread
 from datetime import datetime
+
 from gspread import Spreadsheet
-from gspread.exceptions import APIError
+from gspread.utils import absolute_range_name, rowcol_to_a1
 
 from src.services.session_services import get_user_from_token
-
-PATH = "C:\\Users\\nikit\PycharmProjects\GSEM_URFU_bot\spreadsheets_data\gsembotproject-f2e927905a89.json"
-SPREADSHEET_NAME = "Student-Progress"
+from src.services.sheets_client import get_sheets_client
+from src.services.sheets_outbox import get_sheets_outbox
+from src.services.worksheet_index import (
+    FIRST_STUDENT_ROW,
+    HEADER_WIDTH,
+    WorksheetIndex,
+    layout_header,
+    worksheet_indexes,
+)
+
+WORKSHEET_ROWS = 100
+WORKSHEET_COLS = 100
+# Title of a new group worksheet until the old one is deleted
+TEMPORARY_TITLE = 'gsem-new-{}'
 
 
 async def get_spreadsheet() -> Spreadsheet:
-    gc = gspread.service_account(filename=PATH)
-    return gc.open(SPREADSHEET_NAME)  # долго работает, тормозит работу программы
+    return await get_sheets_client().get_spreadsheet()
 
 
 async def fulfill_worksheets(token_dict: dict) -> None:
-    sh = await get_spreadsheet()
+    """Recreates a worksheet for every group in two spreadsheet-level requests"""
+    client = get_sheets_client()
+    sh = await client.get_spreadsheet()
     await update_worksheets(token_dict, sh)
+    # Worksheets were recreated, cached handles and indexes point to deleted ones
+    client.invalidate()
+    worksheet_indexes.clear()
     await fulfill_cells(token_dict, sh)
 
 
 async def update_worksheets(token_dict: dict, sh: Spreadsheet) -> None:
-    groups = await get_groups(token_dict)
-    worksheets = sh.worksheets()  # долго работает, тормозит работу программы
-    titles = [i.title for i in worksheets]
-    for group_name in groups:
-        if group_name in titles:
-            sh.del_worksheet(sh.worksheet(group_name))  # долго работает, тормозит работу программы
-        sh.add_worksheet(title=group_name, rows=100, cols=100)  # долго работает, тормозит работу программы
+    """Replaces the group worksheets and makes their headers bold in one batch_update.
+
+    New worksheets are added under temporary titles first and renamed once the
+    old ones are deleted, so the spreadsheet never runs out of sheets midway,
+    which Google rejects. The new worksheets get self-assigned ids.
+    """
+    client = get_sheets_client()
+    groups_of_students = await get_students_by_groups(token_dict)
+    worksheets = await client.run(sh.worksheets)
+    ids_by_title = {i.title: i.id for i in worksheets}
+    next_sheet_id = max(ids_by_title.values(), default=0) + 1
+
+    requests = []
+    new_sheet_ids = dict()
+    for group_name, student_list in groups_of_students.items():
+        sheet_id = next_sheet_id
+        next_sheet_id += 1
+        new_sheet_ids[group_name] = sheet_id
+        row_count = max(WORKSHEET_ROWS, FIRST_STUDENT_ROW + len(student_list))
+        requests.append({
+            'addSheet': {
+                'properties': {
+                    'sheetId': sheet_id,
+                    'title': TEMPORARY_TITLE.format(sheet_id),
+                    'gridProperties': {'rowCount': row_count, 'columnCount': WORKSHEET_COLS},
+                }
+            }
+        })
+        requests.append({
+            'repeatCell': {
+                'range': {
+                    'sheetId': sheet_id,
+                    'startRowIndex': 0,
+                    'endRowIndex': FIRST_STUDENT_ROW - 1,
+                    'startColumnIndex': 0,
+                    'endColumnIndex': HEADER_WIDTH,
+                },
+                'cell': {'userEnteredFormat': {'textFormat': {'bold': True}}},
+                'fields': 'userEnteredFormat.textFormat.bold',
+            }
+        })
+    for group_name in groups_of_students:
+        if group_name in ids_by_title:
+            requests.append({'deleteSheet': {'sheetId': ids_by_title[group_name]}})
+    for group_name, sheet_id in new_sheet_ids.items():
+        requests.append({
+            'updateSheetProperties': {
+                'properties': {'sheetId': sheet_id, 'title': group_name},
+                'fields': 'title',
+            }
+        })
+    await client.run(sh.batch_update, {'requests': requests})
 
 
 async def fulfill_cells(token_dict: dict, sh: Spreadsheet) -> None:
-    try:
-        worksheets = sh.worksheets()
-        groups_of_students = await get_students_by_groups(token_dict)
-        for ws in worksheets:
-
-            ws.update_cell(2, 1, 'Name')
-
-            cell_list = ws.range('B1:AC1')
-            for i in range(len(cell_list)):
-                cell = cell_list[i]
-                value = ''
-                if i % 3 == 0:
-                    value = f'task{i // 3 + 1}'
-                cell.value = value
-            ws.update_cells(cell_list)
-
-            cell_list = ws.range('B2:AE2')
-            for i in range(len(cell_list)):
-                cell = cell_list[i]
-                if i % 3 == 0:
-                    value = 'Passed'
-                elif i % 3 == 1:
-                    value = 'Date'
-                else:
-                    value = 'Log'
-                cell.value = value
-            ws.update_cells(cell_list)
-
-            student_list = groups_of_students[ws.title]
-            ws.update(student_list, f'A3:A{len(student_list) + 3}')
-            ws.format('A1:AE2', {'textFormat': {'bold': True}})
-
-    except APIError as e:
-        raise e
+    """Writes headers and student lists of all group worksheets in one values_batch_update"""
+    client = get_sheets_client()
+    groups_of_students = await get_students_by_groups(token_dict)
+    header = layout_header()
+    data = []
+    for group_name, student_list in groups_of_students.items():
+        values = header + student_list
+        cells_range = f'A1:{rowcol_to_a1(len(values), HEADER_WIDTH)}'
+        data.append({'range': absolute_range_name(group_name, cells_range), 'values': values})
+        worksheet_indexes.put(group_name, WorksheetIndex.from_layout([i[0] for i in student_list]))
+    await client.run(sh.values_batch_update, {'valueInputOption': 'RAW', 'data': data})
 
 
 async def get_students_by_groups(token_dict: dict) -> dict:
@@ -78,33 +115,29 @@ async def get_students_by_groups(token_dict: dict) -> dict:
 
 
 async def mark_progress_in_google(token: str, filename: str, is_answer_right: bool, is_pep_valid: bool) -> None:
-    try:
-        user = await get_user_from_token(token)
-        sh = await get_spreadsheet()
-        worksheet = sh.worksheet(user.group)
-        name_cell = worksheet.find(f"{user.last_name} {user.first_name}")
-        task_cell = worksheet.find(filename.split('.')[0])
-
-        # Get the current date and time
-        current_date_time = datetime.now()
-        # Format the current date in the "day.month.year" format
-        formatted_date = current_date_time.strftime("%d.%m.%Y")
-
-        if is_answer_right and is_pep_valid:
-            worksheet.update_cell(name_cell.row, task_cell.col, '\'+')
-            worksheet.update_cell(name_cell.row, task_cell.col + 1, formatted_date)
-            worksheet.update_cell(name_cell.row, task_cell.col + 2, "Answer: +\nPep: +")
-        elif is_answer_right and not is_pep_valid:
-            worksheet.update_cell(name_cell.row, task_cell.col, '-')
-            worksheet.update_cell(name_cell.row, task_cell.col + 1, formatted_date)
-            worksheet.update_cell(name_cell.row, task_cell.col + 2, "Answer: +\nPep: -")
-        elif not is_answer_right and not is_pep_valid:
-            worksheet.update_cell(name_cell.row, task_cell.col, '-')
-            worksheet.update_cell(name_cell.row, task_cell.col + 1, formatted_date)
-            worksheet.update_cell(name_cell.row, task_cell.col + 2, "Answer: -\nPep: -")
-
-    except APIError as e:
-        raise e
+    """Records the result in the Sheets outbox, it is written to Google in the background"""
+    user = await get_user_from_token(token)
+
+    if is_answer_right and is_pep_valid:
+        passed, log = '\'+', "Answer: +\nPep: +"
+    elif is_answer_right and not is_pep_valid:
+        passed, log = '-', "Answer: +\nPep: -"
+    elif not is_answer_right and not is_pep_valid:
+        passed, log = '-', "Answer: -\nPep: -"
+    else:
+        return
+
+    # Get the current date and time
+    current_date_time = datetime.now()
+    # Format the current date in the "day.month.year" format
+    formatted_date = current_date_time.strftime("%d.%m.%Y")
+
+    await get_sheets_outbox().enqueue(
+        user.group,
+        f"{user.last_name} {user.first_name}",
+        filename.split('.')[0],
+        [passed, formatted_date, log],
+    )
 
 
 async def get_groups(token_dict: dict) -> list:
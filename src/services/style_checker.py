@@ -0,0 +1,74 @@
+import asyncio
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from flake8.api import legacy as flake8
+from flake8.formatting.base import BaseFormatter
+
+from src.config.grading_config import STYLE_CHECK_WORKERS
+
+_pool = None
+# Built once per worker process by the pool initializer
+_style_guide = None
+
+
+class _SilentFormatter(BaseFormatter):
+    """Prints nothing, the violations are read from the report's statistics"""
+
+    def format(self, error) -> None:
+        pass
+
+    def show_source(self, error) -> None:
+        pass
+
+
+def _init_worker() -> None:
+    global _style_guide
+    _style_guide = flake8.get_style_guide()
+
+
+def _warm_up() -> None:
+    pass
+
+
+def _check_file(filepath: str) -> list:
+    # The statistics add up across check_files calls, a new report starts them
+    # over while the loaded plugins and options are kept
+    _style_guide.init_report(_SilentFormatter)
+    report = _style_guide.check_files(
+        [
+            filepath,
+        ]
+    )
+    return report.get_statistics("E")
+
+
+def start_style_checker() -> None:
+    """Starts the worker processes, call it before the bot starts any threads"""
+    global _pool
+    if _pool is not None:
+        return
+    # With fork all workers are created on the first submit, so do it right away
+    _pool = ProcessPoolExecutor(
+        max_workers=STYLE_CHECK_WORKERS,
+        mp_context=get_context("fork"),
+        initializer=_init_worker,
+    )
+    for _ in range(STYLE_CHECK_WORKERS):
+        _pool.submit(_warm_up)
+    logging.warning(f"Started {STYLE_CHECK_WORKERS} PEP8 checker processes")
+
+
+def stop_style_checker() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True)
+        _pool = None
+
+
+async def check_style(filepath: str) -> list:
+    """Returns PEP8 violations in the same format as Report.get_statistics("E")"""
+    start_style_checker()
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_pool, _check_file, filepath)
@@ -1,39 +1,92 @@
-import subprocess as sp
+import asyncio
+from typing import Optional
 
-from flake8.api import legacy as flake8
-
-from src.utils.exceptions import PepTestError, WrongAnswerError
+from src.services.grading_cache import (
+    PASSED,
+    exception_to_verdict,
+    get_grading_cache,
+    hash_file,
+    replay_verdict,
+)
+from src.services.sandbox_runner import run_submission
+from src.services.style_checker import check_style
+from src.utils.exceptions import (
+    PepTestError,
+    SubmissionRuntimeError,
+    SubmissionTimeoutError,
+    WrongAnswerError,
+)
+from src.utils.io_executor import run_io
+from src.utils.metrics import timed_stage
 from src.utils.task_answers import get_task_answer
 
-PATH_TO_CMD = "C:\\Windows\\System32\\cmd.exe"
 
+async def get_cached_verdict(py_filename: str, file_unique_id: str) -> Optional[dict]:
+    """Looks the document up before downloading it"""
+    task = py_filename.split(".")[0]
+    return get_grading_cache().get_by_file_unique_id(task, file_unique_id)
 
-async def run_tests(filepath: str, py_filename: str) -> str:
-    result = await test_for_answer(filepath, py_filename)
-    await test_for_pep8(filepath)
 
-    return result
+async def run_tests(filepath: str, py_filename: str, file_unique_id: str = None) -> str:
+    cache = get_grading_cache()
+    task = py_filename.split(".")[0]
+    key = cache.make_key(task, await run_io(hash_file, filepath))
+    verdict = cache.get(key)
+    if verdict is None:
+        with timed_stage("grading"):
+            verdict = await _grade(filepath, py_filename)
+    cache.put(key, verdict, task, file_unique_id)
+    return await replay_verdict(verdict)
 
 
-async def test_for_answer(filepath: str, py_filename: str) -> str:
-    result_in_bytes = sp.check_output(
-        f"python {filepath}", executable=PATH_TO_CMD, shell=True
+async def _grade(filepath: str, py_filename: str) -> dict:
+    """Returns the verdict, errors that may not repeat (timeouts) are raised"""
+    try:
+        result = await _run_all_tests(filepath, py_filename)
+    except Exception as e:
+        verdict = await exception_to_verdict(e)
+        if verdict is None:
+            raise
+        return verdict
+    return {"status": PASSED, "result": result}
+
+
+async def _run_all_tests(filepath: str, py_filename: str) -> str:
+    answer_result, pep_result = await asyncio.gather(
+        test_for_answer(filepath, py_filename),
+        test_for_pep8(filepath),
+        return_exceptions=True,
     )
-    string_result = result_in_bytes.decode("utf-8")
+    # A wrong answer is reported before PEP8 violations, as when run one by one
+    if isinstance(answer_result, BaseException):
+        raise answer_result
+    if isinstance(pep_result, BaseException):
+        raise pep_result
+
+    return answer_result
+
+
+async def test_for_answer(filepath: str, py_filename: str) -> str:
+    with timed_stage("sandbox"):
+        result = await run_submission(filepath)
+    if result.timed_out:
+        raise SubmissionTimeoutError(result)
+    if result.exit_code != 0:
+        raise SubmissionRuntimeError(result)
+    string_result = result.stdout
     correct_answer = await get_task_answer(py_filename)
-    if string_result != correct_answer:
+    # Answers were recorded on Windows, so line endings are not compared
+    if _normalize_newlines(string_result) != _normalize_newlines(correct_answer):
         raise WrongAnswerError(correct_answer, string_result)
     return string_result
 
 
+def _normalize_newlines(text: str) -> str:
+    return text.replace("\r\n", "\n")
+
+
 async def test_for_pep8(filepath: str):
-    # Создаем объект StyleGuide для проверки кода PEP8
-    style_guide = flake8.get_style_guide()
-    # Загружаем файл и проверяем его на соответствие PEP8
-    report = style_guide.check_files(
-        [
-            filepath,
-        ]
-    )
-    if report.get_statistics("E"):
-        raise PepTestError(report.get_statistics("E"))
+    with timed_stage("pep8"):
+        violation_list = await check_style(filepath)
+    if violation_list:
+        raise PepTestError(violation_list)
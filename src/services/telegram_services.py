@@ -1,11 +1,85 @@
+import asyncio
+import logging
+
 from telegram import Update
+from telegram.constants import MessageLimit
+from telegram.error import RetryAfter
 from telegram.ext import ContextTypes
 
+from src.config.telegram_config import (
+    TELEGRAM_MAX_MESSAGE_CHUNKS,
+    TELEGRAM_SEND_RETRIES,
+)
+from src.services.send_throttle import get_send_throttle
+
+LONG_REPLY_FILE_NAME = "reply.txt"
+
 
 async def response(
     update: Update, context: ContextTypes.DEFAULT_TYPE, text: str
 ) -> None:
-    if len(text) > 4096:
-        await context.bot.send_message(chat_id=update.effective_chat.id, text=text[:4096])
-    else:
-        await context.bot.send_message(chat_id=update.effective_chat.id, text=text)
+    chat_id = update.effective_chat.id
+    chunks = split_message(text)
+    if len(chunks) > TELEGRAM_MAX_MESSAGE_CHUNKS:
+        await _send(
+            context.bot.send_message,
+            chat_id,
+            text=f"Ответ слишком длинный, он отправлен файлом {LONG_REPLY_FILE_NAME}",
+        )
+        await _send(
+            context.bot.send_document,
+            chat_id,
+            document=text.encode("utf-8"),
+            filename=LONG_REPLY_FILE_NAME,
+        )
+        return
+    for chunk in chunks:
+        await _send(context.bot.send_message, chat_id, text=chunk)
+
+
+async def send_document(
+    update: Update, context: ContextTypes.DEFAULT_TYPE, content: bytes, filename: str
+) -> None:
+    await _send(
+        context.bot.send_document,
+        update.effective_chat.id,
+        document=content,
+        filename=filename,
+    )
+
+
+def split_message(text: str, limit: int = MessageLimit.MAX_TEXT_LENGTH) -> list:
+    """Splits text into messages at line breaks, cutting only lines over the limit"""
+    chunks = []
+    current = []
+    current_length = 0
+    for line in text.splitlines(keepends=True):
+        while len(line) > limit:
+            if current:
+                chunks.append("".join(current))
+                current, current_length = [], 0
+            chunks.append(line[:limit])
+            line = line[limit:]
+        if current_length + len(line) > limit:
+            chunks.append("".join(current))
+            current, current_length = [], 0
+        current.append(line)
+        current_length += len(line)
+    if current:
+        chunks.append("".join(current))
+    return chunks or [text]
+
+
+async def _send(send_func, chat_id: int, **kwargs):
+    """Sends within the rate limits, waiting out Telegram's flood control"""
+    for attempt in range(TELEGRAM_SEND_RETRIES + 1):
+        await get_send_throttle().acquire(chat_id)
+        try:
+            return await send_func(chat_id=chat_id, **kwargs)
+        except RetryAfter as e:
+            if attempt == TELEGRAM_SEND_RETRIES:
+                raise
+            logging.warning(
+                f"Flood control for chat {chat_id}, retrying in {e.retry_after} s"
+            )
+            await asyncio.sleep(e.retry_after)
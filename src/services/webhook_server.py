@@ -0,0 +1,92 @@
+import asyncio
+import hmac
+import logging
+
+from telegram import Bot, Update
+
+from src.config.telegram_config import (
+    WEBHOOK_HOST,
+    WEBHOOK_PATH,
+    WEBHOOK_PORT,
+    WEBHOOK_SECRET_TOKEN,
+    WEBHOOK_URL,
+)
+from src.utils.http_server import HttpRequest, HttpResponse, HttpServer
+
+SECRET_TOKEN_HEADER = "x-telegram-bot-api-secret-token"
+# Updates are small, a document only comes as its file_id
+_MAX_UPDATE_BYTES = 1024 * 1024
+
+
+class WebhookServer:
+    """Receives updates posted by Telegram and puts them into an update queue.
+
+    The request is answered as soon as the update is queued. From there the
+    application handles it like a polled one, or a dispatcher passes it on
+    to a worker. Requests without the secret token are rejected before the
+    body is parsed.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        update_queue: asyncio.Queue,
+        host: str = WEBHOOK_HOST,
+        port: int = WEBHOOK_PORT,
+        path: str = WEBHOOK_PATH,
+        secret_token: str = WEBHOOK_SECRET_TOKEN,
+    ):
+        self.bot = bot
+        self.update_queue = update_queue
+        self.path = path
+        self.secret_token = secret_token
+        self.server = HttpServer(self._handle, host, port, _MAX_UPDATE_BYTES)
+
+    @property
+    def url(self) -> str:
+        return f"{self.server.url}{self.path}"
+
+    async def start(self) -> None:
+        if self.secret_token is None:
+            logging.warning(
+                "WEBHOOK_SECRET_TOKEN is not set, anyone who can reach the webhook "
+                "can send updates"
+            )
+        await self.server.start()
+        logging.warning(f"Receiving updates at {self.url}")
+
+    async def stop(self) -> None:
+        await self.server.stop()
+
+    def _is_authorized(self, request: HttpRequest) -> bool:
+        if self.secret_token is None:
+            return True
+        received = request.headers.get(SECRET_TOKEN_HEADER, "")
+        return hmac.compare_digest(
+            received.encode("utf-8"), self.secret_token.encode("utf-8")
+        )
+
+    async def _handle(self, request: HttpRequest) -> HttpResponse:
+        if request.path != self.path:
+            return HttpResponse(404, b"Not Found")
+        if request.method != "POST":
+            return HttpResponse(405, b"Method Not Allowed", headers={"Allow": "POST"})
+        if not self._is_authorized(request):
+            logging.error("Rejected a webhook request with a wrong secret token")
+            return HttpResponse(403, b"Forbidden")
+        try:
+            update = Update.de_json(request.json(), self.bot)
+        except (ValueError, TypeError, KeyError) as e:
+            logging.error(f"Couldn't parse a webhook update. Error: {e}")
+            return HttpResponse(400, b"Bad Request")
+        if update is None:
+            return HttpResponse(400, b"Bad Request")
+        await self.update_queue.put(update)
+        return HttpResponse(200)
+
+
+async def register_webhook(bot: Bot) -> None:
+    """Points Telegram at WEBHOOK_URL if it is set"""
+    if WEBHOOK_URL:
+        await bot.set_webhook(url=WEBHOOK_URL, secret_token=WEBHOOK_SECRET_TOKEN)
+        logging.warning(f"Registered webhook {WEBHOOK_URL}")
@@ -0,0 +1,118 @@
+import logging
+from typing import Optional, Tuple
+
+from gspread import Worksheet
+
+from src.services.sheets_client import get_sheets_client
+from src.utils.keyed_lock import KeyedLock
+
+# Layout written by fulfill_cells: task headers in row 1, students from row 3,
+# every task takes Passed, Date and Log columns starting from column B
+TASK_HEADER_ROW = 1
+NAME_COL = 1
+FIRST_STUDENT_ROW = 3
+FIRST_TASK_COL = 2
+COLS_PER_TASK = 3
+TASK_COUNT = 10
+# Last column of the header, column AE
+HEADER_WIDTH = FIRST_TASK_COL + COLS_PER_TASK * TASK_COUNT - 1
+
+
+def layout_header() -> list:
+    """The two header rows of a group worksheet, starting from cell A1"""
+    tasks = [""] * HEADER_WIDTH
+    columns = [""] * HEADER_WIDTH
+    columns[NAME_COL - 1] = "Name"
+    for i in range(TASK_COUNT):
+        col = FIRST_TASK_COL + COLS_PER_TASK * i
+        tasks[col - 1] = f"task{i + 1}"
+        columns[col - 1 : col - 1 + COLS_PER_TASK] = ["Passed", "Date", "Log"]
+    return [tasks, columns]
+
+
+class WorksheetIndex:
+    """Coordinates of one worksheet: student name -> row and task header -> column"""
+
+    def __init__(self, rows: dict, cols: dict):
+        self.rows = rows
+        self.cols = cols
+
+    @classmethod
+    def from_values(cls, values: list) -> "WorksheetIndex":
+        """Builds the index from the cells returned by get_all_values"""
+        rows = dict()
+        for row, row_values in enumerate(values, start=1):
+            if row < FIRST_STUDENT_ROW or len(row_values) < NAME_COL:
+                continue
+            name = row_values[NAME_COL - 1]
+            if name and name not in rows:
+                rows[name] = row
+        cols = dict()
+        header = values[TASK_HEADER_ROW - 1] if len(values) >= TASK_HEADER_ROW else []
+        for col, value in enumerate(header, start=1):
+            if value and value not in cols:
+                cols[value] = col
+        return cls(rows, cols)
+
+    @classmethod
+    def from_layout(cls, student_names: list) -> "WorksheetIndex":
+        """Builds the index of a worksheet just filled by fulfill_cells"""
+        rows = dict()
+        for row, name in enumerate(student_names, start=FIRST_STUDENT_ROW):
+            if name not in rows:
+                rows[name] = row
+        cols = {
+            f"task{i + 1}": FIRST_TASK_COL + COLS_PER_TASK * i
+            for i in range(TASK_COUNT)
+        }
+        return cls(rows, cols)
+
+    def locate(self, student_name: str, task: str) -> Optional[Tuple[int, int]]:
+        row = self.rows.get(student_name)
+        col = self.cols.get(task)
+        if row is None or col is None:
+            return None
+        return row, col
+
+
+class WorksheetIndexes:
+    """Indexes of all worksheets by title, so cells are found without find calls.
+
+    An index is rebuilt from the worksheet when a name or a task is missing,
+    concurrent misses on one worksheet share a single rebuild.
+    """
+
+    def __init__(self):
+        self._indexes = dict()
+        self._build_locks = KeyedLock()
+
+    def put(self, title: str, index: WorksheetIndex) -> None:
+        self._indexes[title] = index
+
+    def clear(self) -> None:
+        self._indexes = dict()
+
+    async def locate(
+        self, worksheet: Worksheet, student_name: str, task: str
+    ) -> Optional[Tuple[int, int]]:
+        index = self._indexes.get(worksheet.title)
+        if index is not None:
+            location = index.locate(student_name, task)
+            if location is not None:
+                return location
+
+        async with self._build_locks.acquire(worksheet.title):
+            # Someone else could have rebuilt it while we were waiting
+            rebuilt = self._indexes.get(worksheet.title)
+            if rebuilt is None or rebuilt is index:
+                values = await get_sheets_client().run(worksheet.get_all_values)
+                rebuilt = WorksheetIndex.from_values(values)
+                self._indexes[worksheet.title] = rebuilt
+                logging.warning(
+                    f'Rebuilt index of worksheet "{worksheet.title}": '
+                    f"{len(rebuilt.rows)} students, {len(rebuilt.cols)} tasks"
+                )
+        return rebuilt.locate(student_name, task)
+
+
+worksheet_indexes = WorksheetIndexes()
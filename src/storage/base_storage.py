@@ -0,0 +1,42 @@
+from abc import ABC, abstractmethod
+from typing import Tuple
+
+
+class Storage(ABC):
+    """Persistence backend behind the StateStore.
+
+    The store keeps the whole state in memory and calls these methods to
+    persist single changes. Every row passed in is owned by the backend.
+
+    Write-behind backends only apply changes in memory and count them in
+    dirty_count, the store calls flush() to write them out.
+    """
+
+    is_write_behind = False
+    dirty_count = 0
+
+    @abstractmethod
+    def load(self) -> Tuple[dict, dict]:
+        """Returns (tokens, sessions), both keyed by token"""
+
+    @abstractmethod
+    def replace_tokens(self, token_dict: dict) -> None:
+        pass
+
+    @abstractmethod
+    def save_token(self, token: str, token_data: dict) -> None:
+        pass
+
+    @abstractmethod
+    def save_session(self, token: str, session_info: dict) -> None:
+        """Inserts or updates a session, progress of existing sessions is kept"""
+
+    @abstractmethod
+    def save_progress(self, token: str, filename: str) -> None:
+        pass
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
@@ -0,0 +1,85 @@
+import copy
+import json
+import logging
+from typing import Tuple
+
+from src.storage.base_storage import Storage
+from src.utils.atomic_files import atomic_write_json
+from src.utils.namings import SESSION_FILE, TOKEN_FILE
+
+
+class JsonStorage(Storage):
+    """Keeps tokens.json and sessions.json in their original layout.
+
+    Every change rewrites the affected file as a whole with an atomic rename.
+    In write-behind mode changes only mark the file dirty until flush().
+    """
+
+    def __init__(
+        self,
+        token_file: str = TOKEN_FILE,
+        session_file: str = SESSION_FILE,
+        write_behind: bool = False,
+    ):
+        self.token_file = token_file
+        self.session_file = session_file
+        self.is_write_behind = write_behind
+        self.dirty_count = 0
+        self._dirty_files = set()
+        self._tokens = dict()
+        self._sessions = dict()
+
+    def load(self) -> Tuple[dict, dict]:
+        self._tokens = self._read_json(self.token_file, default=dict())
+        session_data = self._read_json(self.session_file, default={"sessions": []})
+        self._sessions = dict()
+        for session in session_data["sessions"]:
+            for token, session_info in session.items():
+                self._sessions[token] = session_info
+        return copy.deepcopy(self._tokens), copy.deepcopy(self._sessions)
+
+    @staticmethod
+    def _read_json(path: str, default):
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            logging.error(f'Couldn\'t find file "{path}". Starting with empty state')
+            return default
+        except json.JSONDecodeError:
+            raise ValueError(f'Couldn\'t decode file "{path}" as JSON')
+
+    def replace_tokens(self, token_dict: dict) -> None:
+        self._tokens = token_dict
+        self._mark_dirty(self.token_file)
+
+    def save_token(self, token: str, token_data: dict) -> None:
+        self._tokens[token] = token_data
+        self._mark_dirty(self.token_file)
+
+    def save_session(self, token: str, session_info: dict) -> None:
+        if token in self._sessions:
+            session_info["progress"] = self._sessions[token]["progress"]
+        self._sessions[token] = session_info
+        self._mark_dirty(self.session_file)
+
+    def save_progress(self, token: str, filename: str) -> None:
+        self._sessions[token]["progress"][filename] = True
+        self._mark_dirty(self.session_file)
+
+    def _mark_dirty(self, path: str) -> None:
+        self._dirty_files.add(path)
+        self.dirty_count += 1
+        if not self.is_write_behind:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.token_file in self._dirty_files:
+            atomic_write_json(self.token_file, self._tokens)
+        if self.session_file in self._dirty_files:
+            data = {
+                "sessions": [{token: info} for token, info in self._sessions.items()]
+            }
+            atomic_write_json(self.session_file, data)
+        self._dirty_files.clear()
+        self.dirty_count = 0
@@ -0,0 +1,29 @@
+"""One-shot migration of tokens.json/sessions.json into the SQLite storage.
+
+Usage: python -m src.storage.migrate_json_to_sqlite [TOKEN_FILE SESSION_FILE DB_FILE]
+"""
+import logging
+import sys
+
+from src.storage.json_storage import JsonStorage
+from src.storage.sqlite_storage import SqliteStorage
+from src.utils.namings import SESSION_FILE, STATE_DB_FILE, TOKEN_FILE
+
+
+def migrate_json_to_sqlite(token_file: str, session_file: str, db_file: str) -> None:
+    tokens, sessions = JsonStorage(token_file, session_file).load()
+    storage = SqliteStorage(db_file)
+    try:
+        storage.import_state(tokens, sessions)
+    finally:
+        storage.close()
+    logging.warning(
+        f"Migrated {len(tokens)} tokens and {len(sessions)} sessions into {db_file}"
+    )
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4:
+        migrate_json_to_sqlite(*sys.argv[1:])
+    else:
+        migrate_json_to_sqlite(TOKEN_FILE, SESSION_FILE, STATE_DB_FILE)
@@ -0,0 +1,244 @@
+import sqlite3
+from typing import Optional, Tuple
+
+from src.storage.base_storage import Storage
+from src.utils.namings import STATE_DB_FILE
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tokens (
+    token TEXT PRIMARY KEY,
+    last_name TEXT NOT NULL,
+    first_name TEXT NOT NULL,
+    group_name TEXT NOT NULL,
+    deadline TEXT NOT NULL,
+    is_in_use INTEGER NOT NULL DEFAULT 0,
+    telegram_username TEXT
+);
+CREATE INDEX IF NOT EXISTS tokens_telegram_username ON tokens (telegram_username);
+
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    token TEXT NOT NULL UNIQUE,
+    first_name TEXT NOT NULL,
+    last_name TEXT NOT NULL,
+    group_name TEXT NOT NULL,
+    telegram_id INTEGER,
+    telegram_username TEXT,
+    started_at TEXT NOT NULL,
+    deadline TEXT NOT NULL,
+    is_in_progress INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS sessions_telegram_username ON sessions (telegram_username);
+CREATE INDEX IF NOT EXISTS sessions_telegram_id ON sessions (telegram_id);
+
+CREATE TABLE IF NOT EXISTS progress (
+    token TEXT NOT NULL,
+    task TEXT NOT NULL,
+    PRIMARY KEY (token, task)
+);
+"""
+
+_UPSERT_TOKEN = """
+INSERT INTO tokens (token, last_name, first_name, group_name, deadline, is_in_use, telegram_username)
+VALUES (:token, :last_name, :first_name, :group, :deadline, :is_in_use, :telegram_username)
+ON CONFLICT (token) DO UPDATE SET
+    last_name = excluded.last_name,
+    first_name = excluded.first_name,
+    group_name = excluded.group_name,
+    deadline = excluded.deadline,
+    is_in_use = excluded.is_in_use,
+    telegram_username = excluded.telegram_username
+"""
+
+_UPSERT_SESSION = """
+INSERT INTO sessions (
+    token, first_name, last_name, group_name, telegram_id, telegram_username,
+    started_at, deadline, is_in_progress
+)
+VALUES (
+    :token, :first_name, :last_name, :group, :telegram_id, :telegram_username,
+    :started_at, :deadline, :is_in_progress
+)
+ON CONFLICT (token) DO UPDATE SET
+    telegram_id = excluded.telegram_id,
+    telegram_username = excluded.telegram_username,
+    is_in_progress = excluded.is_in_progress
+"""
+
+_INSERT_PROGRESS = "INSERT OR IGNORE INTO progress (token, task) VALUES (?, ?)"
+
+
+class SqliteStorage(Storage):
+    """Stores tokens, sessions and progress in a SQLite database in WAL mode.
+
+    Every change is a single-row statement in its own transaction.
+    """
+
+    def __init__(self, db_file: str = STATE_DB_FILE):
+        self.db_file = db_file
+        # Writes come from the persistence thread, which never runs two at once
+        self._connection = sqlite3.connect(db_file, check_same_thread=False)
+        self._connection.row_factory = sqlite3.Row
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(_SCHEMA)
+
+    def load(self) -> Tuple[dict, dict]:
+        tokens = dict()
+        for row in self._connection.execute("SELECT * FROM tokens"):
+            tokens[row["token"]] = self._token_from_row(row)
+
+        sessions = dict()
+        for row in self._connection.execute("SELECT * FROM sessions ORDER BY id"):
+            sessions[row["token"]] = self._session_from_row(row)
+        for row in self._connection.execute("SELECT token, task FROM progress"):
+            if row["token"] in sessions:
+                sessions[row["token"]]["progress"][row["task"]] = True
+        return tokens, sessions
+
+    # --- single-row reads, used when several processes share the database ---
+
+    def get_token(self, token: str) -> Optional[dict]:
+        row = self._connection.execute(
+            "SELECT * FROM tokens WHERE token = ?", (token,)
+        ).fetchone()
+        return self._token_from_row(row) if row is not None else None
+
+    def get_session(self, token: str) -> Optional[dict]:
+        row = self._connection.execute(
+            "SELECT * FROM sessions WHERE token = ?", (token,)
+        ).fetchone()
+        if row is None:
+            return None
+        session_info = self._session_from_row(row)
+        for progress_row in self._connection.execute(
+            "SELECT task FROM progress WHERE token = ?", (token,)
+        ):
+            session_info["progress"][progress_row["task"]] = True
+        return session_info
+
+    def has_session(self, token: str) -> bool:
+        row = self._connection.execute(
+            "SELECT 1 FROM sessions WHERE token = ?", (token,)
+        ).fetchone()
+        return row is not None
+
+    def get_active_token(self, column: str, value) -> Optional[str]:
+        """Token of the session in progress with the given telegram_username or telegram_id"""
+        if column not in ("telegram_username", "telegram_id"):
+            raise ValueError(f"Sessions can't be looked up by {column}")
+        row = self._connection.execute(
+            f"SELECT token FROM sessions WHERE {column} = ? AND is_in_progress = 1",
+            (value,),
+        ).fetchone()
+        return row["token"] if row is not None else None
+
+    def claim_token(self, token: str, telegram_username: str) -> bool:
+        """Marks the token as used unless it already is, atomically across processes"""
+        with self._connection:
+            cursor = self._connection.execute(
+                "UPDATE tokens SET is_in_use = 1, telegram_username = ? "
+                "WHERE token = ? AND is_in_use = 0",
+                (telegram_username, token),
+            )
+        return cursor.rowcount == 1
+
+    def replace_tokens(self, token_dict: dict) -> None:
+        with self._connection:
+            self._connection.execute("DELETE FROM tokens")
+            self._connection.executemany(
+                _UPSERT_TOKEN,
+                (
+                    self._token_row(token, token_data)
+                    for token, token_data in token_dict.items()
+                ),
+            )
+
+    def save_token(self, token: str, token_data: dict) -> None:
+        with self._connection:
+            self._connection.execute(_UPSERT_TOKEN, self._token_row(token, token_data))
+
+    def save_session(self, token: str, session_info: dict) -> None:
+        with self._connection:
+            self._connection.execute(
+                _UPSERT_SESSION, self._session_row(token, session_info)
+            )
+
+    def save_progress(self, token: str, filename: str) -> None:
+        with self._connection:
+            self._connection.execute(_INSERT_PROGRESS, (token, filename))
+
+    def import_state(self, tokens: dict, sessions: dict) -> None:
+        """Bulk-loads a whole state in one transaction, used by the migrator"""
+        with self._connection:
+            self._connection.executemany(
+                _UPSERT_TOKEN,
+                (self._token_row(token, data) for token, data in tokens.items()),
+            )
+            self._connection.executemany(
+                _UPSERT_SESSION,
+                (self._session_row(token, info) for token, info in sessions.items()),
+            )
+            self._connection.executemany(
+                _INSERT_PROGRESS,
+                (
+                    (token, task)
+                    for token, info in sessions.items()
+                    for task, is_done in info["progress"].items()
+                    if is_done
+                ),
+            )
+
+    def close(self) -> None:
+        self._connection.close()
+
+    @staticmethod
+    def _token_from_row(row: sqlite3.Row) -> dict:
+        return {
+            "last_name": row["last_name"],
+            "first_name": row["first_name"],
+            "group": row["group_name"],
+            "deadline": row["deadline"],
+            "is_in_use": bool(row["is_in_use"]),
+            "telegram_username": row["telegram_username"],
+        }
+
+    @staticmethod
+    def _session_from_row(row: sqlite3.Row) -> dict:
+        return {
+            "first_name": row["first_name"],
+            "last_name": row["last_name"],
+            "group": row["group_name"],
+            "telegram_id": row["telegram_id"],
+            "telegram_username": row["telegram_username"],
+            "started_at": row["started_at"],
+            "deadline": row["deadline"],
+            "is_in_progress": bool(row["is_in_progress"]),
+            "progress": {},
+        }
+
+    @staticmethod
+    def _token_row(token: str, token_data: dict) -> dict:
+        return {
+            "token": token,
+            "last_name": token_data["last_name"],
+            "first_name": token_data["first_name"],
+            "group": token_data["group"],
+            "deadline": token_data["deadline"],
+            "is_in_use": int(bool(token_data["is_in_use"])),
+            "telegram_username": token_data["telegram_username"],
+        }
+
+    @staticmethod
+    def _session_row(token: str, session_info: dict) -> dict:
+        return {
+            "token": token,
+            "first_name": session_info["first_name"],
+            "last_name": session_info["last_name"],
+            "group": session_info["group"],
+            "telegram_id": session_info["telegram_id"],
+            "telegram_username": session_info["telegram_username"],
+            "started_at": session_info["started_at"],
+            "deadline": session_info["deadline"],
+            "is_in_progress": int(bool(session_info["is_in_progress"])),
+        }
@@ -0,0 +1,303 @@
+import asyncio
+import copy
+import logging
+from typing import Optional
+
+from src.config.scale_out_config import BOT_WORKER_ID
+from src.config.storage_config import (
+    FLUSH_DIRTY_THRESHOLD,
+    FLUSH_INTERVAL_SECONDS,
+    PERSISTENCE_MODE,
+    SQLITE_BACKEND,
+    STORAGE_BACKEND,
+    WRITE_BEHIND_MODE,
+)
+from src.storage.base_storage import Storage
+from src.storage.json_storage import JsonStorage
+from src.storage.sqlite_storage import SqliteStorage
+from src.utils.exceptions import TokenAlreadyInUseError
+from src.utils.io_executor import run_persistence
+from src.utils.metrics import registry, timed_stage
+
+
+class StateStore:
+    """In-memory copy of tokens and sessions, loaded once at startup.
+
+    Tokens and sessions are kept in dicts keyed by token. Active sessions are
+    additionally indexed by telegram username and telegram id, so every lookup
+    is a single hash access instead of a scan over the whole file.
+    """
+
+    def __init__(
+        self,
+        storage: Storage,
+        flush_interval: float = FLUSH_INTERVAL_SECONDS,
+        flush_threshold: int = FLUSH_DIRTY_THRESHOLD,
+    ):
+        self.storage = storage
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self.is_loaded = False
+        self._flush_task = None
+        self._tokens = dict()
+        self._sessions = dict()
+        self._token_by_username = dict()
+        self._token_by_telegram_id = dict()
+
+    def load(self) -> None:
+        self._tokens, self._sessions = self.storage.load()
+        self._rebuild_indexes()
+        self.is_loaded = True
+        logging.warning(
+            f"Loaded {len(self._tokens)} tokens and {len(self._sessions)} sessions into state store"
+        )
+
+    def _rebuild_indexes(self) -> None:
+        self._token_by_username = dict()
+        self._token_by_telegram_id = dict()
+        for token, session_info in self._sessions.items():
+            if session_info["is_in_progress"]:
+                self._index_session(token, session_info)
+
+    def _index_session(self, token: str, session_info: dict) -> None:
+        self._token_by_username[session_info["telegram_username"]] = token
+        if session_info["telegram_id"] is not None:
+            self._token_by_telegram_id[session_info["telegram_id"]] = token
+
+    def _unindex_session(self, token: str, session_info: dict) -> None:
+        if self._token_by_username.get(session_info["telegram_username"]) == token:
+            del self._token_by_username[session_info["telegram_username"]]
+        if self._token_by_telegram_id.get(session_info["telegram_id"]) == token:
+            del self._token_by_telegram_id[session_info["telegram_id"]]
+
+    # --- tokens ---
+
+    async def get_token(self, token: str) -> Optional[dict]:
+        return self._tokens.get(token)
+
+    async def has_token(self, token: str) -> bool:
+        return token in self._tokens
+
+    async def replace_tokens(self, token_dict: dict) -> None:
+        self._tokens = copy.deepcopy(token_dict)
+        # The backend gets rows of its own, the caller keeps using token_dict
+        await self._persist(self.storage.replace_tokens, copy.deepcopy(token_dict))
+
+    async def mark_token_as_used(self, token: str, telegram_username: str) -> None:
+        token_data = self._tokens[token]
+        token_data["telegram_username"] = telegram_username
+        token_data["is_in_use"] = True
+        await self._persist(self.storage.save_token, token, dict(token_data))
+
+    async def release_token(self, token: str) -> None:
+        token_data = self._tokens[token]
+        token_data["is_in_use"] = False
+        token_data["telegram_username"] = None
+        await self._persist(self.storage.save_token, token, dict(token_data))
+
+    # --- sessions ---
+
+    async def get_session(self, token: str) -> Optional[dict]:
+        return self._sessions.get(token)
+
+    async def has_session(self, token: str) -> bool:
+        return token in self._sessions
+
+    async def get_active_token_by_username(self, username: str) -> Optional[str]:
+        return self._token_by_username.get(username)
+
+    async def get_active_token_by_telegram_id(self, telegram_id: int) -> Optional[str]:
+        return self._token_by_telegram_id.get(telegram_id)
+
+    async def add_session(self, token: str, session_info: dict) -> None:
+        self._sessions[token] = session_info
+        if session_info["is_in_progress"]:
+            self._index_session(token, session_info)
+        await self._persist(
+            self.storage.save_session, token, copy.deepcopy(session_info)
+        )
+
+    async def activate_session(
+        self, token: str, username: str, telegram_id: int
+    ) -> None:
+        session_info = self._sessions[token]
+        self._unindex_session(token, session_info)
+        session_info["telegram_id"] = telegram_id
+        session_info["telegram_username"] = username
+        session_info["is_in_progress"] = True
+        self._index_session(token, session_info)
+        await self._persist(
+            self.storage.save_session, token, copy.deepcopy(session_info)
+        )
+
+    async def deactivate_session(self, token: str) -> None:
+        session_info = self._sessions[token]
+        self._unindex_session(token, session_info)
+        session_info["is_in_progress"] = False
+        session_info["telegram_username"] = None
+        session_info["telegram_id"] = None
+        await self._persist(
+            self.storage.save_session, token, copy.deepcopy(session_info)
+        )
+
+    async def mark_progress(self, token: str, filename: str) -> None:
+        self._sessions[token]["progress"][filename] = True
+        await self._persist(self.storage.save_progress, token, filename)
+
+    # --- persistence ---
+
+    async def _persist(self, write_func, *args) -> None:
+        with timed_stage("persistence"):
+            await run_persistence(write_func, *args)
+        if not self.storage.is_write_behind:
+            return
+        # Without a background flusher behave like immediate mode
+        if self._flush_task is None or self.storage.dirty_count >= self.flush_threshold:
+            await self.flush()
+
+    async def start(self) -> None:
+        """Starts the background flusher for write-behind storages"""
+        if self.storage.is_write_behind and self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_periodically())
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except OSError as e:
+                logging.critical(f"Couldn't flush state to disk. Error: {e}")
+
+    async def flush(self) -> None:
+        if self.storage.dirty_count:
+            with timed_stage("persistence_flush"):
+                await run_persistence(self.storage.flush)
+
+    async def close(self) -> None:
+        """Stops the flusher and writes out everything still pending"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush()
+        logging.warning("State store flushed to disk")
+
+
+class SharedStateStore(StateStore):
+    """State of a worker process, read from the SQLite database all workers share.
+
+    Nothing is cached in memory since other workers change the database too.
+    Reads run on the persistence thread after the writes queued before them,
+    so a worker always sees its own changes. A token is claimed with a
+    conditional UPDATE, two workers can't give it to different users.
+    """
+
+    def __init__(self, storage: SqliteStorage):
+        super().__init__(storage)
+        self.is_loaded = True
+
+    def load(self) -> None:
+        pass
+
+    async def _read(self, read_func, *args):
+        with timed_stage("persistence_read"):
+            return await run_persistence(read_func, *args)
+
+    # --- tokens ---
+
+    async def get_token(self, token: str) -> Optional[dict]:
+        return await self._read(self.storage.get_token, token)
+
+    async def has_token(self, token: str) -> bool:
+        return await self.get_token(token) is not None
+
+    async def replace_tokens(self, token_dict: dict) -> None:
+        await self._persist(self.storage.replace_tokens, copy.deepcopy(token_dict))
+
+    async def mark_token_as_used(self, token: str, telegram_username: str) -> None:
+        if not await self._read(self.storage.claim_token, token, telegram_username):
+            raise TokenAlreadyInUseError
+
+    async def release_token(self, token: str) -> None:
+        token_data = await self.get_token(token)
+        token_data["is_in_use"] = False
+        token_data["telegram_username"] = None
+        await self._persist(self.storage.save_token, token, token_data)
+
+    # --- sessions ---
+
+    async def get_session(self, token: str) -> Optional[dict]:
+        return await self._read(self.storage.get_session, token)
+
+    async def has_session(self, token: str) -> bool:
+        return await self._read(self.storage.has_session, token)
+
+    async def get_active_token_by_username(self, username: str) -> Optional[str]:
+        return await self._read(
+            self.storage.get_active_token, "telegram_username", username
+        )
+
+    async def get_active_token_by_telegram_id(self, telegram_id: int) -> Optional[str]:
+        return await self._read(
+            self.storage.get_active_token, "telegram_id", telegram_id
+        )
+
+    async def add_session(self, token: str, session_info: dict) -> None:
+        await self._persist(
+            self.storage.save_session, token, copy.deepcopy(session_info)
+        )
+
+    async def activate_session(
+        self, token: str, username: str, telegram_id: int
+    ) -> None:
+        session_info = await self.get_session(token)
+        session_info["telegram_id"] = telegram_id
+        session_info["telegram_username"] = username
+        session_info["is_in_progress"] = True
+        await self._persist(self.storage.save_session, token, session_info)
+
+    async def deactivate_session(self, token: str) -> None:
+        session_info = await self.get_session(token)
+        session_info["is_in_progress"] = False
+        session_info["telegram_username"] = None
+        session_info["telegram_id"] = None
+        await self._persist(self.storage.save_session, token, session_info)
+
+    async def mark_progress(self, token: str, filename: str) -> None:
+        await self._persist(self.storage.save_progress, token, filename)
+
+
+_state_store = None
+
+
+def get_state_store() -> StateStore:
+    """Returns the process-wide store, loading it from disk on first use"""
+    global _state_store
+    if _state_store is None and BOT_WORKER_ID is not None:
+        _state_store = SharedStateStore(SqliteStorage())
+    if _state_store is None:
+        _state_store = StateStore(create_storage(STORAGE_BACKEND))
+    if not _state_store.is_loaded:
+        _state_store.load()
+    return _state_store
+
+
+def create_storage(backend: str) -> Storage:
+    if backend == SQLITE_BACKEND:
+        return SqliteStorage()
+    return JsonStorage(write_behind=PERSISTENCE_MODE == WRITE_BEHIND_MODE)
+
+
+def set_state_store(store: StateStore) -> None:
+    global _state_store
+    _state_store = store
+
+
+registry.gauge(
+    "gsem_state_unflushed_changes",
+    "State changes waiting for the write-behind flush",
+    lambda: _state_store.storage.dirty_count if _state_store is not None else 0,
+)
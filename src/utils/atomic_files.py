@@ -0,0 +1,34 @@
+import json
+import os
+
+
+def atomic_write_json(path: str, data) -> None:
+    """Writes JSON next to the target, fsyncs it and renames it over the target.
+
+    A crash leaves either the old or the new file, never a half-written one.
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as outfile:
+        json.dump(
+            data,
+            outfile,
+            sort_keys=False,
+            indent=4,
+            ensure_ascii=False,
+            separators=(",", ": "),
+        )
+        outfile.flush()
+        os.fsync(outfile.fileno())
+    os.replace(tmp_path, path)
+    _fsync_directory(os.path.dirname(path) or ".")
+
+
+def _fsync_directory(directory: str) -> None:
+    # Makes the rename itself durable, directories can't be opened on Windows
+    if os.name != "posix":
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
@@ -4,3 +4,4 @@ LOGIN_STATUS = "login_status"
 PROGRESS = "progress"
 LOGOUT = "logout"
 UPLOAD_STUDENT_PROGRESS = "upload_student_progress"
+STATS = "stats"
@@ -81,3 +81,42 @@ class NoActiveSessionError(Exception):
 
 class AlreadyDoneTask(Exception):
     """Raised when user tries to pass already done task"""
+
+
+class SubmissionRuntimeError(Exception):
+    """Raised when user task exits with a non-zero code"""
+
+    def __init__(self, result):
+        self.result = result
+
+
+class SubmissionTimeoutError(Exception):
+    """Raised when user task exceeds its wall-clock or CPU time limit"""
+
+    def __init__(self, result):
+        self.result = result
+
+
+class GradingQueueFullError(Exception):
+    """Raised when user sends a task while the grading queue is full"""
+
+    pass
+
+
+class SubmissionAlreadyQueuedError(Exception):
+    """Raised when user sends a task while his previous one is still being graded"""
+
+    pass
+
+
+class EmptyRosterError(Exception):
+    """Raised when an uploaded students' list has no valid lines"""
+
+    def __init__(self, roster):
+        self.roster = roster
+
+
+class SandboxSetupError(Exception):
+    """Raised when a submission's sandbox can't be set up on this host"""
+
+    pass
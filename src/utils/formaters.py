@@ -1,11 +1,31 @@
-async def format_dict_to_string(token_dict: dict) -> str:
-    output = ""
-    for uid, user in token_dict.items():
-        output += uid + " --> \n"
-        for k, v in user.items():
-            output += f"\t\t {k} : {v}\n"
-        output += "\n\n"
-    return output
+import csv
+import io
+
+from src.utils.metrics import Counter, Histogram
+
+_TOKEN_CSV_FIELDS = ("last_name", "first_name", "group", "deadline")
+# Malformed lines listed in the reply, the rest are only counted
+_MALFORMED_LINES_SHOWN = 20
+
+
+async def format_tokens_to_csv(token_dict: dict) -> bytes:
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(("token",) + _TOKEN_CSV_FIELDS)
+    for token, user in token_dict.items():
+        writer.writerow((token,) + tuple(user[field] for field in _TOKEN_CSV_FIELDS))
+    # With a BOM Excel opens the Cyrillic names in the right encoding
+    return output.getvalue().encode("utf-8-sig")
+
+
+async def format_malformed_lines_to_str(malformed_lines: list) -> str:
+    lines = [
+        f"\t\t Строка {malformed.line_number}: «{malformed.line}» — {malformed.reason}"
+        for malformed in malformed_lines[:_MALFORMED_LINES_SHOWN]
+    ]
+    if len(malformed_lines) > _MALFORMED_LINES_SHOWN:
+        lines.append(f"\t\t ...и ещё {len(malformed_lines) - _MALFORMED_LINES_SHOWN}")
+    return "\n".join(lines)
 
 
 async def format_progress_to_str(progress_dict) -> str:
@@ -19,3 +39,34 @@ async def format_progress_to_str(progress_dict) -> str:
         task = k.split(".")[0]
         output += task + "--> Выполнена\n"
     return output
+
+
+async def format_metrics_to_str(metrics: list) -> str:
+    lines = []
+    for metric in metrics:
+        lines.append(f"{metric.documentation}:")
+        if isinstance(metric, Histogram):
+            for labels in metric.label_sets():
+                name = ", ".join(str(v) for v in labels.values())
+                p50 = metric.quantile(0.5, **labels) * 1000
+                p95 = metric.quantile(0.95, **labels) * 1000
+                lines.append(
+                    f"\t\t {name} : {metric.count(**labels)} шт., "
+                    f"p50 {p50:.0f} мс, p95 {p95:.0f} мс"
+                )
+        elif isinstance(metric, Counter):
+            for labels, value in metric.items():
+                name = ", ".join(str(v) for v in labels.values())
+                lines.append(f"\t\t {name} : {value:g}")
+        else:
+            lines.append(f"\t\t {metric.value():g}")
+        # A blank line between metrics
+        lines.append("")
+    return "\n".join(lines)
+
+
+async def format_run_error(run_result) -> str:
+    lines = run_result.stderr.strip().splitlines()
+    if not lines:
+        return f"Код завершения {run_result.exit_code}"
+    return lines[-1]
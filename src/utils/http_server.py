@@ -0,0 +1,215 @@
+import asyncio
+import json
+import logging
+from email.parser import BytesParser
+from email.policy import HTTP
+from http import HTTPStatus
+from typing import Optional
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+_MAX_HEADER_BYTES = 64 * 1024
+_DEFAULT_MAX_BODY_BYTES = 50 * 1024 * 1024
+
+
+class HttpRequest:
+    def __init__(self, method: str, target: str, headers: dict, body: bytes):
+        url = urlsplit(target)
+        self.method = method
+        self.path = unquote(url.path)
+        self.query = dict(parse_qsl(url.query))
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body or b"null")
+
+    def form(self) -> dict:
+        """Fields of an urlencoded or multipart body, uploaded files come as bytes"""
+        content_type = self.headers.get("content-type", "")
+        if content_type.startswith("multipart/form-data"):
+            return _parse_multipart(content_type, self.body)
+        return dict(parse_qsl(self.body.decode("utf-8"), keep_blank_values=True))
+
+
+class HttpResponse:
+    def __init__(
+        self,
+        status: int = 200,
+        body: bytes = b"",
+        content_type: str = "text/plain; charset=utf-8",
+        headers: dict = None,
+    ):
+        self.status = status
+        self.body = body
+        self.content_type = content_type
+        self.headers = headers or dict()
+
+
+def json_response(data, status: int = 200) -> HttpResponse:
+    return HttpResponse(
+        status,
+        json.dumps(data, ensure_ascii=False).encode("utf-8"),
+        "application/json",
+    )
+
+
+def _parse_multipart(content_type: str, body: bytes) -> dict:
+    message = BytesParser(policy=HTTP).parsebytes(
+        f"Content-Type: {content_type}\r\n\r\n".encode("latin-1") + body
+    )
+    fields = dict()
+    for part in message.iter_parts():
+        name = part.get_param("name", header="content-disposition")
+        payload = part.get_payload(decode=True)
+        if part.get_filename() is None:
+            payload = payload.decode(part.get_content_charset() or "utf-8")
+        fields[name] = payload
+    return fields
+
+
+def _content_length(headers: dict) -> Optional[int]:
+    """Body length from the headers, None if the header isn't a plain number"""
+    value = headers.get("content-length", "") or "0"
+    # int() would also take signs, spaces, underscores and non-ASCII digits
+    if not (value.isascii() and value.isdigit()):
+        return None
+    return int(value)
+
+
+class HttpServer:
+    """Minimal HTTP/1.1 server on asyncio streams with keep-alive.
+
+    Every request is passed to `handler`, an async function taking an
+    HttpRequest and returning an HttpResponse. Chunked request bodies are not
+    supported, clients must send Content-Length.
+    """
+
+    def __init__(
+        self,
+        handler,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        max_body_bytes: int = _DEFAULT_MAX_BODY_BYTES,
+    ):
+        self.handler = handler
+        self.host = host
+        self.port = port
+        self.max_body_bytes = max_body_bytes
+        self._server = None
+        self._connections = set()
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(
+            self._serve_connection, self.host, self.port, limit=_MAX_HEADER_BYTES
+        )
+        # Port 0 asks the OS for a free one
+        self.port = self._server.sockets[0].getsockname()[1]
+        logging.warning(f"HTTP server is listening on {self.url}")
+
+    async def stop(self) -> None:
+        if self._server is None:
+            return
+        self._server.close()
+        for task in list(self._connections):
+            task.cancel()
+        if self._connections:
+            await asyncio.wait(list(self._connections))
+        await self._server.wait_closed()
+        self._server = None
+
+    async def _serve_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        task = asyncio.current_task()
+        self._connections.add(task)
+        try:
+            while True:
+                request = await self._read_request(reader, writer)
+                if request is None:
+                    break
+                try:
+                    response = await self.handler(request)
+                except Exception as e:
+                    logging.error(
+                        f"HTTP handler failed on {request.method} {request.path}. Error: {e}"
+                    )
+                    response = HttpResponse(HTTPStatus.INTERNAL_SERVER_ERROR)
+                keep_alive = request.headers.get("connection", "").lower() != "close"
+                await self._write_response(writer, response, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except asyncio.CancelledError:
+            # The server is stopping, asyncio must not see the connection cancelled
+            pass
+        finally:
+            self._connections.discard(task)
+            writer.close()
+
+    async def _read_request(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> Optional[HttpRequest]:
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError:
+            # The client closed an idle keep-alive connection
+            return None
+        except asyncio.LimitOverrunError:
+            # The head is longer than the stream limit
+            await self._write_response(
+                writer, HttpResponse(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE), False
+            )
+            return None
+
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, _ = lines[0].split(" ", 2)
+        except ValueError:
+            await self._write_response(
+                writer, HttpResponse(HTTPStatus.BAD_REQUEST), False
+            )
+            return None
+        headers = dict()
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            await self._write_response(
+                writer, HttpResponse(HTTPStatus.LENGTH_REQUIRED), False
+            )
+            return None
+        length = _content_length(headers)
+        if length is None:
+            await self._write_response(
+                writer, HttpResponse(HTTPStatus.BAD_REQUEST), False
+            )
+            return None
+        if length > self.max_body_bytes:
+            await self._write_response(
+                writer, HttpResponse(HTTPStatus.REQUEST_ENTITY_TOO_LARGE), False
+            )
+            return None
+        body = await reader.readexactly(length) if length else b""
+        return HttpRequest(method.upper(), target, headers, body)
+
+    @staticmethod
+    async def _write_response(
+        writer: asyncio.StreamWriter, response: HttpResponse, keep_alive: bool
+    ) -> None:
+        status = HTTPStatus(response.status)
+        head = [
+            f"HTTP/1.1 {status.value} {status.phrase}",
+            f"Content-Type: {response.content_type}",
+            f"Content-Length: {len(response.body)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+        ]
+        head.extend(f"{name}: {value}" for name, value in response.headers.items())
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + response.body)
+        await writer.drain()
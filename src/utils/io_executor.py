@@ -0,0 +1,33 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from src.config.io_config import IO_WORKERS
+
+# File operations (downloads, uploaded rosters, exercise folders)
+_io_executor = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="io")
+# State persistence runs on a single thread so that writes land in order
+_persistence_executor = ThreadPoolExecutor(
+    max_workers=1, thread_name_prefix="persistence"
+)
+
+
+async def run_io(func, *args, **kwargs):
+    """Runs a blocking file operation outside the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _io_executor, functools.partial(func, *args, **kwargs)
+    )
+
+
+async def run_persistence(func, *args, **kwargs):
+    """Runs a blocking storage write outside the event loop, preserving order"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _persistence_executor, functools.partial(func, *args, **kwargs)
+    )
+
+
+def shutdown_io_executors() -> None:
+    _io_executor.shutdown(wait=True)
+    _persistence_executor.shutdown(wait=True)
@@ -0,0 +1,37 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+
+class KeyedLock:
+    """One asyncio.Lock per key, created on demand.
+
+    A lock is dropped as soon as nobody holds or waits for it, so the number
+    of stored locks never exceeds the number of keys currently in use.
+    """
+
+    def __init__(self):
+        self._locks = dict()
+        self._waiters = dict()
+
+    @asynccontextmanager
+    async def acquire(self, key):
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            async with lock:
+                yield
+        finally:
+            self._waiters[key] -= 1
+            if not self._waiters[key]:
+                del self._waiters[key]
+                del self._locks[key]
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+
+# Lock order is always username first, then token
+username_locks = KeyedLock()
+token_locks = KeyedLock()
@@ -0,0 +1,244 @@
+import bisect
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+# Seconds, from a cached reply to a slow grading run or Sheets call
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    30,
+    60,
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in labels]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._values = dict()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(sorted(labels.items()))
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(sorted(labels.items())), 0)
+
+    def items(self) -> list:
+        return [(dict(key), value) for key, value in self._values.items()]
+
+    def render(self) -> list:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} counter",
+        ]
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(key)} {_format_value(value)}")
+        return lines
+
+
+class Gauge:
+    """Sampled from `func` at scrape time, e.g. the length of a queue"""
+
+    def __init__(self, name: str, documentation: str, func):
+        self.name = name
+        self.documentation = documentation
+        self.func = func
+
+    def value(self) -> float:
+        return self.func()
+
+    def render(self) -> list:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} gauge",
+            f"{self.name} {_format_value(self.value())}",
+        ]
+
+
+class _HistogramSeries:
+    def __init__(self, bucket_count: int):
+        self.bucket_counts = [0] * bucket_count
+        self.sum = 0.0
+        self.count = 0
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._series = dict()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(sorted(labels.items()))
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = _HistogramSeries(len(self.buckets))
+        series.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+        series.sum += value
+        series.count += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observes how long the block took, awaits inside it included"""
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started_at, **labels)
+
+    def count(self, **labels) -> int:
+        series = self._series.get(tuple(sorted(labels.items())))
+        return series.count if series is not None else 0
+
+    def label_sets(self) -> list:
+        return [dict(key) for key in self._series]
+
+    def quantile(self, fraction: float, **labels) -> Optional[float]:
+        """Estimates the quantile by linear interpolation inside its bucket"""
+        series = self._series.get(tuple(sorted(labels.items())))
+        if series is None or not series.count:
+            return None
+        rank = fraction * series.count
+        seen = 0
+        lower = 0.0
+        for bound, bucket_count in zip(self.buckets, series.bucket_counts):
+            if bucket_count and seen + bucket_count >= rank:
+                if bound == float("inf"):
+                    return lower
+                return lower + (bound - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+            lower = bound
+        return lower
+
+    def render(self) -> list:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        for key, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, series.bucket_counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(key, le)} {cumulative}"
+                )
+            lines.append(f"{self.name}_sum{_format_labels(key)} {series.sum!r}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {series.count}")
+        return lines
+
+
+class Registry:
+    """All metrics of the process. Updated from the event loop thread only"""
+
+    def __init__(self):
+        self._metrics = dict()
+
+    def _register(self, metric):
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str) -> Counter:
+        return self._register(Counter(name, documentation))
+
+    def histogram(
+        self, name: str, documentation: str, buckets=DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, buckets))
+
+    def gauge(self, name: str, documentation: str, func) -> Gauge:
+        gauge = Gauge(name, documentation, func)
+        # A gauge registered again samples the newest function
+        self._metrics[name] = gauge
+        return gauge
+
+    def get(self, name: str):
+        return self._metrics.get(name)
+
+    def metrics(self) -> list:
+        return list(self._metrics.values())
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+handler_requests = registry.counter(
+    "gsem_handler_requests_total", "Updates handled, by handler"
+)
+handler_latency = registry.histogram(
+    "gsem_handler_latency_seconds", "Time from handler start to the sent reply"
+)
+stage_latency = registry.histogram(
+    "gsem_stage_latency_seconds",
+    "Time spent in a pipeline stage: download, sandbox, pep8, persistence, sheets",
+)
+stage_failures = registry.counter(
+    "gsem_stage_failures_total", "Failed pipeline stage runs, by stage"
+)
+sheets_calls = registry.counter(
+    "gsem_sheets_calls_total", "Google Sheets API calls, by gspread method"
+)
+sheets_failures = registry.counter(
+    "gsem_sheets_failures_total", "Failed Google Sheets API calls, by reason"
+)
+
+# Stage name -> (seconds, runs) of the current update, set only while it is profiled
+request_stages = contextvars.ContextVar("request_stages", default=None)
+
+
+@contextmanager
+def timed_stage(stage: str):
+    """Observes the stage latency and counts the stage failed if the block raises"""
+    started_at = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        stage_failures.inc(stage=stage)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started_at
+        stage_latency.observe(elapsed, stage=stage)
+        breakdown = request_stages.get()
+        if breakdown is not None:
+            total, count = breakdown.get(stage, (0.0, 0))
+            breakdown[stage] = (total + elapsed, count + 1)
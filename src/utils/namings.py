@@ -3,3 +3,11 @@ SESSION_FILE = "C:\\Users\\nikit\PycharmProjects\GSEM_URFU_bot\src\data\sessions
 TASK_FILEPATH = (
     "C:\\Users\\nikit\PycharmProjects\GSEM_URFU_bot\src\data\\users_exercises\\"
 )
+STATE_DB_FILE = "C:\\Users\\nikit\\PycharmProjects\\GSEM_URFU_bot\\src\\data\\state.db"
+GRADING_CACHE_FILE = (
+    "C:\\Users\\nikit\\PycharmProjects\\GSEM_URFU_bot\\src\\data\\grading_cache.json"
+)
+SHEETS_OUTBOX_FILE = (
+    "C:\\Users\\nikit\\PycharmProjects\\GSEM_URFU_bot\\src\\data\\sheets_outbox.json"
+)
+PROFILES_DIR = "C:\\Users\\nikit\\PycharmProjects\\GSEM_URFU_bot\\src\\data\\profiles"
@@ -0,0 +1,15 @@
+import asyncio
+import signal
+
+
+async def wait_for_stop_signal() -> None:
+    """Returns once the process gets SIGINT or SIGTERM"""
+    stopped = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for stop_signal in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(stop_signal, stopped.set)
+        except (NotImplementedError, RuntimeError):
+            # Windows, where Ctrl+C cancels asyncio.run instead
+            pass
+    await stopped.wait()
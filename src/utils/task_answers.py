@@ -1,3 +1,6 @@
+import hashlib
+import json
+
 answer_bank_account = dict()
 answer_bank_account["task1"] = "5\r\n10\r\n"
 answer_bank_account["task2"] = "5\r\n15\r\n5\r\n20.0\r\n10.0\r\n"
@@ -11,6 +14,11 @@ answer_bank_account["task9"] = "True\r\nFalse\r\nFalse\r\nTrue\r\n"
 answer_bank_account["task10"] = "True\r\nFalse\r\n"
 answer_bank_account["task11"] = "8\r\n"
 
+# Changes whenever an answer changes, so cached grading verdicts go stale
+ANSWER_BANK_VERSION = hashlib.sha256(
+    json.dumps(answer_bank_account, sort_keys=True).encode("utf-8")
+).hexdigest()[:16]
+
 
 async def get_task_answer(task_file: str):
     task_number = task_file.split(".")[0]
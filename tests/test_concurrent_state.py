@@ -0,0 +1,86 @@
+import asyncio
+import os
+
+import pytest
+
+from src.benchmarks.common import FIRST_USER_ID, BenchmarkEnvironment, make_tokens
+from src.config.storage_config import JSON_BACKEND, SQLITE_BACKEND
+from src.fakes.fake_telegram import (
+    FakeBot,
+    FakeContext,
+    FakeMessage,
+    FakeUpdate,
+    FakeUser,
+)
+from src.services.auth_services import log_in_new_user
+from src.services.send_throttle import SendThrottle, set_send_throttle
+from src.services.session_services import mark_progress_in_db
+from src.utils.keyed_lock import token_locks, username_locks
+
+# bot_handlers reads the admin list at import time
+os.environ.setdefault("ADMIN_USERNAMES", "test_admin")
+from src.handlers import bot_handlers  # noqa: E402
+
+WRITERS = 300
+
+
+@pytest.fixture(
+    params=[(JSON_BACKEND, False), (SQLITE_BACKEND, False), (SQLITE_BACKEND, True)],
+    ids=["json", "sqlite", "shared_sqlite"],
+)
+def environment(request, tmp_path):
+    backend, shared_state = request.param
+    set_send_throttle(SendThrottle(global_rate=0, chat_rate=0))
+    return BenchmarkEnvironment(str(tmp_path), backend, False, shared_state)
+
+
+def _login(bot: FakeBot, i: int, token: str):
+    user = FakeUser(FIRST_USER_ID + i, f"student{i}")
+    update = FakeUpdate(user, FakeMessage(text=f"/login {token}"))
+    return bot_handlers.login(update, FakeContext(bot, [token]))
+
+
+def test_concurrent_logins_with_one_token(environment):
+    bot = FakeBot()
+    tokens = make_tokens(1)
+    token = next(iter(tokens))
+
+    async def run() -> None:
+        await environment.store.replace_tokens(tokens)
+        await asyncio.gather(*(_login(bot, i, token) for i in range(WRITERS)))
+
+    asyncio.run(run())
+
+    winners = [
+        chat_id
+        for chat_id, messages in bot.messages.items()
+        if "Успешная авторизация" in messages[-1].text
+    ]
+    assert len(bot.messages) == WRITERS
+    assert len(winners) == 1
+    winner = f"student{winners[0] - FIRST_USER_ID}"
+
+    tokens, sessions = environment.store.storage.load()
+    assert tokens[token]["is_in_use"]
+    assert tokens[token]["telegram_username"] == winner
+    assert list(sessions) == [token]
+    assert sessions[token]["telegram_username"] == winner
+    assert len(token_locks) == 0
+    assert len(username_locks) == 0
+
+
+def test_concurrent_progress_marks(environment):
+    tokens = make_tokens(1)
+    token = next(iter(tokens))
+    tasks = [f"task{i}" for i in range(WRITERS)]
+
+    async def run() -> None:
+        await environment.store.replace_tokens(tokens)
+        await log_in_new_user(token, "student0", FIRST_USER_ID)
+        await asyncio.gather(*(mark_progress_in_db(token, task) for task in tasks))
+
+    asyncio.run(run())
+
+    _, sessions = environment.store.storage.load()
+    assert sorted(sessions[token]["progress"]) == sorted(tasks)
+    assert len(token_locks) == 0
@@ -0,0 +1,44 @@
+import asyncio
+
+import pytest
+
+from src.utils.http_server import HttpResponse, HttpServer
+
+MAX_BODY_BYTES = 10
+
+
+async def _echo(request) -> HttpResponse:
+    return HttpResponse(200, request.body)
+
+
+async def _status(content_length: str) -> int:
+    server = HttpServer(_echo, max_body_bytes=MAX_BODY_BYTES)
+    await server.start()
+    try:
+        reader, writer = await asyncio.open_connection(server.host, server.port)
+        writer.write(
+            f"POST / HTTP/1.1\r\nContent-Length: {content_length}\r\n"
+            "Connection: close\r\n\r\nabc".encode("latin-1")
+        )
+        await writer.drain()
+        status_line = await reader.readline()
+        writer.close()
+    finally:
+        await server.stop()
+    return int(status_line.split()[1])
+
+
+@pytest.mark.parametrize(
+    "content_length, status",
+    [
+        ("3", 200),
+        ("abc", 400),
+        ("-1", 400),
+        ("+3", 400),
+        ("²", 400),
+        (str(MAX_BODY_BYTES + 1), 413),
+        ("9" * 30, 413),
+    ],
+)
+def test_content_length_is_validated(content_length, status):
+    assert asyncio.run(_status(content_length)) == status
@@ -0,0 +1,40 @@
+import asyncio
+
+import pytest
+
+from src.benchmarks.common import FIRST_USER_ID, BenchmarkEnvironment, make_tokens
+from src.config.storage_config import JSON_BACKEND, SQLITE_BACKEND
+from src.services.auth_services import log_in_new_user
+from src.services.session_services import is_token_in_use, is_user_logged_in
+
+
+@pytest.fixture(
+    params=[(JSON_BACKEND, False), (SQLITE_BACKEND, False), (SQLITE_BACKEND, True)],
+    ids=["json", "sqlite", "shared_sqlite"],
+)
+def environment(request, tmp_path):
+    backend, shared_state = request.param
+    return BenchmarkEnvironment(str(tmp_path), backend, False, shared_state)
+
+
+def test_failed_session_write_releases_the_token(environment, monkeypatch):
+    tokens = make_tokens(1)
+    token = next(iter(tokens))
+    store = environment.store
+    add_session = store.add_session
+
+    async def failing_add_session(*args):
+        raise OSError("disk is full")
+
+    async def run() -> None:
+        await store.replace_tokens(tokens)
+        monkeypatch.setattr(store, "add_session", failing_add_session)
+        with pytest.raises(OSError):
+            await log_in_new_user(token, "student0", FIRST_USER_ID)
+        assert not await is_token_in_use(token)
+
+        monkeypatch.setattr(store, "add_session", add_session)
+        await log_in_new_user(token, "student0", FIRST_USER_ID)
+        assert await is_user_logged_in("student0")
+
+    asyncio.run(run())
@@ -0,0 +1,93 @@
+import asyncio
+import os
+import threading
+import time
+
+from src.benchmarks.common import FIRST_USER_ID, BenchmarkEnvironment, make_tokens
+from src.config.storage_config import SQLITE_BACKEND
+from src.fakes.fake_telegram import (
+    FakeBot,
+    FakeContext,
+    FakeMessage,
+    FakeUpdate,
+    FakeUser,
+)
+from src.services.auth_services import log_in_new_user
+from src.services.send_throttle import SendThrottle, set_send_throttle
+from src.services.session_services import mark_progress_in_db
+from src.storage.sqlite_storage import SqliteStorage
+from src.storage.state_store import StateStore, set_state_store
+
+# bot_handlers reads the admin list at import time
+os.environ.setdefault("ADMIN_USERNAMES", "test_admin")
+from src.handlers import bot_handlers  # noqa: E402
+
+REQUESTS = 50
+# Far below the time B's write is held for
+MAX_LATENCY_SECONDS = 0.2
+STALL_TIMEOUT_SECONDS = 10
+
+
+class StalledStorage(SqliteStorage):
+    """Holds progress writes for one token until released"""
+
+    def __init__(self, path: str, stalled_token: str):
+        super().__init__(path)
+        self.stalled_token = stalled_token
+        self.is_writing = threading.Event()
+        self.is_released = threading.Event()
+
+    def save_progress(self, token: str, filename: str) -> None:
+        if token == self.stalled_token:
+            self.is_writing.set()
+            self.is_released.wait(STALL_TIMEOUT_SECONDS)
+        super().save_progress(token, filename)
+
+
+def test_reads_are_not_blocked_by_a_stalled_write(tmp_path):
+    set_send_throttle(SendThrottle(global_rate=0, chat_rate=0))
+    BenchmarkEnvironment(str(tmp_path), SQLITE_BACKEND, False)
+    tokens = make_tokens(2)
+    token_a, token_b = tokens
+    storage = StalledStorage(os.path.join(tmp_path, "stalled.db"), token_b)
+    store = StateStore(storage)
+    store.load()
+    set_state_store(store)
+    bot = FakeBot()
+    user_a = FakeUser(FIRST_USER_ID, "student0")
+
+    async def request(handler, text: str) -> float:
+        started_at = time.perf_counter()
+        await handler(FakeUpdate(user_a, FakeMessage(text=text)), FakeContext(bot))
+        return time.perf_counter() - started_at
+
+    async def run() -> list:
+        await store.replace_tokens(tokens)
+        await log_in_new_user(token_a, "student0", FIRST_USER_ID)
+        await log_in_new_user(token_b, "student1", FIRST_USER_ID + 1)
+
+        write_b = asyncio.create_task(mark_progress_in_db(token_b, "task1"))
+        loop = asyncio.get_running_loop()
+        assert await loop.run_in_executor(
+            None, storage.is_writing.wait, STALL_TIMEOUT_SECONDS
+        )
+
+        latencies = []
+        for _ in range(REQUESTS):
+            latencies.append(await request(bot_handlers.login_status, "/login_status"))
+            latencies.append(await request(bot_handlers.progress, "/progress"))
+        assert not write_b.done()
+
+        storage.is_released.set()
+        await write_b
+        return latencies
+
+    latencies = asyncio.run(run())
+
+    replies = [message.text for message in bot.messages[FIRST_USER_ID]]
+    assert len(replies) == 2 * REQUESTS
+    assert all(reply.startswith("[Статус]") for reply in replies[::2])
+    assert all(reply.startswith("[Прогресс]") for reply in replies[1::2])
+    assert max(latencies) < MAX_LATENCY_SECONDS
+    _, sessions = storage.load()
+    assert sessions[token_b]["progress"] == {"task1": True}
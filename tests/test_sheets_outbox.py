@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+from gspread.exceptions import APIError
+
+from src.benchmarks.common import BenchmarkEnvironment, make_tokens
+from src.config.sheets_config import SPREADSHEET_NAME
+from src.config.storage_config import SQLITE_BACKEND
+from src.services.spreadsheet_service import fulfill_worksheets
+from src.services.worksheet_index import worksheet_indexes
+
+STUDENTS = 6
+VALUES = ["'+", "18.10.2026", "Answer: +\nPep: +"]
+
+
+@pytest.fixture
+def environment(tmp_path):
+    environment = BenchmarkEnvironment(str(tmp_path), SQLITE_BACKEND, False)
+    environment.tokens = make_tokens(STUDENTS)
+    asyncio.run(fulfill_worksheets(environment.tokens))
+    return environment
+
+
+def _enqueue_all(environment) -> None:
+    async def enqueue() -> None:
+        for token_data in environment.tokens.values():
+            await environment.outbox.enqueue(
+                token_data["group"],
+                f'{token_data["last_name"]} {token_data["first_name"]}',
+                "task1",
+                VALUES,
+            )
+
+    asyncio.run(enqueue())
+
+
+def _written_groups(environment) -> set:
+    spreadsheet = environment.sheets.spreadsheets[SPREADSHEET_NAME]
+
+    async def locate(token_data: dict):
+        worksheet = spreadsheet.worksheet(token_data["group"])
+        name = f'{token_data["last_name"]} {token_data["first_name"]}'
+        return worksheet, await worksheet_indexes.locate(worksheet, name, "task1")
+
+    groups = set()
+    for token_data in environment.tokens.values():
+        worksheet, (row, col) = asyncio.run(locate(token_data))
+        if worksheet.cell_value(row, col) == "+":
+            groups.add(token_data["group"])
+    return groups
+
+
+def test_rejected_group_doesnt_block_the_others(environment):
+    groups = {token_data["group"] for token_data in environment.tokens.values()}
+    rejected = sorted(groups)[0]
+    spreadsheet = environment.sheets.spreadsheets[SPREADSHEET_NAME]
+    # Every write to the group now exceeds its grid, a 400 from Google
+    spreadsheet.worksheet(rejected).col_count = 1
+    _enqueue_all(environment)
+
+    asyncio.run(environment.outbox.drain())
+
+    assert len(environment.outbox) == 0
+    assert _written_groups(environment) == groups - {rejected}
+
+
+def test_quota_error_keeps_the_writes(environment):
+    _enqueue_all(environment)
+    environment.sheets.error_rate = 1
+
+    with pytest.raises(APIError):
+        asyncio.run(environment.outbox.drain())
+
+    assert len(environment.outbox) == STUDENTS
+    environment.sheets.error_rate = 0
+    asyncio.run(environment.outbox.drain())
+    assert len(environment.outbox) == 0
+    assert len(_written_groups(environment)) == len(
+        {token_data["group"] for token_data in environment.tokens.values()}
+    )